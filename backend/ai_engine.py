@@ -1,68 +1,101 @@
 import os
-import json
 import time
+import threading
 import concurrent.futures
-from typing import Dict, Any
-try:
-    from dotenv import load_dotenv
-    load_dotenv_available = True
-except ImportError:
-    load_dotenv_available = False
-    def load_dotenv(*args, **kwargs): pass
-
-try:
-    import anthropic
-    anthropic_available = True
-except ImportError:
-    anthropic_available = False
-    anthropic = None
-
-try:
-    from google import genai
-    from google.genai import types
-    genai_available = True
-except ImportError:
-    genai_available = False
-    genai = None
-    types = None
-
-env_path = os.path.join(os.path.dirname(__file__), 'key.env')
-try:
-    load_dotenv()  # Load variables from .env if present
-    load_dotenv(env_path)  # Support user-created key.env
-except Exception:
-    pass
+from typing import Dict, Any, List, Tuple, Type, Optional
+from pydantic import BaseModel
+from precomputed_library import PrecomputedLibrary
+from spec_parser import parse_spec_text, FAST_PATH_CONFIDENCE
+from prompt_builder import (
+    build_prompt, compact_json, compact_spec, compact_analysis, spec_delta, analysis_delta, claude_system_blocks,
+    estimate_tokens, response_usage, UsageLog
+)
+from circuit_breaker import CircuitBreaker, MAX_TIMEOUT
+from json_extract import extract_json, validate_response
+from models import AiInsight, AiBatchInsight, AiOptimization, ParsedSpec
+from metrics import AI_CALLS, AI_LATENCY, AI_TOKENS, STAGE_IN_FLIGHT, record_cache
+from shared_cache import shared_cache, cache_key
+# Provider SDKs are imported on first use, not at module import: they
+# dominate cold-start time and /analyze-only traffic never needs them.
+_sdk_lock = threading.Lock()
+
+def _import_anthropic():
+    try:
+        import anthropic
+        return anthropic
+    except ImportError:
+        return None
+
+def _import_genai():
+    try:
+        from google import genai
+        from google.genai import types
+        return genai, types
+    except ImportError:
+        return None, None
+
+def _load_env():
+    """Loads .env and the user-created key.env next to this file, once."""
+    here = os.path.dirname(__file__)
+    paths = [p for p in (os.path.join(here, '.env'), os.path.join(here, 'key.env')) if os.path.exists(p)]
+    if not paths:
+        return
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    for path in paths:
+        try:
+            load_dotenv(path)
+        except Exception:
+            pass
+
+_load_env()
 
 # API Keys
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 CLAUDE_API_KEY = os.environ.get("CLAUDE_API_KEY")
 
+# Optional endpoint overrides, e.g. the offline mock provider (mock_provider.py)
+CLAUDE_BASE_URL = os.environ.get("CLAUDE_BASE_URL")
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL")
+
+# Batch analysis sizing: prompt input budget and a cap that keeps each
+# batch's answer inside max_tokens (~250 output tokens per analysis).
+BATCH_INPUT_TOKENS = 6000
+BATCH_MAX_SPECS = 12
+
+# Validated provider answers are reused across requests and worker
+# processes for identical prompts (0 disables).
+AI_CACHE_TTL = float(os.environ.get("SLICEAI_AI_CACHE_TTL_HOURS", 24)) * 3600
+
+# Shared pool for provider calls. Unlike a per-call `with` executor, a
+# timed-out call does not block the caller until the SDK returns.
+_ai_executor = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="ai-call")
+
 class SiliconCopilot:
     def __init__(self):
-        self.gemini_client = None
-        self.claude_client = None
-        
-        if GEMINI_API_KEY and genai_available:
-            try:
-                print(f"✅ Gemini API Key detected: {GEMINI_API_KEY[:6]}...")
-                self.gemini_client = genai.Client(api_key=GEMINI_API_KEY)
-            except Exception as e:
-                print(f"❌ Gemini init failed: {e}")
-            
-        if CLAUDE_API_KEY and anthropic_available:
-            try:
-                print(f"✅ Claude API Key detected: {CLAUDE_API_KEY[:6]}...")
-                self.claude_client = anthropic.Anthropic(api_key=CLAUDE_API_KEY)
-            except Exception as e:
-                print(f"❌ Claude init failed: {e}")
+        self._gemini_client = None
+        self._claude_client = None
+        self._genai_types = None
+        # Clients are built lazily; these flags record that we tried
+        self._gemini_ready = not GEMINI_API_KEY
+        self._claude_ready = not CLAUDE_API_KEY
 
-        if not self.gemini_client and not self.claude_client:
+        if GEMINI_API_KEY:
+            print(f"✅ Gemini API Key detected: {GEMINI_API_KEY[:6]}...")
+        if CLAUDE_API_KEY:
+            print(f"✅ Claude API Key detected: {CLAUDE_API_KEY[:6]}...")
+        if not GEMINI_API_KEY and not CLAUDE_API_KEY:
             print("❌ No AI API Keys detected!")
 
+        # Fallback analyses, parsed and indexed once
+        self.precomputed = PrecomputedLibrary.load()
+
         # Default model settings
         self.gemini_model = "gemini-2.0-flash"
         self.claude_model = "claude-3-5-sonnet-20240620"
-        self.system_instruction = """
+        self.system_instruction = build_prompt("""
             You are Silicon Copilot, an elite semiconductor architect AI.
             Your goal is to analyze chip specifications and suggest optimizations.
             
@@ -72,94 +105,205 @@ class SiliconCopilot:
             3. Provide causal reasoning for all suggestions (e.g., "Increasing AXI width reduces memory bottleneck").
             4. If a value is unknown, use reasonable defaults based on the process node (e.g., 28nm -> 1GHz, 7nm -> 2.5GHz).
             5. AMD ADVANTAGE: You have deep knowledge of AMD's Chiplet architecture and Infinity Fabric. When relevant (especially if multi-die partitioning is mentioned), emphasize the yield benefits of chiplets and the high-bandwidth, low-latency interconnect of Infinity Fabric over traditional monolithic designs.
-        """
+        """)
+        # Stable system prompt, marked for provider-side prompt caching
+        self.claude_system = claude_system_blocks(self.system_instruction)
+        self.usage = UsageLog()
+        self.breakers = {"claude": CircuitBreaker("Claude"), "gemini": CircuitBreaker("Gemini")}
+
+    # --- Lazy provider clients ---
+    @property
+    def gemini_client(self):
+        if not self._gemini_ready:
+            with _sdk_lock:
+                if not self._gemini_ready:
+                    genai, types = _import_genai()
+                    if genai is None:
+                        print("❌ Gemini init failed: google-genai is not installed")
+                    else:
+                        try:
+                            # HTTP timeout in ms: a hung call must not hold an _ai_executor thread forever
+                            http_options = types.HttpOptions(timeout=int(MAX_TIMEOUT * 1000), base_url=GEMINI_BASE_URL)
+                            self._gemini_client = genai.Client(api_key=GEMINI_API_KEY, http_options=http_options)
+                            self._genai_types = types
+                        except Exception as e:
+                            print(f"❌ Gemini init failed: {e}")
+                    self._gemini_ready = True
+        return self._gemini_client
+
+    @gemini_client.setter
+    def gemini_client(self, client):
+        self._gemini_client = client
+        self._gemini_ready = True
+
+    @property
+    def claude_client(self):
+        if not self._claude_ready:
+            with _sdk_lock:
+                if not self._claude_ready:
+                    anthropic = _import_anthropic()
+                    if anthropic is None:
+                        print("❌ Claude init failed: anthropic is not installed")
+                    else:
+                        try:
+                            options = {"base_url": CLAUDE_BASE_URL} if CLAUDE_BASE_URL else {}
+                            self._claude_client = anthropic.Anthropic(api_key=CLAUDE_API_KEY, **options)
+                        except Exception as e:
+                            print(f"❌ Claude init failed: {e}")
+                    self._claude_ready = True
+        return self._claude_client
+
+    @claude_client.setter
+    def claude_client(self, client):
+        self._claude_client = client
+        self._claude_ready = True
+
+    def prewarm(self):
+        """Imports the provider SDKs and builds their clients ahead of the first AI request."""
+        start = time.perf_counter()
+        providers = [name for name, client in (("Claude", self.claude_client), ("Gemini", self.gemini_client)) if client]
+        if providers:
+            print(f"🔥 Pre-warmed {', '.join(providers)} in {(time.perf_counter() - start) * 1000:.0f} ms")
 
     def _load_precomputed(self, spec: Dict[str, Any]) -> Dict[str, Any]:
-        """Loads a high-quality fallback analysis from a local JSON file."""
-        try:
-            path = os.path.join(os.path.dirname(__file__), 'precomputed_analysis.json')
-            with open(path, 'r') as f:
-                data = json.load(f)
-            
-            # Choose entry based on multi-die partitioning
-            key = 'multi_die_partitioning' if spec.get('multi_die_partitioning') else 'monolithic_default'
-            return data.get(key, data['monolithic_default'])
-        except Exception as e:
-            print(f"Fallback Load Error: {e}")
-            return {
-                "summary": "AI Analysis (Local Mode). Great design for AMD high-performance targets.",
-                "bottlenecks": ["Local diagnostic mode active"],
-                "reasoning": "Standard verification path.",
-                "suggestions": []
-            }
-
-    def _safe_generate(self, prompt: str, fallback: Dict[str, Any], spec: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Returns the closest precomputed fallback analysis for this spec."""
+        analysis = self.precomputed.lookup(spec)
+        if analysis is not None:
+            return analysis
+        return {
+            "summary": "AI Analysis (Local Mode). Great design for AMD high-performance targets.",
+            "bottlenecks": ["Local diagnostic mode active"],
+            "reasoning": "Standard verification path.",
+            "suggestions": []
+        }
+
+    def _call_claude(self, prompt: str):
+        return self.claude_client.messages.create(
+            model=self.claude_model,
+            max_tokens=4096,
+            system=self.claude_system,
+            messages=[{"role": "user", "content": prompt}],
+            timeout=MAX_TIMEOUT
+        )
+
+    def _call_gemini(self, prompt: str):
+        return self.gemini_client.models.generate_content(
+            model=self.gemini_model,
+            contents=prompt,
+            config=self._genai_types.GenerateContentConfig(
+                system_instruction=self.system_instruction,
+                temperature=0.2,
+                response_mime_type="application/json"
+            )
+        )
+
+    def _providers(self):
+        """Configured providers in failover order: (key, label, model, call, text getter)."""
+        providers = []
+        if self.claude_client:
+            providers.append(("claude", "Claude", self.claude_model, self._call_claude, lambda r: r.content[0].text))
+        if self.gemini_client:
+            providers.append(("gemini", "Gemini", self.gemini_model, self._call_gemini, lambda r: r.text.strip()))
+        return providers
+
+    def _safe_generate(self, prompt: str, fallback: Dict[str, Any], spec: Dict[str, Any] = None, method: str = "generate",
+                       schema: Optional[Type[BaseModel]] = None) -> Dict[str, Any]:
         """
-        Helper to safely generate content with error handling, fallback, and 5s timeout.
-        Logic: Try Claude first, then Gemini, then Fallback.
+        Helper to safely generate content with error handling and fallback.
+        Logic: Try Claude first, then Gemini, then Fallback. Providers whose
+        circuit is open are skipped; timeouts follow each provider's p95.
+        JSON is recovered tolerantly and, given a schema, validated field by
+        field so a partially valid response is kept rather than discarded.
+        Complete answers are kept in the shared cache for identical prompts.
         """
         if not self.claude_client and not self.gemini_client:
             return self._load_precomputed(spec or {}) if spec else fallback
 
-        # 1. Try Claude First
-        if self.claude_client:
+        response_key = cache_key({"method": method, "prompt": prompt, "schema": schema.__name__ if schema else None})
+        if AI_CACHE_TTL:
+            cached = shared_cache.get("ai", response_key)
+            record_cache("shared_ai", cached is not None)
+            if cached is not None:
+                return cached
+
+        for key, label, model, call, get_text in self._providers():
+            breaker = self.breakers[key]
+            if not breaker.allow():
+                AI_CALLS.inc(key, method, "skipped")
+                print(f"⏭️ {label} circuit open, skipping.")
+                continue
+
+            timeout = breaker.timeout()
+            start = time.perf_counter()
+            STAGE_IN_FLIGHT.inc(f"ai.{key}")
             try:
-                print(f"🤖 Calling Claude ({self.claude_model})...")
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(
-                        self.claude_client.messages.create,
-                        model=self.claude_model,
-                        max_tokens=4096,
-                        system=self.system_instruction,
-                        messages=[{"role": "user", "content": prompt}]
-                    )
-                    response = future.result(timeout=5)
-                    text = response.content[0].text
-                    # Claude sometimes adds markdown, strip it
-                    if "```json" in text:
-                        text = text.split("```json")[1].split("```")[0].strip()
-                    return json.loads(text)
+                print(f"🤖 Calling {label} ({model}, timeout {timeout:.1f}s)...")
+                future = _ai_executor.submit(call, prompt)
+                response = future.result(timeout=timeout)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                breaker.record_failure()
+                self._record_call(key, method, "timeout", start)
+                print(f"⚠️ {label} timed out after {timeout:.1f}s. Trying next provider...")
+                continue
             except Exception as e:
-                print(f"⚠️ Claude failed: {e}. Trying Gemini...")
+                breaker.record_failure()
+                self._record_call(key, method, "error", start)
+                print(f"⚠️ {label} failed: {e}. Trying next provider...")
+                continue
+            finally:
+                STAGE_IN_FLIGHT.dec(f"ai.{key}")
+            breaker.record_success(time.perf_counter() - start)
+            usage = response_usage(key, response)
+            self.usage.record(key, method, usage, len(prompt))
+            AI_TOKENS.inc(key, "input", amount=usage["input_tokens"])
+            AI_TOKENS.inc(key, "cached_input", amount=usage["cached_input_tokens"])
+            AI_TOKENS.inc(key, "output", amount=usage["output_tokens"])
 
-        # 2. Try Gemini
-        if self.gemini_client:
             try:
-                print(f"🤖 Calling Gemini ({self.gemini_model})...")
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(
-                        self.gemini_client.models.generate_content,
-                        model=self.gemini_model,
-                        contents=prompt,
-                        config=types.GenerateContentConfig(
-                            system_instruction=self.system_instruction,
-                            temperature=0.2,
-                            response_mime_type="application/json"
-                        )
-                    )
-                    response = future.result(timeout=5)
-                    text = response.text.strip()
-                    if "```json" in text:
-                        text = text.split("```json")[1].split("```")[0].strip()
-                    return json.loads(text)
+                data = extract_json(get_text(response))
             except Exception as e:
-                print(f"⚠️ Gemini failed: {e}. Falling back to pre-computed.")
+                data = None
+                print(f"⚠️ {label} response unreadable: {e}")
+            if data is None:
+                self._record_call(key, method, "invalid_json", start)
+                print(f"⚠️ {label} returned no JSON object. Trying next provider...")
+                continue
+            if schema is None:
+                self._record_call(key, method, "success", start)
+                result, complete = data, True
+            else:
+                result, complete = validate_response(schema, data, fallback)
+                if not complete:
+                    print(f"⚠️ {label} response partially invalid; kept the valid fields.")
+                self._record_call(key, method, "success" if complete else "partial", start)
+            if complete and AI_CACHE_TTL:
+                shared_cache.set("ai", response_key, result, AI_CACHE_TTL)
+            return result
+
+        # Final Fallback
+        print("⚠️ All providers failed. Falling back to pre-computed.")
+        return self._load_precomputed(spec) if spec else fallback
 
-        # 3. Final Fallback
-        return self._load_precomputed(spec or {})
+    @staticmethod
+    def _record_call(provider: str, method: str, outcome: str, start: float):
+        AI_CALLS.inc(provider, method, outcome)
+        AI_LATENCY.observe(time.perf_counter() - start, provider, outcome)
+
+    def provider_health(self) -> Dict[str, Any]:
+        """Circuit state, error rate, timeout and latency histogram per provider."""
+        return {key: self.breakers[key].snapshot() for key, *_ in self._providers()}
 
     def analyze_architecture(self, spec: Dict[str, Any], analysis_result: Dict[str, Any]) -> Dict[str, Any]:
         """
         Analyzes the chip architecture using Gemini to find bottlenecks.
         """
-        prompt = f"""
-        Analyze this AI accelerator design:
-        
-        Spec:
-        {json.dumps(spec)}
-        
+        prompt = build_prompt(f"""
+        Analyze this AI accelerator design.
+        Spec (fields that differ from defaults):
+        {compact_spec(spec)}
         Preliminary Analysis:
-        {json.dumps(analysis_result)}
+        {compact_analysis(analysis_result)}
         
         AMD MODE: {'ENABLED (Multi-Die Partitioning via Infinity Fabric)' if spec.get('multi_die_partitioning') else 'DISABLED'}
         If enabled, focus on how partitioning the design across multiple dies (Chiplets) improves yield and how AMD Infinity Fabric manages the cross-die communication efficiently.
@@ -173,7 +317,7 @@ class SiliconCopilot:
                 {{ "parameter": "name", "action": "increase/decrease", "value": "new_val", "reason": "why" }}
             ]
         }}
-        """
+        """)
         
         fallback = {
             "summary": "Analysis unavailable.",
@@ -182,17 +326,94 @@ class SiliconCopilot:
             "suggestions": []
         }
 
-        return self._safe_generate(prompt, fallback, spec)
+        return self._safe_generate(prompt, fallback, spec, method="analyze", schema=AiInsight)
+
+    def _batch_chunks(self, items: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Greedily packs encoded specs into batches that fit the token budget."""
+        chunks, current, tokens = [], [], 0
+        for item in items:
+            cost = estimate_tokens(compact_json(item))
+            if current and (tokens + cost > BATCH_INPUT_TOKENS or len(current) >= BATCH_MAX_SPECS):
+                chunks.append(current)
+                current, tokens = [], 0
+            current.append(item)
+            tokens += cost
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _analyze_chunk(self, chunk: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        prompt = build_prompt(f"""
+        Analyze each of these AI accelerator designs independently.
+        Each entry has an index "i", the spec fields that differ from defaults,
+        the preliminary analysis, and "amd" when multi-die partitioning is enabled.
+        For "amd" designs, focus on chiplet yield and AMD Infinity Fabric cross-die communication.
+        Designs:
+        {compact_json(chunk)}
+        
+        Return JSON with exactly one result per design:
+        {{
+            "results": [
+                {{
+                    "index": 0,
+                    "summary": "Executive summary string",
+                    "bottlenecks": ["List of strings"],
+                    "reasoning": "Detailed string explanation",
+                    "suggestions": [
+                        {{ "parameter": "name", "action": "increase/decrease", "value": "new_val", "reason": "why" }}
+                    ]
+                }}
+            ]
+        }}
+        """)
+        result = self._safe_generate(prompt, {"results": []}, method="analyze_batch", schema=AiBatchInsight)
+        wanted = {item["i"] for item in chunk}
+        by_index = {}
+        for entry in result.get("results", []):
+            index = entry.pop("index", None)
+            if index in wanted and index not in by_index:
+                by_index[index] = entry
+        return by_index
+
+    def analyze_architecture_batch(self, specs: List[Dict[str, Any]], analysis_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Analyzes many designs with as few provider calls as the token budget
+        allows. Designs missing from a batch answer are analyzed individually.
+        """
+        items = []
+        for i, (spec, analysis) in enumerate(zip(specs, analysis_results)):
+            item = {"i": i, "spec": spec_delta(spec), "analysis": analysis_delta(analysis)}
+            if spec.get('multi_die_partitioning'):
+                item["amd"] = True
+            items.append(item)
+
+        chunks = self._batch_chunks(items) if self._providers() else []
+        results: Dict[int, Dict[str, Any]] = {}
+        if chunks:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(4, len(chunks))) as executor:
+                for by_index in executor.map(self._analyze_chunk, chunks):
+                    results.update(by_index)
+
+        missing = [i for i in range(len(items)) if i not in results]
+        if missing:
+            print(f"🔁 Backfilling {len(missing)} of {len(items)} analyses individually...")
+        for i in missing:
+            results[i] = self.analyze_architecture(specs[i], analysis_results[i])
+
+        return {
+            "results": [results[i] for i in range(len(items))],
+            "batches": len(chunks),
+            "backfilled": len(missing)
+        }
 
     def suggest_optimization(self, spec: Dict[str, Any], goal: str) -> Dict[str, Any]:
         """
         Suggests optimizations for Power, Performance, or Balanced.
         """
-        prompt = f"""
+        prompt = build_prompt(f"""
         Optimize this spec for goal: {goal.upper()}
-        
-        Spec:
-        {json.dumps(spec)}
+        Spec (fields that differ from defaults):
+        {compact_spec(spec)}
         
         Constraints:
         - Maintain functional correctness.
@@ -200,13 +421,13 @@ class SiliconCopilot:
         
         Return JSON structure:
         {{
-            "optimized_spec": {{ ...complete spec object... }},
+            "optimized_spec": {{ ...only the fields you change... }},
             "changes": [
                 {{ "parameter": "name", "old": "val", "new": "val", "reason": "explanation" }}
             ],
             "trade_offs": "Explanation string"
         }}
-        """
+        """)
         
         fallback = {
             "error": "Optimization unavailable",
@@ -214,13 +435,30 @@ class SiliconCopilot:
             "trade_offs": "N/A"
         }
 
-        return self._safe_generate(prompt, fallback, spec)
+        result = self._safe_generate(prompt, fallback, spec, method="optimize", schema=AiOptimization)
+        # The prompt only carries a delta; hand the client a complete spec back
+        if isinstance(result.get("optimized_spec"), dict):
+            result["optimized_spec"] = {**spec, **result["optimized_spec"]}
+        return result
         
     def parse_natural_language_spec(self, text: str) -> Dict[str, Any]:
         """
         Parses natural language input into a ChipSpecification JSON.
         """
-        prompt = f"""
+        return self.parse_spec(text)[0]
+
+    def parse_spec(self, text: str) -> Tuple[Dict[str, Any], str, float]:
+        """
+        Parses natural language input, answering locally when the rule-based
+        parser is confident and asking the LLM otherwise.
+        Returns (spec, source, confidence) where source is "rules" or "llm".
+        """
+        parsed, confidence = parse_spec_text(text)
+        record_cache("parse_fast_path", confidence >= FAST_PATH_CONFIDENCE)
+        if confidence >= FAST_PATH_CONFIDENCE:
+            return parsed, "rules", confidence
+
+        prompt = build_prompt(f"""
         Convert this user request into a detailed Chip Specification JSON.
         User Input: "{text}"
         
@@ -247,7 +485,7 @@ class SiliconCopilot:
             "temperature_range": "..."
         }}
         Use reasonable technical defaults for missing values based on the context (e.g. Data Center -> High Power, 5nm).
-        """
+        """)
         
         fallback = {
             "purpose": "AI Accelerator (Fallback)",
@@ -256,7 +494,7 @@ class SiliconCopilot:
             "performance_goal": "Edge AI"
         }
         
-        return self._safe_generate(prompt, fallback)
+        return self._safe_generate(prompt, fallback, method="parse", schema=ParsedSpec), "llm", confidence
 
 # Singleton instance
 ai_copilot = SiliconCopilot()
@@ -0,0 +1,274 @@
+"""
+Benchmark suite for the deterministic engines.
+
+Usage:
+    python bench_engines.py                    # run and compare with bench_baseline.json
+    python bench_engines.py --quick            # smaller sweep for quick checks
+    python bench_engines.py --filter floorplan # only cases whose name contains 'floorplan'
+    python bench_engines.py --update-baseline  # record the current numbers as the baseline
+
+Each case is timed over repeated calls (fastest of several rounds) and run
+once more under tracemalloc for peak memory. Times are compared after
+scaling by a fixed pure-Python calibration loop, which absorbs most of the
+difference between a loaded and an idle machine. A case fails when its
+time exceeds the baseline by more than --tolerance (default 2x) or its
+peak memory by more than --mem-tolerance; the script then exits with 1.
+Baselines are still machine-specific: regenerate them on the machine that
+runs the comparison.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from models import ChipSpecification, ArchitectureGraph, Node, Edge, Workload, Layer
+from engine import analyze_feasibility, generate_architecture, generate_rtl
+from floorplan_engine import generate_floorplan, floorplan_data, enrich_metadata
+from partition_engine import partition_data
+from noc_engine import noc_data, MAX_CLUSTERS
+from memory_model import memory_sweep
+from workload_engine import analyze_workload
+from simulation_engine import simulate_data
+from yield_engine import yield_data, yield_sweep
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'bench_baseline.json')
+
+CLUSTER_SWEEP = [1, 4, 16, 64, 256, 1024, 4096]
+STANDARD_SWEEP = [0, 1, 4, 16, 64]
+GRAPH_SWEEP = [10, 100, 1000, 10000]
+QUICK = {"clusters": [1, 64, 4096], "standards": [0, 16], "graphs": [10, 1000]}
+
+LABELS = ["NPU Cluster", "RISC-V Host", "AXI4 Interconnect", "DDR4 Controller", "DDR4 PHY", "SRAM Bank", "PCIe Controller"]
+
+
+# --- Inputs ---
+def make_spec(clusters=1, standards=0):
+    return ChipSpecification(
+        purpose="Benchmark",
+        num_npu_clusters=clusters,
+        standards=[f"STD{i}" for i in range(standards)],
+        memory_type="HBM3" if clusters > 4 else "DDR4",
+    )
+
+
+def make_graph(n):
+    """Synthetic graph: n mixed blocks, a chain plus fan-in to a bus every 8 blocks."""
+    nodes = [Node(id="bus", type="default", data={"label": "NoC (Mesh)", "logic_type": "Digital"}, position={"x": 0, "y": 0})]
+    edges = []
+    for i in range(1, n):
+        label = LABELS[i % len(LABELS)]
+        nodes.append(Node(id=f"b{i}", type="default",
+                          data={"label": f"{label} {i}", "logic_type": "Analog" if "PHY" in label else "Digital"},
+                          position={"x": i % 100, "y": i // 100}))
+        edges.append(Edge(id=f"e{i}", source=f"b{i}", target="bus" if i % 8 == 0 else f"b{i - 1}" if i > 1 else "bus",
+                          bandwidth_weight=1 + i % 10))
+    return ArchitectureGraph(nodes=nodes, edges=edges)
+
+
+def make_workload(n):
+    """Synthetic network: n layers cycling conv, depthwise, projection and activation."""
+    shapes = [
+        dict(op="conv2d", height=56, width=56, in_channels=64, out_channels=64, kernel=3),
+        dict(op="depthwise_conv2d", height=56, width=56, in_channels=64, kernel=3),
+        dict(op="gemm", m=196, n=768, k=768),
+        dict(op="elementwise", elements=196 * 768),
+    ]
+    return Workload(layers=[Layer(name=f"l{i}", **shapes[i % len(shapes)]) for i in range(n)])
+
+
+def model_dump(model):
+    return model.model_dump() if hasattr(model, "model_dump") else model.dict()
+
+
+def model_validate(cls, data):
+    return cls.model_validate(data) if hasattr(cls, "model_validate") else cls(**data)
+
+
+# --- Cases ---
+def build_cases(sweeps):
+    """(name, size, callable) for every case; inputs are built up front."""
+    cases = []
+    for c in sweeps["clusters"]:
+        spec = make_spec(clusters=c)
+        graph = generate_architecture(spec)
+        cases.append((f"analyze_feasibility/clusters={c}", c, lambda spec=spec: analyze_feasibility(spec)))
+        cases.append((f"generate_architecture/clusters={c}", c, lambda spec=spec: generate_architecture(spec)))
+        cases.append((f"generate_rtl/clusters={c}", c, lambda spec=spec, graph=graph: generate_rtl(spec, graph)))
+        cases.append((f"memory_sweep/clusters={c}", c, lambda spec=spec: memory_sweep(spec, 1.0)))
+        cases.append((f"yield/clusters={c}", c, lambda spec=spec: yield_data(spec)))
+        if c <= MAX_CLUSTERS:
+            cases.append((f"noc/clusters={c}", c, lambda spec=spec: noc_data(spec)))
+        cases.append((f"simulate/clusters={c}", c, lambda spec=spec, graph=graph: simulate_data(spec, graph, 20_000)))
+    for s in sweeps["standards"]:
+        spec = make_spec(clusters=4, standards=s)
+        graph = generate_architecture(spec)
+        cases.append((f"generate_architecture/standards={s}", s, lambda spec=spec: generate_architecture(spec)))
+        cases.append((f"generate_floorplan/standards={s}", s, lambda graph=graph: generate_floorplan(graph)))
+        cases.append((f"generate_rtl/standards={s}", s, lambda spec=spec, graph=graph: generate_rtl(spec, graph)))
+    for n in sweeps["graphs"]:
+        graph = make_graph(n)
+        payload = model_dump(graph)
+        floorplan = generate_floorplan(graph)
+        cases.append((f"enrich_metadata/nodes={n}", n, lambda graph=graph: enrich_metadata(graph.nodes)))
+        cases.append((f"generate_floorplan/nodes={n}", n, lambda graph=graph: generate_floorplan(graph)))
+        cases.append((f"floorplan_data/nodes={n}", n, lambda graph=graph: floorplan_data(graph)))
+        cases.append((f"partition/nodes={n}", n, lambda graph=graph: partition_data(graph, 4)))
+        cases.append((f"workload/layers={n}", n, lambda workload=make_workload(n): analyze_workload(make_spec(16), workload)))
+        cases.append((f"serialize/graph_validate/nodes={n}", n, lambda payload=payload: model_validate(ArchitectureGraph, payload)))
+        cases.append((f"serialize/graph_dump/nodes={n}", n, lambda graph=graph: model_dump(graph)))
+        cases.append((f"serialize/floorplan_json/nodes={n}", n, lambda fp=floorplan: json.dumps(model_dump(fp))))
+    cases.append(("yield_sweep/wafers=2000", 2000, lambda: yield_sweep(2000)))
+    return cases
+
+
+# --- Measurement ---
+def time_case(fn, min_time=0.05, rounds=5):
+    """Best seconds per call over `rounds`, each lasting at least min_time."""
+    fn()  # warm-up
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+    samples = []
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter() - start) / number)
+    finally:
+        gc.enable()
+    return min(samples)
+
+
+def _calibration_workload():
+    total = 0
+    for i in range(20000):
+        total += len(str(i)) * (i % 7)
+    return {"total": total, "items": [total] * 10}
+
+
+def calibrate(min_time):
+    """Seconds for a fixed workload, used to normalise across machine load."""
+    return time_case(_calibration_workload, min_time=min_time, rounds=7)
+
+
+def peak_memory(fn):
+    """Peak bytes allocated during one call."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(cases, min_time):
+    results = {}
+    for name, size, fn in cases:
+        seconds = time_case(fn, min_time=min_time)
+        results[name] = {
+            "size": size,
+            "best_s": seconds,
+            "ops_per_s": 1.0 / seconds if seconds > 0 else float("inf"),
+            "peak_bytes": peak_memory(fn),
+        }
+        r = results[name]
+        print(f"{name:<45} {r['best_s'] * 1e3:>10.3f} ms {r['ops_per_s']:>12.1f}/s {r['peak_bytes'] / 1024:>10.1f} KiB")
+    return results
+
+
+def compare(results, baseline, tolerance, mem_tolerance, speed=1.0):
+    """Returns a list of regression messages. `speed` is current/baseline calibration time."""
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        t_ratio = r["best_s"] / (base["best_s"] * speed) if base["best_s"] else 1.0
+        m_ratio = r["peak_bytes"] / base["peak_bytes"] if base["peak_bytes"] else 1.0
+        if t_ratio > tolerance:
+            regressions.append(f"{name}: {t_ratio:.2f}x slower ({base['best_s'] * 1e3:.3f} -> {r['best_s'] * 1e3:.3f} ms)")
+        if m_ratio > mem_tolerance:
+            regressions.append(f"{name}: {m_ratio:.2f}x more memory ({base['peak_bytes']} -> {r['peak_bytes']} bytes)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SliceAI engines.")
+    parser.add_argument("--quick", action="store_true", help="smaller sweep")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per timing round")
+    parser.add_argument("--tolerance", type=float, default=2.0, help="allowed slowdown vs baseline")
+    parser.add_argument("--mem-tolerance", type=float, default=1.25, help="allowed memory growth vs baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    sweeps = QUICK if args.quick else {"clusters": CLUSTER_SWEEP, "standards": STANDARD_SWEEP, "graphs": GRAPH_SWEEP}
+    cases = [c for c in build_cases(sweeps) if args.filter in c[0]]
+    print(f"Running {len(cases)} cases on Python {platform.python_version()} ({platform.machine()})")
+    calibration = calibrate(args.min_time)
+    results = run(cases, args.min_time)
+    # Re-calibrate after the run and keep the faster one, so a load spike at start does not skew everything
+    calibration = min(calibration, calibrate(args.min_time))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                stored = json.load(f)
+            # Keep cases that were not re-run, rescaled to the new calibration
+            scale = calibration / stored["calibration_s"] if stored.get("calibration_s") else 1.0
+            baseline = {name: {**r, "best_s": r["best_s"] * scale, "ops_per_s": r["ops_per_s"] / scale}
+                        for name, r in stored.get("cases", {}).items()}
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "calibration_s": calibration,
+                "cases": baseline,
+            }, f, indent=4)
+        print(f"✅ Baseline updated ({len(results)} cases)")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("⚠️ No baseline found; run with --update-baseline to record one.")
+        return 0
+    with open(args.baseline) as f:
+        stored = json.load(f)
+    baseline = stored.get("cases", {})
+    speed = calibration / stored["calibration_s"] if stored.get("calibration_s") else 1.0
+    print(f"\nCalibration: {calibration * 1e3:.3f} ms ({speed:.2f}x baseline machine time)")
+    regressions = compare(results, baseline, args.tolerance, args.mem_tolerance, speed)
+    unguarded = [name for name in results if name not in baseline]
+    if unguarded:
+        print(f"⚠️ {len(unguarded)} case(s) have no baseline and were not compared (--update-baseline records them): "
+              f"{', '.join(unguarded)}")
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) against baseline:")
+        for msg in regressions:
+            print(f"   {msg}")
+        return 1
+    print(f"\n✅ No regressions against baseline ({sum(1 for n in results if n in baseline)} cases compared)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
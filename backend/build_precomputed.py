@@ -0,0 +1,70 @@
+"""
+Offline batch tool that grows the precomputed fallback library.
+
+Usage:
+    python build_precomputed.py specs.json [--min-distance 0.5] [--dry-run]
+
+`specs.json` is a JSON list of ChipSpecification objects (or one object per
+line). Each spec is analyzed with the live AI providers and stored under the
+`library` key of precomputed_analysis.json, where the fallback index picks it
+up on the next server start. Specs that are already covered by an entry
+closer than --min-distance are skipped.
+"""
+import argparse
+import json
+import sys
+
+from models import ChipSpecification
+from engine import analyze_feasibility
+from ai_engine import ai_copilot
+
+
+def read_specs(path):
+    with open(path, 'r') as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grow the precomputed AI fallback library.")
+    parser.add_argument("specs", help="JSON list or JSONL file of chip specifications")
+    parser.add_argument("--min-distance", type=float, default=0.5,
+                        help="skip specs closer than this to an existing entry")
+    parser.add_argument("--dry-run", action="store_true", help="analyze but do not write the library")
+    args = parser.parse_args()
+
+    if not ai_copilot.claude_client and not ai_copilot.gemini_client:
+        print("❌ No AI provider configured; nothing to precompute.")
+        return 1
+
+    library = ai_copilot.precomputed
+    added = 0
+    for i, raw in enumerate(read_specs(args.specs)):
+        spec = ChipSpecification(**raw)
+        spec_dict = spec.dict()
+        match = library.nearest(spec_dict)
+        if match and match["distance"] < args.min_distance:
+            print(f"[{i}] skip '{spec.purpose}': covered by {match['id']} (d={match['distance']:.2f})")
+            continue
+
+        feasibility = analyze_feasibility(spec)
+        analysis = ai_copilot.analyze_architecture(spec_dict, feasibility.dict())
+        if match and analysis == match["analysis"]:
+            # Providers failed and we got the fallback back; never index it.
+            print(f"[{i}] skip '{spec.purpose}': provider call fell back")
+            continue
+
+        library.add(f"spec_{len(library)}", spec_dict, analysis)
+        added += 1
+        print(f"[{i}] added '{spec.purpose}'")
+
+    if added and not args.dry_run:
+        library.save()
+    print(f"✅ {added} analyses added ({len(library)} total)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import threading
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+# Cooperative cancellation for engine calls. A caller runs the engine under
+# a CancelToken; the engines call checkpoint() between stages and inside
+# their long loops, which raises Cancelled once the token was cancelled
+# from another thread. Without a token checkpoint() does nothing, so the
+# HTTP endpoints and jobs run the engines unchanged.
+
+
+class Cancelled(Exception):
+    pass
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Calls fn with this token active for its checkpoints."""
+        reset = _current.set(self)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(reset)
+
+
+_current: ContextVar[Optional[CancelToken]] = ContextVar("sliceai_cancel_token", default=None)
+
+
+def cancel_requested() -> bool:
+    token = _current.get()
+    return token is not None and token.cancelled
+
+
+def checkpoint():
+    """Raises Cancelled if the active token was cancelled."""
+    token = _current.get()
+    if token is not None and token.cancelled:
+        raise Cancelled()
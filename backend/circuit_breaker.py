@@ -0,0 +1,128 @@
+import os
+import time
+import bisect
+import threading
+from collections import deque
+from typing import Dict, Any
+
+# Per-provider circuit breaker for the AI copilot.
+# Tracks the outcome of the last N calls and a latency histogram of the
+# successful ones. When the error rate crosses the threshold the circuit
+# opens and the provider is skipped without waiting on a timeout; after a
+# cooldown a single half-open probe decides whether it closes again; a slow
+# success from a call that started before the trip does not close it.
+# Call timeouts follow the provider's observed p95 latency.
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = [0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 4.0, 5.0, 7.5, 10.0, 15.0, 30.0]
+
+DEFAULT_TIMEOUT = float(os.environ.get("AI_DEFAULT_TIMEOUT", 5.0))
+MIN_TIMEOUT = float(os.environ.get("AI_MIN_TIMEOUT", 1.0))
+MAX_TIMEOUT = float(os.environ.get("AI_MAX_TIMEOUT", 10.0))
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5, error_threshold: float = 0.5,
+                 cooldown: float = 30.0, latency_samples: int = 50, timeout_headroom: float = 1.5):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.timeout_headroom = timeout_headroom
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._outcomes = deque(maxlen=window)  # True = success
+        self._latencies = deque(maxlen=latency_samples)
+        self._histogram = [0] * (len(LATENCY_BUCKETS) + 1)  # last bucket is +Inf
+        self._lock = threading.Lock()
+
+    # --- Gate ---
+    def allow(self) -> bool:
+        """True if a call may be attempted now."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+                print(f"🔌 {self.name} circuit half-open, probing")
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def timeout(self) -> float:
+        """Per-call timeout derived from the observed p95 latency."""
+        with self._lock:
+            if len(self._latencies) < self.min_calls:
+                return DEFAULT_TIMEOUT
+            p95 = self._percentile(0.95)
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, p95 * self.timeout_headroom))
+
+    # --- Outcomes ---
+    def record_success(self, latency: float):
+        """Records a call that took `latency` seconds; only the half-open probe closes the circuit."""
+        with self._lock:
+            self._outcomes.append(True)
+            if len(self._latencies) == self._latencies.maxlen:
+                self._histogram[self._bucket(self._latencies[0])] -= 1
+            self._latencies.append(latency)
+            self._histogram[self._bucket(latency)] += 1
+            # Nothing but the probe starts while the circuit is not closed
+            started_after_trip = time.monotonic() - latency >= self.opened_at
+            if self.state == HALF_OPEN and self._probe_in_flight and started_after_trip:
+                print(f"✅ {self.name} circuit closed")
+                self.state = CLOSED
+                self._probe_in_flight = False
+                self._outcomes.clear()
+                self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            self._outcomes.append(False)
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or self._error_rate() >= self.error_threshold:
+                if self.state != OPEN:
+                    print(f"🚫 {self.name} circuit open for {self.cooldown:.0f}s (error rate {self._error_rate():.0%})")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    # --- Stats ---
+    def _error_rate(self) -> float:
+        if len(self._outcomes) < self.min_calls:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    @staticmethod
+    def _bucket(latency: float) -> int:
+        return bisect.bisect_left(LATENCY_BUCKETS, latency)
+
+    def _percentile(self, q: float) -> float:
+        """Percentile from the histogram, interpolated inside the bucket."""
+        total = sum(self._histogram)
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(self._histogram):
+            if count and seen + count >= rank:
+                lower = LATENCY_BUCKETS[i - 1] if i > 0 else 0.0
+                upper = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else max(self._latencies)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return DEFAULT_TIMEOUT
+
+    def snapshot(self) -> Dict[str, Any]:
+        timeout = self.timeout()
+        with self._lock:
+            return {
+                "state": self.state,
+                "error_rate": round(self._error_rate(), 3),
+                "calls": len(self._outcomes),
+                "timeout_s": round(timeout, 2),
+                "latency_histogram": dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], self._histogram)),
+            }
@@ -0,0 +1,131 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cancellation import checkpoint
+
+# Array-backed graph for the engines. An ArchitectureGraph holds one pydantic
+# Node/Edge (plus their dicts) per element; the engines only need a few
+# numbers per block, so CompactGraph keeps them in parallel NumPy arrays
+# indexed by node position (kind, area/power weights, TOPS) with the edges
+# as source/target index arrays and, on demand, a CSR adjacency. Labels are
+# classified once per distinct (label, id-contains-"io") pair, which is all
+# the heuristics look at, so a design made of repeated blocks classifies
+# almost for free. Pydantic models are only built at the API boundary.
+
+KINDS = ("compute", "interconnect", "memory", "io")
+COMPUTE, INTERCONNECT, MEMORY, IO = range(len(KINDS))
+
+# Placement shapes the floorplanner gives some labels
+SHAPE_DEFAULT, SHAPE_TALL, SHAPE_WIDE = 0, 1, 2
+
+
+@lru_cache(maxsize=65536)
+def classify(label: str, io_id: bool) -> Tuple[int, int, int, float, int]:
+    """
+    (kind, area_weight, power_weight, tops, shape) for a block label by the
+    enrichment heuristics; io_id tells whether the node id contains "io".
+    """
+    shape = SHAPE_TALL if "High-Bandwidth" in label else SHAPE_WIDE if "DDR" in label else SHAPE_DEFAULT
+    label = label.lower()
+    if "gpu" in label:
+        return COMPUTE, 8, 9, 15.0, shape  # TFLOPS/TOPS
+    if "npu" in label:
+        if "array" in label or "clusters" in label:
+            # Try to extract count or just assume huge
+            count = 1
+            if "(" in label:
+                try:
+                    part = label.split("(")[1]  # "16x Clusters)"
+                    count = int(part.split("x")[0])
+                except (IndexError, ValueError):
+                    count = 8
+            return COMPUTE, 4 * count, 3 * count, 100.0 * count, shape
+        return COMPUTE, 7, 8, 100.0, shape  # High AI perf
+    if "cpu" in label:
+        return COMPUTE, 5, 5, 0.5, shape  # General purpose
+    if "bus" in label or "noc" in label:
+        return INTERCONNECT, 6, 3, 0.0, shape
+    if "memory" in label or "sram" in label or "ddr" in label:
+        return MEMORY, 5, 4, 0.0, shape
+    if "phy" in label or io_id:
+        return IO, 3, 2, 0.0, shape
+    return COMPUTE, 4, 4, 0.0, shape
+
+
+class CompactGraph:
+    """Nodes and edges of an ArchitectureGraph as parallel arrays."""
+
+    __slots__ = ("ids", "labels", "logic_types", "index", "kind", "area_weight", "power_weight", "tops", "shape",
+                 "edge_ids", "src", "dst", "edge_weight", "_csr")
+
+    def __init__(self, ids: List[str], labels: List[str], logic_types: List[str],
+                 edge_ids: Sequence[str] = (), sources: Sequence[str] = (), targets: Sequence[str] = (),
+                 edge_weights: Sequence[Optional[int]] = ()):
+        self.ids = ids
+        self.labels = labels
+        self.logic_types = logic_types
+        # A repeated id resolves to its last node, as a dict keyed by id would
+        self.index: Dict[str, int] = {node_id: i for i, node_id in enumerate(ids)}
+        classes = [classify(label, "io" in node_id) for node_id, label in zip(ids, labels)]
+        checkpoint()
+        columns = list(zip(*classes)) or [(), (), (), (), ()]
+        self.kind = np.array(columns[0], dtype=np.int8)
+        # float64 so NPU array counts parsed from labels cannot overflow
+        self.area_weight = np.array(columns[1], dtype=np.float64)
+        self.power_weight = np.array(columns[2], dtype=np.float64)
+        self.tops = np.array(columns[3], dtype=np.float64)
+        self.shape = np.array(columns[4], dtype=np.int8)
+
+        self.edge_ids = list(edge_ids)
+        # Endpoints missing from the nodes are -1
+        self.src = np.array([self.index.get(s, -1) for s in sources], dtype=np.int32)
+        self.dst = np.array([self.index.get(t, -1) for t in targets], dtype=np.int32)
+        self.edge_weight = np.array([1 if w is None else w for w in edge_weights], dtype=np.float64)
+        self._csr: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    @classmethod
+    def from_nodes(cls, nodes, edges=()) -> "CompactGraph":
+        return cls(
+            [n.id for n in nodes], [n.data['label'] for n in nodes], [n.data['logic_type'] for n in nodes],
+            [e.id for e in edges], [e.source for e in edges], [e.target for e in edges],
+            [e.bandwidth_weight for e in edges]
+        )
+
+    @classmethod
+    def from_graph(cls, graph) -> "CompactGraph":
+        return cls.from_nodes(graph.nodes, graph.edges)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def valid_edges(self) -> np.ndarray:
+        """Indices of edges whose endpoints both exist."""
+        return np.flatnonzero((self.src >= 0) & (self.dst >= 0))
+
+    def csr(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Undirected adjacency as (indptr, neighbours, weights): the neighbours
+        of node i are neighbours[indptr[i]:indptr[i + 1]], each edge listed
+        from both ends with its bandwidth weight.
+        """
+        if self._csr is None:
+            valid = self.valid_edges()
+            a = np.concatenate([self.src[valid], self.dst[valid]])
+            b = np.concatenate([self.dst[valid], self.src[valid]])
+            w = np.concatenate([self.edge_weight[valid], self.edge_weight[valid]])
+            order = np.argsort(a, kind="stable")
+            indptr = np.zeros(len(self.ids) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(a, minlength=len(self.ids)), out=indptr[1:])
+            self._csr = (indptr, b[order].astype(np.int32), w[order])
+        return self._csr
+
+    def enriched(self) -> List[Dict[str, Any]]:
+        """The per-block dicts enrich_metadata has always returned."""
+        blocks = []
+        for node_id, label, logic_type in zip(self.ids, self.labels, self.logic_types):
+            kind, area, power, tops, _ = classify(label, "io" in node_id)
+            blocks.append({"id": node_id, "label": label, "logic_type": logic_type, "type": KINDS[kind],
+                           "area_weight": area, "power_weight": power, "tops": tops})
+        return blocks
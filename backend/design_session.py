@@ -0,0 +1,450 @@
+import os
+import json
+import time
+import uuid
+import zlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from models import ArchitectureGraph, Node, Edge, PatchOp
+from engine_pool import engine_pool
+from metrics import SESSION_PATCHES, stage
+from shared_cache import CACHE_PATH, model_to_json
+import memory_budget
+
+# Server-side design sessions. The server holds the current ArchitectureGraph
+# and its floorplan; the canvas sends JSON-Patch-style operations addressed
+# by element id (/nodes/<id>/position, /edges/<id>) instead of re-uploading
+# the whole graph. Only the nodes and edges an edit touches are validated
+# and written, and the reply carries only the parts of the floorplan that
+# changed. Edits the floorplan engine cannot see (dragging a node moves just
+# its canvas position) skip the recompute altogether.
+# Sessions are rows in a SQLite file shared by the server processes
+# (serve.py), one row per element. Each process keeps recently used
+# sessions in memory and reloads one only when another process changed it;
+# patches name the version they were made against, so two editors get a
+# conflict instead of overwriting each other.
+
+SESSIONS_DB = os.environ.get("SLICEAI_SESSIONS_DB", os.path.join(os.path.dirname(CACHE_PATH), "sliceai-sessions.db"))
+SESSION_TTL_S = float(os.environ.get("SLICEAI_SESSION_TTL_HOURS", 12)) * 3600
+MAX_PATCH_OPS = 1000
+# Sessions each process keeps in memory, and their estimated bytes at most
+LOCAL_SESSIONS = 64
+LOCAL_SESSION_BYTES = memory_budget.cache_cap("sessions", 128 * 1024 * 1024)
+PRUNE_INTERVAL_S = 600.0
+
+COLLECTIONS = {"nodes": Node, "edges": Edge}
+# Floorplan list fields and the key identifying their items in a delta
+KEYED_FIELDS = {"blocks": "id", "routed_edges": "id", "regions": "name"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    floorplan BLOB,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS elements (
+    session_id TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (session_id, collection, id)
+);
+"""
+
+
+class SessionNotFound(KeyError):
+    pass
+
+
+class VersionConflict(Exception):
+    def __init__(self, current: int):
+        super().__init__(f"Session is at version {current}")
+        self.current = current
+
+
+class PatchError(ValueError):
+    def __init__(self, index: int, message: str):
+        super().__init__(f"ops[{index}]: {message}")
+        self.index = index
+
+
+def _layout_inputs(collection: str, element) -> tuple:
+    """The fields generate_floorplan reads; an edit leaving them alone keeps the floorplan."""
+    if collection == "nodes":
+        return element.id, element.data.get("label"), element.data.get("logic_type")
+    return element.id, element.source, element.target
+
+
+def _describe(error: Exception) -> str:
+    """First problem of a pydantic ValidationError as 'field: message'."""
+    if hasattr(error, "errors"):
+        first = error.errors()[0]
+        return f"{'.'.join(map(str, first['loc']))}: {first['msg']}"
+    return str(error)
+
+
+def _parse_path(path: str) -> Tuple[str, str, List[str]]:
+    """Splits /<collection>/<id>/<field>... (RFC 6901 escaping)."""
+    parts = [p.replace("~1", "/").replace("~0", "~") for p in path.split("/")[1:]]
+    if not path.startswith("/") or len(parts) < 2 or parts[0] not in COLLECTIONS or not parts[1]:
+        raise ValueError("path must look like /nodes/<id>[/field...] or /edges/<id>[/field...]")
+    return parts[0], parts[1], parts[2:]
+
+
+def _apply_to_document(doc: Any, field: List[str], op: PatchOp):
+    """Applies one add/remove/replace to a nested dict/list, JSON Patch style."""
+    for part in field[:-1]:
+        if isinstance(doc, list):
+            doc = doc[int(part)]
+        elif isinstance(doc, dict) and part in doc:
+            doc = doc[part]
+        else:
+            raise ValueError(f"no such field '{part}'")
+    last = field[-1]
+    if isinstance(doc, list):
+        index = len(doc) if last == "-" and op.op == "add" else int(last)
+        if op.op == "add":
+            doc.insert(index, op.value)
+        elif op.op == "replace":
+            doc[index] = op.value
+        else:
+            del doc[index]
+    elif isinstance(doc, dict):
+        if op.op != "add" and last not in doc:
+            raise ValueError(f"no such field '{last}'")
+        if op.op == "remove":
+            del doc[last]
+        else:
+            doc[last] = op.value
+    else:
+        raise ValueError(f"cannot address '{last}' inside a {type(doc).__name__}")
+
+
+def floorplan_delta(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Changes from `old` to `new`: keyed lists (blocks, routed_edges, regions)
+    as {"upsert": [...], "remove": [keys]}, other fields under "set".
+    """
+    if old is None:
+        return {"full": new}
+    delta: Dict[str, Any] = {}
+    for field, value in new.items():
+        if field in KEYED_FIELDS:
+            key = KEYED_FIELDS[field]
+            before = {item[key]: item for item in old.get(field, [])}
+            after = {item[key] for item in value}
+            upsert = [item for item in value if before.get(item[key]) != item]
+            removed = [k for k in before if k not in after]
+            if upsert or removed:
+                delta[field] = {"upsert": upsert, "remove": removed}
+        elif old.get(field) != value:
+            delta.setdefault("set", {})[field] = value
+    return delta
+
+
+class DesignSession:
+    """A session's validated nodes and edges, keyed by id in canvas order."""
+
+    def __init__(self, session_id: str, version: int, nodes: "OrderedDict[str, Node]",
+                 edges: "OrderedDict[str, Edge]", floorplan: Optional[Dict[str, Any]]):
+        self.id = session_id
+        self.version = version
+        self.collections = {"nodes": nodes, "edges": edges}
+        self.floorplan = floorplan
+        self.lock = threading.Lock()
+
+    def estimated_bytes(self) -> int:
+        return memory_budget.estimate("session", sum(len(items) for items in self.collections.values()))
+
+    def size_after(self, ops: List[PatchOp]) -> int:
+        """Upper bound on the element count after `ops`: only whole-element adds of new ids grow it."""
+        added = set()
+        for op in ops:
+            try:
+                collection, element_id, field = _parse_path(op.path)
+            except ValueError:
+                continue  # apply() rejects it
+            if op.op == "add" and not field and element_id not in self.collections[collection]:
+                added.add((collection, element_id))
+        return sum(len(items) for items in self.collections.values()) + len(added)
+
+    def graph(self, collections: Optional[Dict[str, "OrderedDict"]] = None) -> ArchitectureGraph:
+        collections = collections or self.collections
+        # The elements are validated already; pydantic passes instances through
+        return ArchitectureGraph(nodes=list(collections["nodes"].values()), edges=list(collections["edges"].values()))
+
+    def apply(self, ops: List[PatchOp]) -> Tuple[Dict[str, "OrderedDict"], Dict[Tuple[str, str], Any], set, bool]:
+        """
+        Applies `ops` to copies of the collections. Returns the new
+        collections, the touched elements (None = removed), the keys removed
+        at some point (re-adding one moves it to the end) and whether the
+        floorplan inputs changed. Raises PatchError without changing anything.
+        """
+        staged = {name: OrderedDict(items) for name, items in self.collections.items()}
+        touched: Dict[Tuple[str, str], Any] = {}
+        removed_keys = set()
+        for i, op in enumerate(ops):
+            try:
+                collection, element_id, field = _parse_path(op.path)
+            except ValueError as e:
+                raise PatchError(i, str(e))
+            items = staged[collection]
+            existing = items.get(element_id)
+            if existing is None and (field or op.op != "add"):
+                raise PatchError(i, f"no {collection[:-1]} '{element_id}'")
+
+            if not field and op.op == "remove":
+                removed = [(collection, element_id)]
+                if collection == "nodes":  # drop the node's edges with it
+                    removed += [("edges", e.id) for e in staged["edges"].values() if element_id in (e.source, e.target)]
+                for name, key in removed:
+                    del staged[name][key]
+                    touched[(name, key)] = None
+                    removed_keys.add((name, key))
+                continue
+
+            if field:
+                document = existing.dict()
+                try:
+                    _apply_to_document(document, field, op)
+                except (ValueError, IndexError, TypeError) as e:
+                    raise PatchError(i, str(e))
+            elif isinstance(op.value, dict):
+                document = {"id": element_id, **op.value}
+            else:
+                raise PatchError(i, f"value must be a {collection[:-1]} object")
+            if document.get("id") != element_id:
+                raise PatchError(i, "ids cannot change; remove the element and add it again")
+            try:
+                element = COLLECTIONS[collection](**document)
+            except (ValueError, TypeError) as e:
+                raise PatchError(i, _describe(e))
+            items[element_id] = element  # an existing id keeps its place
+            touched[(collection, element_id)] = element
+
+        # Node order matters to the placer, so removals and additions always relayout
+        relayout = bool(removed_keys) or any(
+            key[1] not in self.collections[key[0]]
+            or _layout_inputs(key[0], element) != _layout_inputs(key[0], self.collections[key[0]][key[1]])
+            for key, element in touched.items()
+        )
+        return staged, touched, removed_keys, relayout
+
+
+class SessionStore:
+    def __init__(self, path: str = SESSIONS_DB, ttl: float = SESSION_TTL_S):
+        self.path = path
+        self.ttl = ttl
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._db_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._local: "OrderedDict[str, DesignSession]" = OrderedDict()
+        self._last_prune = 0.0
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """This process's connection; a forked worker opens its own."""
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._pid = os.getpid()
+            self._local = OrderedDict()
+        return self._conn
+
+    # --- Public API ---
+    def create(self, graph: ArchitectureGraph) -> Dict[str, Any]:
+        self.prune()
+        session = DesignSession(
+            uuid.uuid4().hex, 1,
+            OrderedDict((n.id, n) for n in graph.nodes), OrderedDict((e.id, e) for e in graph.edges), None
+        )
+        session.floorplan = self._floorplan(session.graph())
+        now = time.time()
+        rows = [(session.id, name, key, model_to_json(element))
+                for name, items in session.collections.items() for key, element in items.items()]
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT INTO sessions (id, version, floorplan, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (session.id, session.version, self._pack(session.floorplan), now, now)
+                )
+                self._db.executemany("INSERT OR REPLACE INTO elements (session_id, collection, id, data) VALUES (?, ?, ?, ?)", rows)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        self._remember(session)
+        return {"id": session.id, "version": session.version, "floorplan": session.floorplan}
+
+    def get(self, session_id: str) -> Dict[str, Any]:
+        session = self._session(session_id)
+        return {"id": session.id, "version": session.version, "graph": session.graph(), "floorplan": session.floorplan}
+
+    def patch(self, session_id: str, ops: List[PatchOp], base_version: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Applies `ops` atomically and returns the new version with the
+        floorplan delta. Raises SessionNotFound, VersionConflict or PatchError.
+        """
+        if len(ops) > MAX_PATCH_OPS:
+            raise PatchError(MAX_PATCH_OPS, f"at most {MAX_PATCH_OPS} operations per patch")
+        session = self._session(session_id)
+        with session.lock:
+            session = self._session(session_id)  # another request may have moved it on meanwhile
+            if base_version is not None and base_version != session.version:
+                SESSION_PATCHES.inc("conflict")
+                raise VersionConflict(session.version)
+            # Admitted at its size after the patch, as create() is at its initial size
+            memory_budget.admit("session", session.size_after(ops))
+            try:
+                staged, touched, removed_keys, relayout = session.apply(ops)
+            except PatchError:
+                SESSION_PATCHES.inc("invalid")
+                raise
+
+            floorplan = session.floorplan
+            if relayout:
+                floorplan = self._floorplan(session.graph(staged))
+            with stage("session.commit"):
+                self._commit(session, touched, removed_keys, floorplan if relayout else None)
+
+            delta = floorplan_delta(session.floorplan, floorplan) if relayout else {}
+            session.collections = staged
+            session.floorplan = floorplan
+            session.version += 1
+            SESSION_PATCHES.inc("relayout" if relayout else "unchanged_layout")
+            return {"id": session.id, "version": session.version, "floorplan": delta}
+
+    def delete(self, session_id: str) -> bool:
+        with self._db_lock:
+            deleted = self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount
+            self._db.execute("DELETE FROM elements WHERE session_id = ?", (session_id,))
+        with self._lock:
+            self._local.pop(session_id, None)
+        return bool(deleted)
+
+    def prune(self):
+        """Drops sessions idle for longer than the TTL (at most every few minutes)."""
+        now = time.time()
+        if now - self._last_prune < PRUNE_INTERVAL_S:
+            return
+        self._last_prune = now
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                expired = [r[0] for r in self._db.execute("SELECT id FROM sessions WHERE updated_at < ?", (now - self.ttl,))]
+                self._db.executemany("DELETE FROM sessions WHERE id = ?", [(i,) for i in expired])
+                self._db.executemany("DELETE FROM elements WHERE session_id = ?", [(i,) for i in expired])
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        if expired:
+            print(f"🧹 Design sessions: pruned {len(expired)} idle session(s)")
+
+    # --- Internals ---
+    def _floorplan(self, graph: ArchitectureGraph) -> Dict[str, Any]:
+        return engine_pool.floorplan(graph)
+
+    @staticmethod
+    def _pack(floorplan: Dict[str, Any]) -> bytes:
+        return zlib.compress(json.dumps(floorplan, separators=(",", ":")).encode(), 1)
+
+    def _remember(self, session: DesignSession):
+        with self._lock:
+            self._local[session.id] = session
+            self._local.move_to_end(session.id)
+            while len(self._local) > LOCAL_SESSIONS:
+                self._local.popitem(last=False)
+            # The newest session stays even alone over the cap; it reloads from SQLite otherwise
+            total = sum(s.estimated_bytes() for s in self._local.values())
+            while len(self._local) > 1 and total > LOCAL_SESSION_BYTES:
+                total -= self._local.popitem(last=False)[1].estimated_bytes()
+
+    def memory(self) -> Dict[str, int]:
+        """Sessions held in this process's memory, for /debug/memory."""
+        with self._lock:
+            return {"entries": len(self._local), "bytes": sum(s.estimated_bytes() for s in self._local.values()),
+                    "cap_bytes": LOCAL_SESSION_BYTES}
+
+    def _session(self, session_id: str) -> DesignSession:
+        """The in-memory copy, reloaded if another process has a newer version."""
+        with self._db_lock:
+            row = self._db.execute("SELECT version FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            with self._lock:
+                self._local.pop(session_id, None)
+            raise SessionNotFound(session_id)
+        with self._lock:
+            session = self._local.get(session_id)
+        if session is not None and session.version == row[0]:
+            self._remember(session)
+            return session
+        return self._load(session_id, session)
+
+    def _load(self, session_id: str, stale: Optional[DesignSession]) -> DesignSession:
+        with self._db_lock:
+            row = self._db.execute("SELECT version, floorplan FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            elements = self._db.execute(
+                "SELECT collection, id, data FROM elements WHERE session_id = ? ORDER BY rowid", (session_id,)
+            ).fetchall()
+        if row is None:
+            raise SessionNotFound(session_id)
+        collections = {name: OrderedDict() for name in COLLECTIONS}
+        for name, key, data in elements:
+            collections[name][key] = COLLECTIONS[name](**json.loads(data))
+        session = DesignSession(session_id, row[0], collections["nodes"], collections["edges"],
+                                json.loads(zlib.decompress(row[1])) if row[1] else None)
+        if stale is not None:
+            session.lock = stale.lock  # keep serializing with requests holding the old copy
+        self._remember(session)
+        return session
+
+    def _commit(self, session: DesignSession, touched: Dict[Tuple[str, str], Any], removed_keys: set,
+                floorplan: Optional[Dict[str, Any]]):
+        """Writes the touched elements and bumps the version, if nobody else did first."""
+        upserts = [(session.id, name, key, model_to_json(e)) for (name, key), e in touched.items() if e is not None]
+        removals = [(session.id, name, key) for name, key in removed_keys]
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if floorplan is not None:
+                    updated = self._db.execute(
+                        "UPDATE sessions SET version = version + 1, floorplan = ?, updated_at = ? WHERE id = ? AND version = ?",
+                        (self._pack(floorplan), time.time(), session.id, session.version)
+                    ).rowcount
+                else:
+                    updated = self._db.execute(
+                        "UPDATE sessions SET version = version + 1, updated_at = ? WHERE id = ? AND version = ?",
+                        (time.time(), session.id, session.version)
+                    ).rowcount
+                if not updated:
+                    self._db.execute("ROLLBACK")
+                    current = self._db.execute("SELECT version FROM sessions WHERE id = ?", (session.id,)).fetchone()
+                    SESSION_PATCHES.inc("conflict")
+                    if current is None:
+                        raise SessionNotFound(session.id)
+                    raise VersionConflict(current[0])
+                self._db.executemany("DELETE FROM elements WHERE session_id = ? AND collection = ? AND id = ?", removals)
+                # An upsert keeps the row (and so the element's place in the canvas order)
+                self._db.executemany(
+                    "INSERT INTO elements (session_id, collection, id, data) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (session_id, collection, id) DO UPDATE SET data = excluded.data", upserts
+                )
+                self._db.execute("COMMIT")
+            except (SessionNotFound, VersionConflict):
+                raise
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+
+design_sessions = SessionStore()
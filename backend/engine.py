@@ -1,27 +1,27 @@
 from models import ChipSpecification, ArchitectureGraph, Node, Edge, AnalysisResult
-from typing import Dict
+from typing import Dict, Any
 from rtl_templates import NPU_CLUSTER_VERILOG, AXI_INTERCONNECT_VERILOG, DDR_CONTROLLER_VERILOG
+from metrics import timed
+from memory_model import MEM_RATE_MAP, peak_bandwidth, memory_bottleneck
 
-def analyze_feasibility(spec: ChipSpecification) -> AnalysisResult:
-    warnings = []
-    
-    # 1. Deterministic Physics Checks
-    # Limits based on process node physics (approx)
-    node_limits = {
-        "130nm": {"max_freq": 0.5, "power_factor": 10.0},
-        "65nm":  {"max_freq": 1.2, "power_factor": 5.0},
-        "28nm":  {"max_freq": 2.0, "power_factor": 2.5},
-        "7nm":   {"max_freq": 4.5, "power_factor": 1.0},
-        "5nm":   {"max_freq": 5.5, "power_factor": 0.8},
-    }
-    
+# Limits based on process node physics (approx)
+NODE_LIMITS = {
+    "130nm": {"max_freq": 0.5, "power_factor": 10.0},
+    "65nm":  {"max_freq": 1.2, "power_factor": 5.0},
+    "28nm":  {"max_freq": 2.0, "power_factor": 2.5},
+    "7nm":   {"max_freq": 4.5, "power_factor": 1.0},
+    "5nm":   {"max_freq": 5.5, "power_factor": 0.8},
+}
+
+def feasibility_metrics(spec: ChipSpecification) -> Dict[str, Any]:
+    """Numeric estimates behind analyze_feasibility (TOPS, GB/s, W, mm²)."""
     node = spec.process_node
     # Safety fallback
-    if node not in node_limits:
+    node_known = node in NODE_LIMITS
+    if not node_known:
         node = "28nm"
-        warnings.append(f"Unknown process node '{spec.process_node}', defaulting to 28nm physics.")
 
-    limit = node_limits[node]
+    limit = NODE_LIMITS[node]
     
     # --- CALCULATIONS ---
     # 1. TOPS (Tera Operations Per Second)
@@ -31,19 +31,7 @@ def analyze_feasibility(spec: ChipSpecification) -> AnalysisResult:
     
     # 2. Bandwidth (GB/s)
     # BW = (Rate * Width * Channels) / 8
-    # Rates: DDR4 ~3.2Gbps, DDR5 ~6.4Gbps, HBM2 ~2Gbps, HBM3 ~6.4Gbps
-    # Widths should be total bus width
-    mem_rate_map = {
-        "DDR4": 3.2, "DDR5": 6.4, "LPDDR5": 6.4, 
-        "HBM2": 2.0, "HBM3": 6.4
-    }
-    rate = mem_rate_map.get(spec.memory_type, 3.2)
-    # HBM has massive bus width (e.g. 1024)
-    eff_width = spec.ddr_width
-    if "HBM" in spec.memory_type:
-        eff_width = 1024 # assumption for HBM stack
-        
-    bandwidth = (rate * eff_width * spec.memory_channels) / 8.0
+    bandwidth = peak_bandwidth(spec.memory_type, spec.ddr_width, spec.memory_channels)
     
     # 3. Power Estimation
     # Base + Dynamic + Leakage
@@ -63,6 +51,28 @@ def analyze_feasibility(spec: ChipSpecification) -> AnalysisResult:
     if est_power > 0:
         eff_tops_w = tops / est_power
 
+    return {
+        "node": node,
+        "node_known": node_known,
+        "limit": limit,
+        "tops": tops,
+        "bandwidth": bandwidth,
+        "est_power": est_power,
+        "eff_tops_w": eff_tops_w,
+        "area_mm2": 10 + spec.num_npu_clusters * 5 * limit.get('power_factor', 1),
+    }
+
+@timed("analyze_feasibility")
+def analyze_feasibility(spec: ChipSpecification) -> AnalysisResult:
+    warnings = []
+    
+    # 1. Deterministic Physics Checks
+    m = feasibility_metrics(spec)
+    node, limit = m["node"], m["limit"]
+    tops, bandwidth, est_power = m["tops"], m["bandwidth"], m["est_power"]
+    if not m["node_known"]:
+        warnings.append(f"Unknown process node '{spec.process_node}', defaulting to 28nm physics.")
+
     # --- CHECKS ---
     
     # Check 1: Frequency
@@ -74,10 +84,15 @@ def analyze_feasibility(spec: ChipSpecification) -> AnalysisResult:
         warnings.append(f"Est. Power ({est_power:.1f}W) exceeds budget ({spec.power_budget}W).")
         
     # Check 3: Bandwidth bottlenecks
-    # Rule of thumb: Need ~0.5 GB/s per TOPS for efficient inference? (Roofline model approximation)
-    required_bw = tops * 0.5 
-    if bandwidth < required_bw:
-         warnings.append(f"Memory Bottleneck: {bandwidth:.1f} GB/s is low for {tops:.1f} TOPS (Suggest >{required_bw:.1f} GB/s).")
+    # The SRAM's tile reuse sets the off-chip traffic per MAC; compare what
+    # full rate needs with what the DRAM sustains (see memory_model.py)
+    memory = memory_bottleneck(spec, tops, bandwidth)
+    if memory is not None:
+         warnings.append(
+             f"Memory Bottleneck: {memory['sustained_bandwidth_gbps']:.1f} GB/s sustained is low for {tops:.1f} TOPS "
+             f"with {spec.sram_size} MB SRAM ({memory['reuse_macs_per_byte']:.0f} MACs/byte, compute at "
+             f"{memory['compute_utilization']:.0%}). Suggest >{memory['required_bandwidth_gbps']:.1f} GB/s or more SRAM."
+         )
 
     # Competition Mode Checks
     if spec.competition_mode:
@@ -88,11 +103,12 @@ def analyze_feasibility(spec: ChipSpecification) -> AnalysisResult:
 
     return AnalysisResult(
         warnings=warnings, 
-        area_estimate=f"{(10 + spec.num_npu_clusters * 5 * limit.get('power_factor',1)):.1f} mm²", 
+        area_estimate=f"{m['area_mm2']:.1f} mm²", 
         power_estimate=f"{est_power:.2f} W",
         max_freq_estimate=f"{limit['max_freq']} GHz"
     )
 
+@timed("generate_architecture")
 def generate_architecture(spec: ChipSpecification) -> ArchitectureGraph:
     nodes = []
     edges = []
@@ -155,6 +171,7 @@ def generate_architecture(spec: ChipSpecification) -> ArchitectureGraph:
 
     return ArchitectureGraph(nodes=nodes, edges=edges)
 
+@timed("generate_rtl")
 def generate_rtl(spec: ChipSpecification, graph: ArchitectureGraph) -> Dict[str, str]:
     files = {}
     
@@ -0,0 +1,283 @@
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import subprocess
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, List, Optional
+
+from models import ArchitectureGraph, PartitionRequest, SimulationRequest
+from floorplan_engine import floorplan_data
+from partition_engine import partition_data
+from simulation_engine import simulate_data
+from metrics import ENGINE_CALLS, stage
+from shared_cache import model_to_json, model_from_json
+from cancellation import Cancelled, cancel_requested
+
+# Warm process pool for the CPU-bound engines (floorplan, partitioning,
+# simulation).
+# A heavy call running in a request thread holds the GIL and stalls every
+# other request on the worker; here it runs in a separate, pre-imported
+# process instead. Workers are started as `python engine_pool.py --worker`
+# (not via multiprocessing, which would re-import the server's __main__ in
+# every worker) and talk to the parent over a pair of pipes. Models cross
+# the pipe as JSON text, which pydantic writes and parses far faster than
+# pickling their dicts; results come back as JSON too. Each call has a deadline and
+# can be cancelled: the worker running it is killed and replaced, since a
+# running Python call cannot be interrupted from outside. Small inputs run
+# inline, where the pipe round trip would cost more than the work.
+
+ENGINE_TIMEOUT = float(os.environ.get("SLICEAI_ENGINE_TIMEOUT", 30))
+# Graphs with fewer nodes than this run inline
+OFFLOAD_MIN_NODES = int(os.environ.get("SLICEAI_OFFLOAD_MIN_NODES", 150))
+# Simulations of fewer transactions than this run inline
+OFFLOAD_MIN_TRANSACTIONS = int(os.environ.get("SLICEAI_OFFLOAD_MIN_TRANSACTIONS", 50_000))
+POLL_INTERVAL = 0.05
+
+
+class EngineTimeout(Exception):
+    pass
+
+
+class EngineCancelled(Cancelled):
+    pass
+
+
+def available_cpus() -> int:
+    """CPUs usable by this process, honouring affinity and a cgroup v2 quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def default_size() -> int:
+    """SLICEAI_ENGINE_PROCS, else the CPUs left per web worker (0 = run inline)."""
+    configured = os.environ.get("SLICEAI_ENGINE_PROCS")
+    if os.name != "posix":
+        return 0  # workers inherit their pipes via pass_fds
+    if configured:
+        return max(0, int(configured))
+    cpus = available_cpus()
+    if cpus <= 1:
+        return 0
+    web_workers = max(1, int(os.environ.get("SLICEAI_WORKERS", 1) or 1))
+    return max(1, cpus // web_workers)
+
+
+# --- Worker side ---
+def _floorplan_task(payload: Dict[str, str]) -> str:
+    return json.dumps(floorplan_data(model_from_json(ArchitectureGraph, payload["graph"])), separators=(",", ":"))
+
+
+def _partition_task(payload: Dict[str, str]) -> str:
+    request = model_from_json(PartitionRequest, payload["request"])
+    return json.dumps(partition_data(request.graph, request.num_dies, request.max_imbalance), separators=(",", ":"))
+
+
+def _simulate_task(payload: Dict[str, str]) -> str:
+    request = model_from_json(SimulationRequest, payload["request"])
+    return json.dumps(simulate_data(request.spec, request.graph, request.transactions, request.load, request.seed),
+                      separators=(",", ":"))
+
+
+TASKS: Dict[str, Callable[[Dict[str, str]], str]] = {
+    "floorplan": _floorplan_task,
+    "partition": _partition_task,
+    "simulate": _simulate_task,
+}
+
+
+def _worker_main(requests: Connection, replies: Connection):
+    # Run the engine once so the first real call is warm
+    _floorplan_task({"graph": '{"nodes": [], "edges": []}'})
+    replies.send(("ready", None))
+    while True:
+        try:
+            message = requests.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        task, payload = message
+        try:
+            replies.send(("ok", TASKS[task](payload)))
+        except Exception as e:
+            replies.send(("error", f"{type(e).__name__}: {e}"))
+
+
+# --- Parent side ---
+class _Worker:
+    def __init__(self):
+        request_r, request_w = os.pipe()
+        reply_r, reply_w = os.pipe()
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker", str(request_r), str(reply_w)],
+            pass_fds=(request_r, reply_w), cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        os.close(request_r)
+        os.close(reply_w)
+        self.requests = Connection(request_w, readable=False)
+        self.replies = Connection(reply_r, writable=False)
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def wait_ready(self, timeout: float) -> bool:
+        try:
+            return self.replies.poll(timeout) and self.replies.recv()[0] == "ready"
+        except (EOFError, OSError):
+            return False
+
+    def kill(self):
+        self.process.kill()
+        try:
+            self.process.wait(1.0)
+        except subprocess.TimeoutExpired:
+            pass
+        self.requests.close()
+        self.replies.close()
+
+
+class EnginePool:
+    def __init__(self, size: Optional[int] = None):
+        self.size = size
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self.ready = False
+
+    def start(self):
+        """Spawns and warms the workers; meant to run in a background thread."""
+        size = default_size() if self.size is None else self.size
+        if size <= 0:
+            print("⚙️ Engine pool disabled; engines run in request threads")
+            return
+        start = time.perf_counter()
+        threads = [threading.Thread(target=self._add_worker) for _ in range(size)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.ready = bool(self._workers)
+        print(f"⚙️ Engine pool: {len(self._workers)} warm workers in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def stop(self):
+        self.ready = False
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            try:
+                worker.requests.send(None)
+                worker.process.wait(1.0)
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                pass
+            worker.kill()
+
+    def _add_worker(self):
+        worker = _Worker()
+        if not worker.wait_ready(30.0):
+            print("⚠️ Engine pool worker failed to start")
+            worker.kill()
+            return
+        with self._lock:
+            self._workers.append(worker)
+        self._idle.put(worker)
+
+    def _replace(self, worker: _Worker):
+        """Kills a busy worker and starts a warm replacement in the background."""
+        worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        if self.ready:
+            threading.Thread(target=self._add_worker, daemon=True).start()
+
+    def run(self, task: str, payload: Dict[str, str], timeout: float = ENGINE_TIMEOUT,
+            should_cancel: Optional[Callable[[], bool]] = None) -> Any:
+        """
+        Runs TASKS[task](payload) in a worker and decodes its JSON result. Raises EngineTimeout after
+        `timeout` seconds (queueing included) and EngineCancelled once
+        should_cancel() returns True (by default: once the caller's CancelToken
+        is cancelled); the worker is replaced in both cases.
+        """
+        should_cancel = should_cancel or cancel_requested
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                worker = self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                ENGINE_CALLS.inc(task, "timeout")
+                raise EngineTimeout(f"No engine worker free within {timeout:.0f}s")
+            if worker.is_alive():
+                break
+            self._replace(worker)  # died while idle
+
+        with stage(f"pool.{task}"):
+            try:
+                worker.requests.send((task, payload))
+                while not worker.replies.poll(POLL_INTERVAL):
+                    if should_cancel():
+                        self._replace(worker)
+                        ENGINE_CALLS.inc(task, "cancelled")
+                        raise EngineCancelled()
+                    if time.monotonic() > deadline or not worker.is_alive():
+                        self._replace(worker)
+                        ENGINE_CALLS.inc(task, "timeout")
+                        raise EngineTimeout(f"{task} exceeded its {timeout:.0f}s deadline")
+                status, result = worker.replies.recv()
+            except (EOFError, OSError, BrokenPipeError) as e:
+                self._replace(worker)
+                ENGINE_CALLS.inc(task, "error")
+                raise RuntimeError(f"Engine worker died during {task}: {e}")
+
+        self._idle.put(worker)
+        ENGINE_CALLS.inc(task, status)
+        if status != "ok":
+            raise RuntimeError(result)
+        return json.loads(result)
+
+    # --- Engine entry points ---
+    def _offload(self, graph: ArchitectureGraph) -> bool:
+        return self.ready and len(graph.nodes) >= OFFLOAD_MIN_NODES
+
+    def floorplan(self, graph: ArchitectureGraph, timeout: float = ENGINE_TIMEOUT,
+                  should_cancel: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        """The floorplan as a plain dict (see floorplan_engine.floorplan_data)."""
+        if not self._offload(graph):
+            ENGINE_CALLS.inc("floorplan", "inline")
+            return floorplan_data(graph)
+        return self.run("floorplan", {"graph": model_to_json(graph)}, timeout, should_cancel)
+
+    def partition(self, request: PartitionRequest, timeout: float = ENGINE_TIMEOUT,
+                  should_cancel: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        """The die split as a plain dict (see partition_engine.partition_data)."""
+        if not self._offload(request.graph):
+            ENGINE_CALLS.inc("partition", "inline")
+            return partition_data(request.graph, request.num_dies, request.max_imbalance)
+        return self.run("partition", {"request": model_to_json(request)}, timeout, should_cancel)
+
+    def simulate(self, request: SimulationRequest, timeout: float = ENGINE_TIMEOUT,
+                 should_cancel: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        """The transaction-level simulation as a plain dict (see simulation_engine.simulate_data)."""
+        if not (self.ready and request.transactions >= OFFLOAD_MIN_TRANSACTIONS):
+            ENGINE_CALLS.inc("simulate", "inline")
+            return simulate_data(request.spec, request.graph, request.transactions, request.load, request.seed)
+        return self.run("simulate", {"request": model_to_json(request)}, timeout, should_cancel)
+
+
+engine_pool = EnginePool()
+
+
+if __name__ == "__main__" and sys.argv[1:2] == ["--worker"]:
+    _worker_main(Connection(int(sys.argv[2]), writable=False), Connection(int(sys.argv[3]), readable=False))
@@ -1,327 +1,259 @@
-from models import ArchitectureGraph, FloorplanResult, Block, Region, RoutedEdge, Point
-import random
-import math
+from models import ArchitectureGraph, FloorplanResult
+from functools import lru_cache
+import numpy as np
+from metrics import timed, PhaseTimer
+from cancellation import checkpoint
+from compact_graph import CompactGraph, COMPUTE, INTERCONNECT, MEMORY, IO, SHAPE_TALL, SHAPE_WIDE
 
-# Constants
 # Constants
 GRID_SIZE = 10 # 10x10 basic grid unit
 MARGIN = 20
 
+# The engine works on a CompactGraph (parallel arrays, see compact_graph.py)
+# and emits plain JSON-ready data. Validating that into a FloorplanResult
+# (a Block, RoutedEdge and four Points per element) costs more than the
+# layout itself, so callers that only serialize the result (the engine
+# pool, design sessions, live updates) use floorplan_data() directly.
+
 def generate_floorplan(graph: ArchitectureGraph) -> FloorplanResult:
+    return FloorplanResult(**floorplan_data(graph))
+
+@timed("generate_floorplan")
+def floorplan_data(graph: ArchitectureGraph) -> dict:
+    """generate_floorplan() as the plain dict its model_dump() would give."""
+    phases = PhaseTimer("generate_floorplan")
     # 1. Metadata Enrichment & Sizing
-    enriched_blocks = enrich_metadata(graph.nodes)
-    
+    cg = CompactGraph.from_graph(graph)
+    phases.lap("enrich")
+    checkpoint()
+
     # 2. Placement Strategy (Improved from simple cursor)
-    placed_blocks = []
-    
-    # Segregate blocks
-    core_blocks = [b for b in enriched_blocks if b['type'] not in ['io', 'analog']]
-    edge_blocks = [b for b in enriched_blocks if b['type'] in ['io', 'analog']]
-    
-    # Place Core Blocks (Center-out or Grid fill)
-    # Sort by size (descending) for better packing
-    core_blocks.sort(key=lambda x: x['area_weight'], reverse=True)
-    
-    # Dynamic Grid Allocator
-    # Start at 0,0 relative to core region
-    cursor_x = 0
-    cursor_y = 0
-    row_height = 0
+    # Segregate blocks: IO hugs the boundary, everything else fills the core
+    is_edge = cg.kind == IO
+    edge_idx = np.flatnonzero(is_edge)
+    core_idx = np.flatnonzero(~is_edge)
+    # Sort by size (descending) for better packing; stable keeps input order on ties
+    core_idx = core_idx[np.argsort(-cg.area_weight[core_idx], kind="stable")]
+
+    # Scale factor - Make them CHUNKY for better visuals
+    scale = 40
+    area = cg.area_weight[core_idx]
+    shape = cg.shape[core_idx]
+    # Hardcode some aspect ratios for known types (HBM-like tall, DDR wide)
+    tall, wide = shape == SHAPE_TALL, shape == SHAPE_WIDE
+    core_w = np.where(tall, 40.0, np.where(wide, 120.0, area * scale))
+    core_h = np.where(tall, 120.0, np.where(wide, 40.0, area * (scale * 0.8))) # Slightly rectangular
+
+    # Dynamic Grid Allocator: fill rows left to right, wrapping at the target
+    # width. Greedy line breaking is sequential, so this loop stays scalar.
     max_row_width = 800 # Target max width before wrapping
-    
-    current_row_width = 0
-    total_core_width = 0
-    total_core_height = 0
-    
-    # First pass: Place relative to (0,0) to determine size
-    temp_placements = []
-    
-    for block in core_blocks:
-        # Scale factor - Make them CHUNKY for better visuals
-        scale = 40 
-        b_w = block['area_weight'] * scale
-        b_h = block['area_weight'] * (scale * 0.8) # Slightly rectangular
-        
-        # Hardcode some aspect ratios for known types
-        if "High-Bandwidth" in block['label']: # HBM like
-             b_w = 40
-             b_h = 120
-        elif "DDR" in block['label']:
-             b_w = 120
-             b_h = 40
-        
-        # Check if fits in row
-        if current_row_width + b_w > max_row_width:
-            cursor_x = 0
+    core_x = []
+    core_y = []
+    cursor_x = 0.0
+    cursor_y = 0.0
+    row_height = 0.0
+    total_core_width = 0.0
+    total_core_height = 0.0
+    for b_w, b_h in zip(core_w.tolist(), core_h.tolist()):
+        if cursor_x + b_w > max_row_width:
+            cursor_x = 0.0
             cursor_y += row_height + 20 # Gap
-            row_height = 0
-            current_row_width = 0
-            
-        temp_placements.append({
-            "block": block,
-            "x": cursor_x,
-            "y": cursor_y,
-            "w": b_w,
-            "h": b_h
-        })
-        
+            row_height = 0.0
+        core_x.append(cursor_x)
+        core_y.append(cursor_y)
         row_height = max(row_height, b_h)
-        current_row_width += b_w + 20
         cursor_x += b_w + 20
-        
         total_core_width = max(total_core_width, cursor_x)
         total_core_height = max(total_core_height, cursor_y + row_height)
+    checkpoint()
 
     # Calculate actual Core Region size
-    core_w = total_core_width if total_core_width > 0 else 400
-    core_h = total_core_height if total_core_height > 0 else 400
-    
+    region_w = total_core_width if total_core_width > 0 else 400
+    region_h = total_core_height if total_core_height > 0 else 400
+
     # Add Padding for IO Ring
     ring_thickness = 60
-    chip_width = int(core_w + (2 * ring_thickness) + 40)
-    chip_height = int(core_h + (2 * ring_thickness) + 40)
-    
+    chip_width = int(region_w + (2 * ring_thickness) + 40)
+    chip_height = int(region_h + (2 * ring_thickness) + 40)
+
     # Core Region Definition
-    core_region = Region(
-        name="Digital Core",
-        x=ring_thickness + 20, 
-        y=ring_thickness + 20,
-        width=core_w,
-        height=core_h,
-        color="#0f172a" # Slate 900
-    )
-    
-    # Finalize Core Block Positions
-    for p in temp_placements:
-        placed_blocks.append(Block(
-            id=p['block']['id'],
-            label=p['block']['label'],
-            x=p['x'] + core_region.x,
-            y=p['y'] + core_region.y,
-            width=p['w'],
-            height=p['h'],
-            region="core",
-            logic_type=p['block']['logic_type'],
-            power_density=float(p['block']['power_weight'])
-        ))
+    core_region = {
+        "name": "Digital Core",
+        "x": float(ring_thickness + 20),
+        "y": float(ring_thickness + 20),
+        "width": float(region_w),
+        "height": float(region_h),
+        "color": "#0f172a" # Slate 900
+    }
+    core_x = np.array(core_x) + core_region["x"]
+    core_y = np.array(core_y) + core_region["y"]
 
-    # Place Edge Blocks (Snap to boundary)
-    if edge_blocks:
+    # Place Edge Blocks (Snap to boundary): walk the perimeter
+    # Top -> Right -> Bottom -> Left in equal steps
+    b_w, b_h = 50, 30
+    edge_x = np.empty(0)
+    edge_y = np.empty(0)
+    if len(edge_idx):
         perimeter = (chip_width + chip_height) * 2
-        step = perimeter / len(edge_blocks)
-        current_step = 0
-        
-        for block in edge_blocks:
-            b_w = 50
-            b_h = 30
-            
-            # Simple logic: Top -> Right -> Bottom -> Left
-            pos = current_step
-            
-            if pos < chip_width: # Top Edge
-                x = pos
-                y = 10 
-            elif pos < chip_width + chip_height: # Right Edge
-                x = chip_width - b_w - 10
-                y = pos - chip_width
-            elif pos < (chip_width * 2) + chip_height: # Bottom Edge
-                x = (chip_width * 2 + chip_height) - pos
-                y = chip_height - b_h - 10
-            else: # Left Edge
-                x = 10
-                y = (chip_width * 2 + chip_height * 2) - pos
-                
-            # Clamp
-            x = max(0, min(x, chip_width - b_w))
-            y = max(0, min(y, chip_height - b_h))
-            
-            placed_blocks.append(Block(
-                id=block['id'],
-                label=block['label'],
-                x=x,
-                y=y,
-                width=b_w,
-                height=b_h,
-                region="io",
-                logic_type=block['logic_type'],
-                power_density=float(block['power_weight'])
-            ))
-            current_step += step
+        step = perimeter / len(edge_idx)
+        # Running sum (not i * step) to land on the same floats as stepping
+        pos = np.concatenate([[0.0], np.cumsum(np.full(len(edge_idx) - 1, step))])
+        top = pos < chip_width
+        right = ~top & (pos < chip_width + chip_height)
+        bottom = ~top & ~right & (pos < (chip_width * 2) + chip_height)
+        edge_x = np.where(top, pos, np.where(right, chip_width - b_w - 10,
+                                             np.where(bottom, (chip_width * 2 + chip_height) - pos, 10)))
+        edge_y = np.where(top, 10, np.where(right, pos - chip_width,
+                                            np.where(bottom, chip_height - b_h - 10, (chip_width * 2 + chip_height * 2) - pos)))
+        # Clamp
+        edge_x = np.maximum(0, np.minimum(edge_x, chip_width - b_w))
+        edge_y = np.maximum(0, np.minimum(edge_y, chip_height - b_h))
+
+    placed = np.concatenate([core_idx, edge_idx])
+    x = np.concatenate([core_x, edge_x])
+    y = np.concatenate([core_y, edge_y])
+    w = np.concatenate([core_w, np.full(len(edge_idx), float(b_w))])
+    h = np.concatenate([core_h, np.full(len(edge_idx), float(b_h))])
+    power_density = cg.power_weight[placed]
+    phases.lap("placement")
+    checkpoint()
 
     # 4. Routing Engine (Manhattan L-Shape)
-    routed_edges = []
-    block_map = {b.id: b for b in placed_blocks}
-    
-    for edge in graph.edges:
-        if edge.source not in block_map or edge.target not in block_map:
-            continue
-            
-        src = block_map[edge.source]
-        dst = block_map[edge.target]
-        
-        # weight logic
-        weight = 2
-        if "bus" in edge.target or "bus" in edge.source:
-             weight = 4 
-        
-        start_p = Point(x=src.x + src.width/2, y=src.y + src.height/2)
-        end_p = Point(x=dst.x + dst.width/2, y=dst.y + dst.height/2)
-        
-        # Manhattan Path: Start -> Mid-X -> End-Y -> End
-        mid_x = start_p.x
-        mid_y = end_p.y
-        
-        path = [
-            start_p,
-            Point(x=mid_x, y=start_p.y), # Out horizontal
-            Point(x=mid_x, y=mid_y),     # Vertical
-            end_p                        # In horizontal
-        ]
-        
-        routed_edges.append(RoutedEdge(
-            id=edge.id,
-            path=path,
-            thickness=weight,
-            color="#3b82f6" if weight > 2 else "#64748b"
-        ))
+    # Position of each node's block in `placed`
+    slot = np.empty(len(cg), dtype=np.int64)
+    slot[placed] = np.arange(len(placed))
+    if len(cg.index) != len(cg):
+        # Repeated ids: edges attach to the block placed last, as in an id -> block map
+        by_id = {cg.ids[i]: s for s, i in enumerate(placed.tolist())}
+        slot[placed] = [by_id[cg.ids[i]] for i in placed.tolist()]
+    cx = x + w / 2
+    cy = y + h / 2
+    # Edges with a missing endpoint are skipped
+    routed = cg.valid_edges()
+    src = slot[cg.src[routed]]
+    dst = slot[cg.dst[routed]]
+    # weight logic: edges touching the bus are drawn thicker
+    touches_bus = np.array(["bus" in node_id for node_id in cg.ids], dtype=bool)
+    thick = touches_bus[cg.src[routed]] | touches_bus[cg.dst[routed]]
+    routed_edges = [
+        {
+            "id": edge_id,
+            # Manhattan Path: Start -> Mid-X -> End-Y -> End
+            "path": [{"x": sx, "y": sy}, {"x": sx, "y": sy}, {"x": sx, "y": ey}, {"x": ex, "y": ey}],
+            "thickness": 4 if t else 2,
+            "color": "#3b82f6" if t else "#64748b",
+        }
+        for edge_id, sx, sy, ex, ey, t in zip(
+            [cg.edge_ids[i] for i in routed.tolist()], cx[src].tolist(), cy[src].tolist(),
+            cx[dst].tolist(), cy[dst].tolist(), thick.tolist()
+        )
+    ]
+    phases.lap("routing")
+    checkpoint()
 
     # 5. Analysis & Metrics
-    # Heatmap Grid (Simple 10x10 grid approximation)
-    heatmap = [[0.0 for _ in range(10)] for _ in range(10)]
-    for b in placed_blocks:
-        # Map block center to grid cell
-        gx = int((b.x + b.width/2) / chip_width * 10)
-        gy = int((b.y + b.height/2) / chip_height * 10)
-        if 0 <= gx < 10 and 0 <= gy < 10:
-            heatmap[gy][gx] += b.power_density
+    # Heatmap Grid (Simple 10x10 grid approximation): block centre -> cell
+    heatmap = np.zeros((10, 10))
+    gx = (cx / chip_width * 10).astype(np.int64)
+    gy = (cy / chip_height * 10).astype(np.int64)
+    inside = (gx >= 0) & (gx < 10) & (gy >= 0) & (gy < 10)
+    np.add.at(heatmap, (gy[inside], gx[inside]), power_density[inside])
 
     # --- Metrics Calculation ---
-    total_tops = 0.0
-    power_breakdown = {"Compute": 0.0, "Memory": 0.0, "IO": 0.0, "Interconnect": 0.0}
-    
+    metrics = floorplan_metrics(cg)
+    phases.lap("analysis")
+
+    n_core = len(core_idx)
+    blocks = [
+        {"id": cg.ids[i], "label": cg.labels[i], "x": bx, "y": by, "width": bw, "height": bh,
+         "region": "core" if s < n_core else "io", "logic_type": cg.logic_types[i], "power_density": p}
+        for s, (i, bx, by, bw, bh, p) in enumerate(zip(
+            placed.tolist(), x.tolist(), y.tolist(), w.tolist(), h.tolist(), power_density.tolist()
+        ))
+    ]
+    return {
+        "chip_width": float(chip_width),
+        "chip_height": float(chip_height),
+        "regions": [core_region],
+        "blocks": blocks,
+        "routed_edges": routed_edges,
+        "power_density_grid": heatmap.tolist(),
+        "congestion_score": "Medium" if len(routed_edges) > len(blocks)*1.2 else "Low",
+        "area_utilization": f"{min(95, int(len(blocks) * 100 / 15))}%",
+        "estimated_tops": float(f"{metrics['estimated_tops']:.1f}"),
+        "power_breakdown": {k: round(v, 1) for k, v in metrics['power_breakdown'].items()},
+        "memory_bandwidth": f"{metrics['memory_bandwidth_gbps']:.1f} GB/s",
+        "latency_estimate": f"{metrics['latency_ms']:.2f} ms",
+        "efficiency_tops_per_watt": float(round(metrics['efficiency_tops_per_watt'], 2)),
+        "interconnect_bottlenecks": metrics['interconnect_bottlenecks'],
+        "total_area_mm2": float(f"{(chip_width * chip_height) / 10000:.2f}")
+    }
+
+# Initial power share per block kind, indexed by kind code
+POWER_FACTORS = np.zeros(4)
+POWER_FACTORS[[COMPUTE, INTERCONNECT, MEMORY, IO]] = [1.5, 0.2, 0.8, 0.5]
+
+@lru_cache(maxsize=1024)
+def memory_bandwidth_gbps(label: str) -> float:
+    lbl = label.upper()
+    if "HBM3" in lbl: return 819.0
+    elif "HBM2" in lbl: return 460.0 # 256GB/s per stack roughly
+    elif "LPDDR5" in lbl: return 51.2
+    elif "DDR5" in lbl: return 32.0
+    elif "DDR4" in lbl: return 25.6
+    return 0.0
+
+def floorplan_metrics(cg: CompactGraph) -> dict:
+    """
+    Performance metrics derived from block metadata alone (no placement or
+    routing), so callers that only need the numbers can skip layout.
+    """
     # Analyze blocks for capabilities
-    for block in enriched_blocks:
-        if "tops" in block:
-            total_tops += block['tops']
-            
-        p_type = block['type'].capitalize()
-        # Initial approximate power distribution
-        if "Compute" in p_type: 
-             power_breakdown["Compute"] += block['power_weight'] * 1.5
-        elif "Memory" in p_type:
-             power_breakdown["Memory"] += block['power_weight'] * 0.8
-        elif "Io" in p_type:
-             power_breakdown["IO"] += block['power_weight'] * 0.5
-        else:
-             power_breakdown["Interconnect"] += block['power_weight'] * 0.2
-             
+    total_tops = sum(cg.tops.tolist())
+
+    # Initial approximate power distribution (bincount adds in block order)
+    by_kind = np.bincount(cg.kind, weights=cg.power_weight * POWER_FACTORS[cg.kind], minlength=len(POWER_FACTORS))
+    power_breakdown = {"Compute": float(by_kind[COMPUTE]), "Memory": float(by_kind[MEMORY]),
+                       "IO": float(by_kind[IO]), "Interconnect": float(by_kind[INTERCONNECT])}
+
     # Normalize Power to realistic values (e.g. 5-20W range)
     total_weight = sum(power_breakdown.values())
     if total_weight > 0:
         scale_target = 15.0 # assume 15W typical
         for k in power_breakdown:
             power_breakdown[k] = (power_breakdown[k] / total_weight) * scale_target
-            
+
     # Calculate Latency (Batch 1 Inference)
     # Latency ~ Depth / Freq + Memory Access
     # Heuristic: 0.5ms base + 0.1ms per 10 TOPS processed
     latency_ms = 0.5 + (100 / (total_tops + 1)) * 0.1
-    
+
     # Calculate Efficiency
     total_power = sum(power_breakdown.values())
     efficiency = total_tops / total_power if total_power > 0 else 0.0
 
-    # Memory Bandwidth Heuristic
-    mem_ctrls = [b for b in enriched_blocks if "Memory" in b.get('logic_type', '') or "memory" in b.get('type','')]
+    # Memory Bandwidth Heuristic over memory blocks and memory-logic blocks
+    memory_logic = {lt: "Memory" in lt for lt in set(cg.logic_types)}
+    is_memory = (cg.kind == MEMORY) | np.array([memory_logic[lt] for lt in cg.logic_types], dtype=bool)
     bandwidth_gbps = 0.0
-    for block in mem_ctrls:
-        lbl = block['label'].upper()
-        if "HBM3" in lbl: bandwidth_gbps += 819.0
-        elif "HBM2" in lbl: bandwidth_gbps += 460.0 # 256GB/s per stack roughly
-        elif "LPDDR5" in lbl: bandwidth_gbps += 51.2
-        elif "DDR5" in lbl: bandwidth_gbps += 32.0
-        elif "DDR4" in lbl: bandwidth_gbps += 25.6
-        
+    for i in np.flatnonzero(is_memory).tolist():
+        bandwidth_gbps += memory_bandwidth_gbps(cg.labels[i])
+
     # Bottleneck Detection
     bottlenecks = []
     # If bandwidth per TOPS is low (< 0.5 GB/s/TOPS) -> Memory Bound
     if total_tops > 0 and bandwidth_gbps / total_tops < 0.5:
         bottlenecks.append("Global Memory Bottleneck")
-        
-    return FloorplanResult(
-        chip_width=chip_width,
-        chip_height=chip_height,
-        regions=[core_region],
-        blocks=placed_blocks,
-        routed_edges=routed_edges,
-        power_density_grid=heatmap,
-        congestion_score="Medium" if len(routed_edges) > len(placed_blocks)*1.2 else "Low",
-        area_utilization=f"{min(95, int(len(placed_blocks) * 100 / 15))}%", 
-        estimated_tops=float(f"{total_tops:.1f}"),
-        power_breakdown={k: round(v, 1) for k, v in power_breakdown.items()},
-        memory_bandwidth=f"{bandwidth_gbps:.1f} GB/s",
-        latency_estimate=f"{latency_ms:.2f} ms",
-        efficiency_tops_per_watt=round(efficiency, 2),
-        interconnect_bottlenecks=bottlenecks,
-        total_area_mm2=float(f"{(chip_width * chip_height) / 10000:.2f}") 
-    )
+
+    return {
+        "estimated_tops": total_tops,
+        "power_breakdown": power_breakdown,
+        "memory_bandwidth_gbps": bandwidth_gbps,
+        "latency_ms": latency_ms,
+        "efficiency_tops_per_watt": efficiency,
+        "interconnect_bottlenecks": bottlenecks,
+    }
 
 def enrich_metadata(nodes):
-    enriched = []
-    for node in nodes:
-        meta = {
-            "id": node.id,
-            "label": node.data['label'],
-            "logic_type": node.data['logic_type'],
-            "type": "compute", # default
-            "area_weight": 4,
-            "power_weight": 4,
-            "tops": 0.0
-        }
-        
-        # Heuristic rules
-        label = meta['label'].lower()
-        if "gpu" in label:
-            meta['type'] = "compute"
-            meta['area_weight'] = 8
-            meta['power_weight'] = 9
-            meta['tops'] = 15.0 # TFLOPS/TOPS
-        elif "npu" in label:
-            meta['type'] = "compute"
-            # Check for Array
-            if "array" in label or "clusters" in label:
-                 # Try to extract count or just assume huge
-                 count = 1
-                 if "(" in label:
-                     try:
-                         part = label.split("(")[1] # "16x Clusters)"
-                         count = int(part.split("x")[0])
-                     except:
-                         count = 8
-                 meta['area_weight'] = 4 * count # Scale area
-                 meta['power_weight'] = 3 * count
-                 meta['tops'] = 100.0 * count
-            else:
-                meta['area_weight'] = 7
-                meta['power_weight'] = 8
-                meta['tops'] = 100.0 # High AI perf
-        elif "cpu" in label:
-            meta['type'] = "compute"
-            meta['area_weight'] = 5
-            meta['power_weight'] = 5
-            meta['tops'] = 0.5 # General purpose
-        elif "bus" in label or "noc" in label:
-            meta['type'] = "interconnect"
-            meta['area_weight'] = 6
-            meta['power_weight'] = 3
-        elif "memory" in label or "sram" in label or "ddr" in label:
-            meta['type'] = "memory"
-            meta['area_weight'] = 5
-            meta['power_weight'] = 4
-        elif "phy" in label or "io" in node.id:
-            meta['type'] = "io"
-            meta['area_weight'] = 3
-            meta['power_weight'] = 2
-            
-        enriched.append(meta)
-    return enriched
+    """Per-block dicts (id, label, logic_type, type, weights, tops) for `nodes`."""
+    return CompactGraph.from_nodes(nodes).enriched()
@@ -0,0 +1,344 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import traceback
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from metrics import JOBS, JOB_QUEUE_DEPTH
+from shared_cache import to_jsonable
+
+# Durable background jobs for work that outlives an HTTP request (sweeps,
+# large floorplans, batch AI reviews). Jobs are rows in a local SQLite file,
+# so queued work and finished results survive a restart; jobs that were
+# running when the process died are queued again on start, unless they have
+# been interrupted MAX_ATTEMPTS times (a job that takes the process down
+# with it, e.g. by running out of memory, would otherwise crash every start). A bounded pool
+# of worker threads claims the next job, preferring the kind with the fewest
+# running jobs so one heavy kind cannot occupy every worker. Several server
+# processes (serve.py) can share one file: claims are conditional updates
+# that record the claiming pid, the parent recovers interrupted jobs once
+# before forking, and it requeues a worker's jobs when that worker dies. Cancellation is
+# cooperative: handlers call ctx.progress() between steps, which raises
+# JobCancelled once a cancel was requested. A handler that cannot run yet
+# (the server is short of memory) raises JobDeferred: the job is queued
+# again and the worker waits DEFER_WAIT_S before claiming more work.
+
+JOBS_DB = os.environ.get("SLICEAI_JOBS_DB", os.path.join(os.path.dirname(__file__), "jobs.db"))
+JOB_WORKERS = int(os.environ.get("SLICEAI_JOB_WORKERS", 2))
+JOB_RETENTION_S = float(os.environ.get("SLICEAI_JOB_RETENTION_HOURS", 72)) * 3600
+MAX_ATTEMPTS = int(os.environ.get("SLICEAI_JOB_MAX_ATTEMPTS", 3))
+DEFER_WAIT_S = float(os.environ.get("SLICEAI_JOB_DEFER_S", 5))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner INTEGER,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobDeferred(Exception):
+    """Raised by a handler that cannot start yet; the message is shown on the queued job."""
+
+
+class JobContext:
+    """Handed to job handlers for progress reporting and cancellation checks."""
+
+    def __init__(self, queue: "JobQueue", job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+
+    def cancelled(self) -> bool:
+        return self.queue._cancel_requested(self.job_id)
+
+    def progress(self, fraction: float, message: Optional[str] = None):
+        """Records progress (0..1); raises JobCancelled if the job was cancelled."""
+        if self.cancelled():
+            raise JobCancelled()
+        self.queue._update(self.job_id, progress=max(0.0, min(1.0, fraction)), message=message)
+
+
+class JobQueue:
+    def __init__(self, path: str = JOBS_DB, workers: int = JOB_WORKERS):
+        self.path = path
+        self.workers = max(1, workers)
+        self.handlers: Dict[str, Callable[[Dict[str, Any], JobContext], Any]] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._db_lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        self._recovered = False
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """This process's connection; a forked worker opens its own."""
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            columns = {r["name"] for r in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in columns:  # files created before jobs recorded their worker
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+            self._pid = os.getpid()
+        return self._conn
+
+    def register(self, kind: str):
+        """Decorator registering fn(params, ctx) -> JSON-serializable result."""
+        def decorator(fn):
+            self.handlers[kind] = fn
+            return fn
+        return decorator
+
+    # --- Lifecycle ---
+    def recover(self):
+        """
+        Re-queues jobs interrupted by a restart, fails the ones interrupted
+        MAX_ATTEMPTS times and prunes expired ones. Must run before any
+        worker process starts claiming jobs.
+        """
+        resumed, abandoned = self._release("status = ?", (RUNNING,))
+        with self._db_lock:
+            pruned = self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND finished_at < ?",
+                (*FINISHED, time.time() - JOB_RETENTION_S)
+            ).rowcount
+        self._recovered = True
+        if resumed or pruned or abandoned:
+            print(f"📦 Job queue: resumed {resumed} interrupted job(s), failed {abandoned} after "
+                  f"{MAX_ATTEMPTS} interruptions, pruned {pruned} expired")
+
+    def requeue(self, pid: int) -> int:
+        """
+        Re-queues the jobs a dead worker process was running (failing the ones
+        interrupted MAX_ATTEMPTS times); returns how many were resumed.
+        """
+        resumed, abandoned = self._release("status = ? AND owner = ?", (RUNNING, pid))
+        if resumed or abandoned:
+            print(f"📦 Job queue: worker {pid} died; resumed {resumed} job(s), failed {abandoned} after "
+                  f"{MAX_ATTEMPTS} interruptions")
+        return resumed
+
+    def start(self):
+        if not self._recovered:
+            self.recover()
+        self._refresh_depth()
+        self._stopping = False
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """Stops the workers; running jobs are resumed on the next start."""
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # --- Public API ---
+    def submit(self, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if kind not in self.handlers:
+            raise KeyError(kind)
+        job_id = uuid.uuid4().hex
+        with self._db_lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, status, params, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(params), time.time())
+            )
+        JOBS.inc(kind, QUEUED)
+        self._refresh_depth()
+        with self._wakeup:
+            self._wakeup.notify()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT id, kind, status, progress, message, error, created_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job["status"] == QUEUED:
+            job["queue_position"] = self._queue_position(job["created_at"])
+        return job
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query = "SELECT id, kind, status, progress, message, created_at, finished_at FROM jobs"
+        args: tuple = ()
+        if status:
+            query += " WHERE status = ?"
+            args = (status,)
+        with self._db_lock:
+            rows = self._db.execute(query + " ORDER BY created_at DESC LIMIT ?", (*args, limit)).fetchall()
+        return [dict(r) for r in rows]
+
+    def result(self, job_id: str) -> Any:
+        with self._db_lock:
+            row = self._db.execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row["result"]) if row and row["result"] is not None else None
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancels a queued job at once; a running job stops at its next progress call."""
+        with self._db_lock:
+            row = self._db.execute("SELECT kind, status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["status"] == QUEUED:
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                    (CANCELLED, time.time(), job_id, QUEUED)
+                )
+                JOBS.inc(row["kind"], CANCELLED)
+            elif row["status"] == RUNNING:
+                self._db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+        self._refresh_depth()
+        return self.get(job_id)
+
+    # --- Internals ---
+    def _update(self, job_id: str, **fields):
+        columns = ", ".join(f"{k} = ?" for k in fields)
+        with self._db_lock:
+            self._db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        with self._db_lock:
+            row = self._db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def _queue_position(self, created_at: float) -> int:
+        with self._db_lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < ?", (QUEUED, created_at)
+            ).fetchone()[0]
+
+    def _refresh_depth(self):
+        with self._db_lock:
+            depth = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+        JOB_QUEUE_DEPTH.set(depth)
+
+    def _release(self, where: str, args: tuple) -> Tuple[int, int]:
+        """
+        Ends the interrupted runs of the RUNNING jobs matching `where`: queues
+        them again, or fails them once MAX_ATTEMPTS claims were interrupted.
+        The claim already counted the attempt. Returns (resumed, failed).
+        """
+        with self._db_lock:
+            abandoned = [r["kind"] for r in self._db.execute(
+                f"SELECT kind FROM jobs WHERE {where} AND attempts >= ?", (*args, MAX_ATTEMPTS)
+            )]
+            self._db.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, owner = NULL, "
+                "error = 'Interrupted ' || attempts || ' times (its server process stopped while it ran); not retried' "
+                f"WHERE {where} AND attempts >= ?", (FAILED, time.time(), *args, MAX_ATTEMPTS)
+            )
+            resumed = self._db.execute(
+                f"UPDATE jobs SET status = ?, started_at = NULL, owner = NULL WHERE {where}", (QUEUED, *args)
+            ).rowcount
+        for kind in abandoned:
+            JOBS.inc(kind, FAILED)
+        if resumed:
+            self._refresh_depth()
+            with self._wakeup:
+                self._wakeup.notify_all()
+        return resumed, len(abandoned)
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """Claims the oldest queued job of the least-busy kind (across all processes)."""
+        with self._db_lock:
+            running = dict(self._db.execute(
+                "SELECT kind, COUNT(*) FROM jobs WHERE status = ? GROUP BY kind", (RUNNING,)
+            ).fetchall())
+            rows = self._db.execute(
+                "SELECT id, kind, params FROM jobs WHERE status = ? ORDER BY created_at LIMIT 200", (QUEUED,)
+            ).fetchall()
+            rows = sorted((r for r in rows if r["kind"] in self.handlers), key=lambda r: running.get(r["kind"], 0))
+            for job in rows:  # sorted() is stable, so the oldest comes first within a kind
+                claimed = self._db.execute(
+                    "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1, owner = ? "
+                    "WHERE id = ? AND status = ?",
+                    (RUNNING, time.time(), os.getpid(), job["id"], QUEUED)
+                ).rowcount
+                if claimed:
+                    break
+            else:
+                return None
+        self._refresh_depth()
+        return job
+
+    def _worker(self):
+        while not self._stopping:
+            job = self._claim()
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(1.0)
+                continue
+            if self._run(job) == QUEUED:
+                with self._wakeup:
+                    self._wakeup.wait(DEFER_WAIT_S)
+
+    def _defer(self, job_id: str, message: str) -> str:
+        """Queues a deferred job again, unless it was cancelled meanwhile; returns its new status."""
+        if self._cancel_requested(job_id):
+            self._update(job_id, status=CANCELLED, finished_at=time.time())
+            return CANCELLED
+        with self._db_lock:
+            # Not an interruption: undo the claim's attempt
+            self._db.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL, owner = NULL, message = ?, attempts = attempts - 1 "
+                "WHERE id = ?",
+                (QUEUED, message, job_id)
+            )
+        self._refresh_depth()
+        return QUEUED
+
+    def _run(self, job: sqlite3.Row) -> str:
+        """Runs a claimed job; returns its status afterwards."""
+        job_id, kind = job["id"], job["kind"]
+        start = time.perf_counter()
+        try:
+            result = self.handlers[kind](json.loads(job["params"]), JobContext(self, job_id))
+            self._update(job_id, status=SUCCEEDED, progress=1.0, result=json.dumps(result, default=to_jsonable),
+                         finished_at=time.time())
+            status = SUCCEEDED
+        except JobCancelled:
+            self._update(job_id, status=CANCELLED, finished_at=time.time())
+            status = CANCELLED
+        except JobDeferred as e:
+            status = self._defer(job_id, f"Deferred: {e}")
+        except Exception as e:
+            self._update(job_id, status=FAILED, error=f"{type(e).__name__}: {e}", finished_at=time.time())
+            traceback.print_exc()
+            status = FAILED
+        JOBS.inc(kind, status)
+        print(f"📦 Job {job_id[:8]} ({kind}) {status} in {time.perf_counter() - start:.1f}s")
+        return status
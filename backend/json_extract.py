@@ -0,0 +1,198 @@
+import re
+import json
+from typing import Dict, Any, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+# Tolerant JSON recovery for LLM output.
+# Finds the first JSON object in mixed text (code fences, leading prose),
+# repairs the usual defects (trailing commas, smart quotes, comments,
+# truncated output) and validates it against a per-method schema, keeping
+# every field that validates instead of discarding the whole response. A
+# response only counts as complete if the model itself answered the schema's
+# required_fields (all schema fields have defaults, so {} would validate).
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.S | re.I)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+def _find_object(text: str) -> Optional[str]:
+    """
+    Returns the first balanced {...} block, or the unterminated tail of one
+    if the output was cut off. Braces inside strings are ignored.
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def _strip_comments(text: str) -> str:
+    """Removes // and /* */ comments outside of strings."""
+    out = []
+    i, n = 0, len(text)
+    in_string = False
+    while i < n:
+        c = text[i]
+        if in_string:
+            out.append(c)
+            if c == "\\" and i + 1 < n:
+                out.append(text[i + 1])
+                i += 1
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+            out.append(c)
+        elif text.startswith("//", i):
+            while i < n and text[i] != "\n":
+                i += 1
+            continue
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            continue
+        else:
+            out.append(c)
+        i += 1
+    return "".join(out)
+
+
+def _close_truncated(text: str) -> str:
+    """Closes an open string and any unbalanced brackets at the end of text."""
+    stack = []
+    in_string = False
+    escaped = False
+    for c in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c in "{[":
+            stack.append("}" if c == "{" else "]")
+        elif c in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    # Drop a dangling key or separator the truncation left behind
+    if stack and stack[-1] == "}":
+        text = re.sub(r'([{,])\s*"[^"]*"\s*:?\s*$', r"\1", text)
+    text = re.sub(r"[,:]\s*$", "", text)
+    return text + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> str:
+    text = _strip_comments(text.translate(_SMART_QUOTES))
+    text = _close_truncated(text)
+    return _TRAILING_COMMA_RE.sub(r"\1", text)
+
+
+def extract_json(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Best-effort parse of the JSON object in an LLM response.
+    Returns None if no object can be recovered.
+    """
+    if not text:
+        return None
+    fenced = _FENCE_RE.search(text)
+    candidates = [fenced.group(1)] if fenced else []
+    candidates.append(text)
+
+    for candidate in candidates:
+        block = _find_object(candidate)
+        if block is None:
+            continue
+        try:
+            return json.loads(block)
+        except ValueError:
+            pass
+        try:
+            data = json.loads(repair_json(block))
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def _validate(schema: Type[BaseModel], data: Dict[str, Any]) -> Dict[str, Any]:
+    return schema(**data).dict(exclude_none=True)
+
+
+def _answered(model: Any) -> bool:
+    """True if `model` and the models nested in it set their required_fields."""
+    if isinstance(model, list):
+        return all(_answered(item) for item in model)
+    if not isinstance(model, BaseModel):
+        return True
+    fields_set = model.model_fields_set if hasattr(model, "model_fields_set") else model.__fields_set__
+    for field in getattr(model, "required_fields", ()):
+        if field not in fields_set or getattr(model, field) in (None, ""):
+            return False
+    return all(_answered(getattr(model, field)) for field in fields_set)
+
+
+def _field_valid(schema: Type[BaseModel], base: Dict[str, Any], key: str, value: Any) -> bool:
+    try:
+        _validate(schema, {**base, key: value})
+        return True
+    except ValidationError:
+        return False
+
+
+def validate_response(schema: Type[BaseModel], data: Dict[str, Any],
+                      fallback: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+    """
+    Validates `data` against `schema`.
+    If the whole object does not validate, keeps each field that does and
+    takes the rest from `fallback`; if it validates without answering the
+    required fields, those come from `fallback`. Returns (result, complete).
+    """
+    try:
+        model = schema(**data)
+    except ValidationError:
+        pass
+    else:
+        result = model.dict(exclude_none=True)
+        if _answered(model):
+            return result, True
+        return {**fallback, **{k: v for k, v in result.items() if k in data and v != ""}}, False
+
+    salvaged = dict(fallback)
+    for key, value in data.items():
+        if isinstance(value, list):
+            # Keep the list items that validate on their own
+            value = [item for item in value if _field_valid(schema, salvaged, key, [item])]
+        if _field_valid(schema, salvaged, key, value):
+            salvaged[key] = value
+    try:
+        return _validate(schema, salvaged), False
+    except ValidationError:
+        return salvaged, False
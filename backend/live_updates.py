@@ -0,0 +1,149 @@
+import os
+import json
+import asyncio
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+
+from models import ChipSpecification, ArchitectureGraph
+from engine import analyze_feasibility, generate_architecture
+from engine_pool import engine_pool
+from partition_engine import partition_for_spec
+from yield_engine import yield_for_spec
+import memory_budget
+from cancellation import CancelToken, Cancelled, checkpoint
+from metrics import LIVE_UPDATES
+from shared_cache import shared_cache, to_jsonable
+
+# WebSocket channel for interactive updates (/ws/live). While a block is
+# dragged or a SpecForm slider moves, the client sends every intermediate
+# state; only the newest one matters. Each connection keeps one pending
+# message per channel (analyze, floorplan): a message replaces the pending
+# one, cancels the computation still running for an older state (the
+# engines stop at their next checkpoint, offloaded ones by replacing the
+# pool worker) and is computed once the burst has been quiet for
+# SLICEAI_LIVE_DEBOUNCE_MS. Only the result for the latest state is sent.
+#
+#   client: {"type": "floorplan", "id": 7, "payload": <ArchitectureGraph>}
+#   server: {"type": "floorplan", "id": 7, "result": {...}, "superseded": 5}
+#           {"type": "floorplan", "id": 7, "error": "..."}
+
+DEBOUNCE_S = float(os.environ.get("SLICEAI_LIVE_DEBOUNCE_MS", 30)) / 1000
+# Largest message accepted (a 2000-node graph is about 0.6 MB)
+MAX_MESSAGE_BYTES = 4 * 1024 * 1024
+
+
+def _analyze(payload: Dict[str, Any]) -> Dict[str, Any]:
+    spec = ChipSpecification(**payload)
+    feasibility = analyze_feasibility(spec)
+    checkpoint()
+    architecture = generate_architecture(spec)
+    return {"feasibility": feasibility, "architecture": architecture, "partition": partition_for_spec(spec, architecture),
+            "yield": yield_for_spec(spec)}
+
+
+def _floorplan(payload: Dict[str, Any]) -> Any:
+    graph = ArchitectureGraph(**payload)
+    # Under a memory budget, refused like /generate-floorplan; the error goes back on the channel
+    memory_budget.admit("floorplan", len(graph.nodes) + len(graph.edges))
+    checkpoint()
+    return shared_cache.get_or_compute("floorplan", graph, lambda: engine_pool.floorplan(graph))
+
+
+CHANNELS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "analyze": _analyze,
+    "floorplan": _floorplan,
+}
+
+
+class Channel:
+    """Latest-wins worker for one message type on one connection."""
+
+    def __init__(self, name: str, compute: Callable[[Dict[str, Any]], Any], send: Callable):
+        self.name = name
+        self.compute = compute
+        self.send = send
+        self.pending: Optional[Dict[str, Any]] = None
+        self.superseded = 0
+        self.token: Optional[CancelToken] = None
+        self._arrived = asyncio.Event()
+
+    def submit(self, message: Dict[str, Any]):
+        if self.pending is not None:
+            self.superseded += 1
+            LIVE_UPDATES.inc(self.name, "superseded")
+        self.pending = message
+        if self.token is not None:
+            self.token.cancel()  # the running computation is for an older state
+        self._arrived.set()
+
+    def close(self):
+        if self.token is not None:
+            self.token.cancel()
+
+    async def run(self):
+        while True:
+            await self._arrived.wait()
+            # Let the burst settle; each message in it replaces the pending one
+            while True:
+                self._arrived.clear()
+                try:
+                    await asyncio.wait_for(self._arrived.wait(), DEBOUNCE_S)
+                except asyncio.TimeoutError:
+                    break
+            message, self.pending = self.pending, None
+            if message is None:
+                continue
+            token = self.token = CancelToken()
+            try:
+                result = await run_in_threadpool(token.run, self.compute, message.get("payload") or {})
+                reply = {"result": result}
+            except Cancelled:
+                self.superseded += 1
+                LIVE_UPDATES.inc(self.name, "cancelled")
+                continue
+            except Exception as e:
+                reply = {"error": f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"}
+            finally:
+                self.token = None
+            if token.cancelled:  # finished just as a newer state arrived
+                self.superseded += 1
+                LIVE_UPDATES.inc(self.name, "cancelled")
+                continue
+            LIVE_UPDATES.inc(self.name, "error" if "error" in reply else "sent")
+            await self.send({"type": self.name, "id": message.get("id"), **reply, "superseded": self.superseded})
+            self.superseded = 0
+
+
+async def serve(websocket: WebSocket):
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+
+    async def send(message: Dict[str, Any]):
+        text = json.dumps(message, separators=(",", ":"), default=to_jsonable)
+        async with send_lock:
+            await websocket.send_text(text)
+
+    channels = {name: Channel(name, compute, send) for name, compute in CHANNELS.items()}
+    tasks = [asyncio.create_task(channel.run()) for channel in channels.values()]
+    try:
+        while True:
+            text = await websocket.receive_text()
+            if len(text) > MAX_MESSAGE_BYTES:
+                await send({"type": "error", "error": f"Message larger than {MAX_MESSAGE_BYTES} bytes"})
+                continue
+            try:
+                message = json.loads(text)
+                channel = channels[message["type"]]
+            except (ValueError, KeyError, TypeError):
+                await send({"type": "error", "error": f"Expected {{\"type\": one of {', '.join(CHANNELS)}, \"id\", \"payload\"}}"})
+                continue
+            channel.submit(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for channel in channels.values():
+            channel.close()
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,278 @@
+"""
+Load generator for the SliceAI backend.
+
+Usage:
+    python load_test.py [--url http://127.0.0.1:8000] [--duration 30] [--concurrency 16]
+                        [--rate 50] [--mix analyze=40,floorplan=20,code=15,ai_analyze=10,...]
+
+Replays a seeded mix of /analyze, /generate-floorplan, /generate-code and
+/ai/* requests and reports throughput plus p50/p95/p99 latency per route.
+Without --rate the test is closed-loop (each of --concurrency workers sends
+its next request as soon as the last one returns). With --rate requests
+arrive open-loop (Poisson) and latency is measured from the scheduled send
+time, so queueing under overload shows up in the percentiles.
+
+For fully offline runs start mock_provider.py and point the backend at it
+(see that file). --max-error-rate / --max-p99 make the run exit 1 when
+exceeded, for use as a capacity check.
+"""
+import argparse
+import http.client
+import json
+import math
+import queue
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from models import ChipSpecification
+from engine import generate_architecture
+
+DEFAULT_MIX = "analyze=40,floorplan=20,code=15,ai_analyze=10,ai_optimize=5,ai_parse=7,ai_batch=3"
+
+PROCESS_NODES = ["28nm", "16nm", "7nm", "5nm", "3nm"]
+MEMORY_TYPES = ["DDR4", "DDR5", "LPDDR5", "HBM2", "HBM3"]
+STANDARDS = ["PCIe", "USB 3.0", "Ethernet", "MIPI CSI", "HDMI", "DP"]
+GOALS = ["power", "performance", "balanced", "area"]
+PARSE_TEXTS = [
+    "5nm data center training chip with HBM3, PCIe Gen5 and 100 TOPS",
+    "low power 28nm edge inference chip under 2W with MIPI camera input",
+    "automotive 7nm vision accelerator, 16 NPU clusters, LPDDR5, Ethernet",
+    "something fast for robots",
+    "a chip that can run large language models cheaply",
+]
+
+
+# --- Request payloads ---
+def random_spec(rng):
+    return ChipSpecification(
+        purpose="Load Test",
+        process_node=rng.choice(PROCESS_NODES),
+        frequency=round(rng.uniform(0.5, 3.0), 2),
+        power_budget=round(rng.choice([2, 5, 15, 50, 150]) * rng.uniform(0.8, 1.2), 1),
+        num_npu_clusters=rng.choice([1, 2, 4, 8, 16]),
+        mac_units_per_cluster=rng.choice([256, 512, 1024]),
+        axi_width=rng.choice([64, 128, 256]),
+        memory_type=rng.choice(MEMORY_TYPES),
+        standards=rng.sample(STANDARDS, rng.randint(0, 3)),
+        multi_die_partitioning=rng.random() < 0.2,
+    ).dict()
+
+
+def build_pool(rng, size=32):
+    """Pre-built payloads per route so generating them is not part of the measurement."""
+    specs = [random_spec(rng) for _ in range(size)]
+    graphs = [generate_architecture(ChipSpecification(**s)).dict() for s in specs]
+    return {
+        "analyze": [("POST", "/analyze", s) for s in specs],
+        "floorplan": [("POST", "/generate-floorplan", g) for g in graphs],
+        "code": [("POST", "/generate-code", s) for s in specs],
+        "ai_analyze": [("POST", "/ai/analyze", s) for s in specs],
+        "ai_optimize": [("POST", f"/ai/optimize?goal={rng.choice(GOALS)}", s) for s in specs],
+        "ai_parse": [("POST", "/ai/parse", {"text": t}) for t in PARSE_TEXTS],
+        "ai_batch": [("POST", "/ai/analyze-batch", rng.sample(specs, rng.randint(2, 8))) for _ in range(8)],
+    }
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+# --- Client ---
+class Worker(threading.Thread):
+    """Sends requests over one keep-alive connection and records (route, status, latency)."""
+
+    def __init__(self, target, timeout, jobs, results):
+        super().__init__(daemon=True)
+        self.target = target
+        self.timeout = timeout
+        self.jobs = jobs
+        self.results = results
+        self.conn = None
+
+    def send(self, method, path, payload):
+        body = json.dumps(payload).encode()
+        for attempt in range(2):
+            if self.conn is None:
+                cls = http.client.HTTPSConnection if self.target.scheme == "https" else http.client.HTTPConnection
+                self.conn = cls(self.target.hostname, self.target.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+                response = self.conn.getresponse()
+                response.read()
+                return response.status
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Stale keep-alive connection: reconnect once
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            route, (method, path, payload), scheduled = job
+            start = scheduled if scheduled is not None else time.perf_counter()
+            try:
+                status = self.send(method, path, payload)
+            except Exception as e:
+                status = type(e).__name__
+                if self.conn is not None:
+                    self.conn.close()
+                    self.conn = None
+            self.results.append((route, status, time.perf_counter() - start))
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(results, elapsed):
+    by_route = defaultdict(list)
+    for route, status, latency in results:
+        by_route[route].append((status, latency))
+    by_route["ALL"] = [(s, l) for _, s, l in results]
+
+    report = {}
+    for route, entries in by_route.items():
+        latencies = sorted(l for _, l in entries)
+        errors = sum(1 for s, _ in entries if not (isinstance(s, int) and s < 400))
+        statuses = defaultdict(int)
+        for s, _ in entries:
+            statuses[str(s)] += 1
+        report[route] = {
+            "requests": len(entries),
+            "errors": errors,
+            "error_rate": errors / len(entries) if entries else 0.0,
+            "rps": len(entries) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+            "statuses": dict(statuses),
+        }
+    return report
+
+
+def print_report(report, elapsed):
+    print(f"\n{'route':<14}{'reqs':>8}{'err%':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for route in sorted(report, key=lambda r: (r == "ALL", r)):
+        r = report[route]
+        print(f"{route:<14}{r['requests']:>8}{r['error_rate'] * 100:>7.1f}%{r['rps']:>9.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}")
+    print(f"\n📊 {report.get('ALL', {}).get('requests', 0)} requests in {elapsed:.1f}s")
+
+
+def fetch_json(target, path, timeout):
+    try:
+        conn = http.client.HTTPConnection(target.hostname, target.port, timeout=timeout)
+        conn.request("GET", path)
+        response = conn.getresponse()
+        return json.loads(response.read()) if response.status == 200 else None
+    except Exception:
+        return None
+
+
+def run_load(target, pool, mix, duration, concurrency, rate, timeout, rng):
+    routes = list(mix)
+    weights = [mix[r] for r in routes]
+    jobs: "queue.Queue" = queue.Queue(maxsize=0 if rate else concurrency * 2)
+    results = []
+    workers = [Worker(target, timeout, jobs, results) for _ in range(concurrency)]
+    for w in workers:
+        w.start()
+
+    start = time.perf_counter()
+    deadline = start + duration
+    next_at = start
+    while True:
+        now = time.perf_counter()
+        if rate:
+            # Open loop: Poisson arrivals; latency counts from the scheduled time
+            next_at += rng.expovariate(rate)
+            if next_at >= deadline:
+                break
+            if next_at > now:
+                time.sleep(next_at - now)
+            scheduled = next_at
+        else:
+            if now >= deadline:
+                break
+            scheduled = None
+        route = rng.choices(routes, weights)[0]
+        jobs.put((route, rng.choice(pool[route]), scheduled))
+
+    for _ in workers:
+        jobs.put(None)
+    for w in workers:
+        w.join()
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the SliceAI backend.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--concurrency", type=int, default=16, help="workers (connections)")
+    parser.add_argument("--rate", type=float, default=None, help="open-loop arrival rate in requests/s")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="route=weight pairs")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--max-error-rate", type=float, default=None)
+    parser.add_argument("--max-p99", type=float, default=None, help="overall p99 limit in ms")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    pool = build_pool(rng)
+    unknown = set(mix) - set(pool)
+    if unknown:
+        parser.error(f"unknown routes in --mix: {', '.join(sorted(unknown))} (choose from {', '.join(pool)})")
+
+    target = urlsplit(args.url)
+    if fetch_json(target, "/", args.timeout) is None:
+        print(f"❌ Backend not reachable at {args.url}")
+        return 1
+
+    mode = f"open loop at {args.rate:g} req/s" if args.rate else "closed loop"
+    print(f"🚀 {args.duration:g}s against {args.url}, {args.concurrency} workers, {mode}, mix {mix}")
+    results, elapsed = run_load(target, pool, mix, args.duration, args.concurrency, args.rate, args.timeout, rng)
+    report = summarize(results, elapsed)
+    print_report(report, elapsed)
+
+    server = {"ai_health": fetch_json(target, "/ai/health", args.timeout), "ai_usage": fetch_json(target, "/ai/usage", args.timeout)}
+    if server["ai_health"]:
+        states = ", ".join(f"{k}: {v.get('state')}" for k, v in server["ai_health"].items())
+        print(f"🩺 Provider circuits after run: {states}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"elapsed_s": elapsed, "routes": report, "server": server}, f, indent=4)
+
+    overall = report.get("ALL", {})
+    failed = []
+    if args.max_error_rate is not None and overall.get("error_rate", 0) > args.max_error_rate:
+        failed.append(f"error rate {overall['error_rate']:.1%} > {args.max_error_rate:.1%}")
+    if args.max_p99 is not None and overall.get("p99_ms", 0) > args.max_p99:
+        failed.append(f"p99 {overall['p99_ms']:.0f} ms > {args.max_p99:g} ms")
+    if failed:
+        print(f"❌ Limits exceeded: {'; '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
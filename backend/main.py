@@ -1,12 +1,95 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from models import ChipSpecification
-from engine import analyze_feasibility, generate_architecture, generate_rtl, generate_testbench
-from floorplan_engine import generate_floorplan
-from ai_engine import ai_copilot
-from models import ChipSpecification, ArchitectureGraph
+import os
+import time
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from startup import timed_import, mark_ready, mark_request, startup_report
+from metrics import HTTP_REQUESTS, HTTP_LATENCY, HTTP_IN_FLIGHT, render as render_metrics
+import profiler
+from profiler import profiled
+import memory_budget
+from memory_budget import MemoryBudgetExceeded
 
-app = FastAPI(title="SiliceAI Architect Backend")
+with timed_import("fastapi"):
+    from fastapi import FastAPI, HTTPException, Request, Response, WebSocket
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import PlainTextResponse, JSONResponse
+with timed_import("engines"):
+    from models import ChipSpecification
+    from engine import analyze_feasibility, feasibility_metrics, generate_architecture, generate_rtl, generate_testbench
+    from memory_model import memory_hierarchy, memory_sweep
+    from workload_engine import analyze_workload
+    from simulation_engine import check_arguments as check_simulation_arguments
+    from yield_engine import yield_for_spec, yield_data, yield_sweep, check_arguments as check_yield_arguments
+    from yield_engine import DEFAULT_WAFERS, PARTITIONINGS, SWEEP_SIZE
+    from optimization_engine import verify_optimization, evaluate_spec
+    from job_queue import JobQueue, JobCancelled, JobDeferred, SUCCEEDED
+    from engine_pool import engine_pool, EngineTimeout, EngineCancelled
+    from shared_cache import shared_cache
+    from partition_engine import partition_for_spec, check_arguments as check_partition_arguments
+    from noc_engine import noc_data
+    from design_session import design_sessions, SessionNotFound, VersionConflict, PatchError
+    import live_updates
+with timed_import("ai_engine"):
+    import ai_engine
+    from ai_engine import ai_copilot
+from models import ChipSpecification, ArchitectureGraph, JobRequest, SessionPatch, PartitionRequest, WorkloadRequest, SimulationRequest
+from typing import List, Optional
+
+MAX_BATCH_SPECS = 64
+MAX_SWEEP_POINTS = 256
+JOB_ENGINE_TIMEOUT = 600.0
+
+job_queue = JobQueue()
+
+# Build the AI provider clients in the background once the server is up
+# (set SLICEAI_PREWARM=0 to build them on the first AI request instead).
+PREWARM = os.environ.get("SLICEAI_PREWARM", "1") not in ("0", "false", "False")
+PREWARM_DELAY = float(os.environ.get("SLICEAI_PREWARM_DELAY", 1.0))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    mark_ready()
+    if PREWARM:
+        # Delay so the import work does not compete with the first requests
+        timer = threading.Timer(PREWARM_DELAY, ai_copilot.prewarm)
+        timer.daemon = True
+        timer.start()
+    threading.Thread(target=engine_pool.start, daemon=True, name="engine-pool-start").start()
+    job_queue.start()
+    yield
+    job_queue.stop()
+    engine_pool.stop()
+
+app = FastAPI(title="SiliceAI Architect Backend", lifespan=lifespan)
+
+@app.exception_handler(MemoryBudgetExceeded)
+async def memory_budget_exceeded(request: Request, exc: MemoryBudgetExceeded):
+    headers = {"Retry-After": "5"} if exc.status_code == 503 else None
+    return JSONResponse({"detail": str(exc)}, status_code=exc.status_code, headers=headers)
+
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    HTTP_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = 500
+    session = None
+    if profiler.PROFILE_TOKEN:
+        session = profiler.begin(
+            request.headers.get("X-Profile") or request.query_params.get("profile"),
+            request.headers.get("X-Profile-Mode")
+        )
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers.update(profiler.profile_headers(session))
+        return response
+    finally:
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        HTTP_REQUESTS.inc(route_path, request.method, str(status))
+        HTTP_LATENCY.observe(time.perf_counter() - start, route_path)
+        HTTP_IN_FLIGHT.dec()
+        mark_request()
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,20 +111,116 @@ def read_root():
     return {"message": "SiliceAI Architect Backend is running"}
 
 @app.post("/analyze")
+@profiled
 def analyze(spec: ChipSpecification):
     feasibility = analyze_feasibility(spec)
     architecture = generate_architecture(spec)
     return {
         "feasibility": feasibility,
-        "architecture": architecture
+        "architecture": architecture,
+        "partition": partition_for_spec(spec, architecture), # None unless the spec is multi-die
+        "yield": yield_for_spec(spec) # monolithic vs chiplet cost per good system
     }
 
 @app.post("/generate-floorplan")
+@profiled
 def generate_floorplan_endpoint(graph: ArchitectureGraph):
-    return generate_floorplan(graph)
+    # Shared with the other worker processes; /analyze and /generate-code
+    # are cheaper to recompute than to look up, so they are not cached.
+    # The floorplan is plain JSON-ready data: JSONResponse skips FastAPI's
+    # per-value encoder, which takes ten times longer than json.dumps here
+    memory_budget.admit("floorplan", len(graph.nodes) + len(graph.edges))
+    try:
+        return JSONResponse(shared_cache.get_or_compute("floorplan", graph, lambda: engine_pool.floorplan(graph)))
+    except EngineTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+@app.post("/partition")
+@profiled
+def partition_endpoint(request: PartitionRequest):
+    """Splits the graph's blocks across num_dies dies with the least die-to-die traffic."""
+    try:
+        check_partition_arguments(request.num_dies, request.max_imbalance)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    memory_budget.admit("partition", len(request.graph.nodes) + len(request.graph.edges))
+    try:
+        return JSONResponse(shared_cache.get_or_compute("partition", request, lambda: engine_pool.partition(request)))
+    except EngineTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+@app.post("/simulate")
+@profiled
+def simulate_endpoint(request: SimulationRequest):
+    """
+    Transaction-level simulation of the architecture: throughput, queueing
+    and per-link utilization. Under a memory budget the transaction count
+    may be lowered to fit (reported as downscaled_from).
+    """
+    try:
+        check_simulation_arguments(request.spec, request.transactions, request.load)
+        requested = request.transactions
+        request.transactions = memory_budget.fit("simulate", requested)
+        result = engine_pool.simulate(request)
+        if request.transactions < requested:
+            result["downscaled_from"] = requested
+        return JSONResponse(result)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except EngineTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+@app.post("/noc")
+@profiled
+def noc_endpoint(spec: ChipSpecification):
+    """Mesh, ring and crossbar NoCs for the spec's clusters, side by side."""
+    try:
+        return JSONResponse(noc_data(spec))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.post("/memory-model")
+@profiled
+def memory_model_endpoint(spec: ChipSpecification, tile: Optional[int] = None):
+    """SRAM tiling model for the spec (auto or fixed tile edge) and its SRAM size x memory type sweep."""
+    m = feasibility_metrics(spec)
+    try:
+        design = memory_hierarchy(spec, m["tops"], m["bandwidth"], tile)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"design": design, "sweep": memory_sweep(spec, m["tops"])}
+
+@app.post("/workload")
+@profiled
+def workload_endpoint(request: WorkloadRequest):
+    """Per-layer roofline of an uploaded network on the spec, and its end-to-end latency."""
+    memory_budget.admit("workload", len(request.workload.layers))
+    try:
+        return JSONResponse(analyze_workload(request.spec, request.workload))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.post("/yield")
+@profiled
+def yield_endpoint(spec: ChipSpecification, wafers: int = DEFAULT_WAFERS, seed: int = 0):
+    """
+    Monte Carlo yield and cost for the spec, and across nodes x die areas x
+    chiplet counts. Under a memory budget `wafers` may be lowered to fit.
+    """
+    try:
+        check_yield_arguments(wafers)
+        sampled = memory_budget.fit("yield", wafers, minimum=2, per_unit=len(PARTITIONINGS) + SWEEP_SIZE)
+        result = {"design": yield_data(spec, sampled, seed), "sweep": yield_sweep(sampled, seed)}
+        if sampled < wafers:
+            result["downscaled_from"] = wafers
+        return JSONResponse(result)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 @app.post("/generate-code")
+@profiled
 def generate_code_endpoint(spec: ChipSpecification):
+    memory_budget.admit("rtl", len(spec.standards))
     architecture = generate_architecture(spec) # Re-generate or pass graph? specificying spec is easier for MVP
     rtl = generate_rtl(spec, architecture)
     tb = generate_testbench(spec)
@@ -50,7 +229,64 @@ def generate_code_endpoint(spec: ChipSpecification):
         "testbench": tb
     }
 
+# --- Design sessions ---
+@app.post("/sessions", status_code=201)
+@profiled
+def create_session(graph: ArchitectureGraph):
+    """
+    Starts a design session holding `graph` and returns its id, version and
+    full floorplan. Edit it with PATCH /sessions/{id} instead of re-posting
+    the graph to /generate-floorplan.
+    """
+    memory_budget.admit("session", len(graph.nodes) + len(graph.edges))
+    try:
+        return JSONResponse(design_sessions.create(graph), status_code=201)
+    except EngineTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+@app.get("/sessions/{session_id}")
+def get_session(session_id: str):
+    """Current graph, version and floorplan, for a client that lost track."""
+    try:
+        return design_sessions.get(session_id)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Session not found.")
+
+@app.patch("/sessions/{session_id}")
+@profiled
+def patch_session(session_id: str, patch: SessionPatch):
+    """
+    Applies JSON-Patch-style ops (add/remove/replace on /nodes/<id>/... and
+    /edges/<id>/...) all-or-nothing. Returns the new version and only the
+    floorplan fields that changed; 409 if base_version is not current.
+    """
+    try:
+        return design_sessions.patch(session_id, patch.ops, patch.base_version)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Session not found.")
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "version": e.current})
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "op": e.index})
+    except EngineTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+@app.delete("/sessions/{session_id}", status_code=204)
+def delete_session(session_id: str):
+    if not design_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found.")
+    return Response(status_code=204)
+
+@app.websocket("/ws/live")
+async def live_updates_socket(websocket: WebSocket):
+    """
+    Interactive analyze/floorplan updates: bursts are coalesced, stale
+    computations cancelled and only the latest state's result is pushed.
+    """
+    await live_updates.serve(websocket)
+
 @app.post("/ai/analyze")
+@profiled
 def analyze_with_ai(spec: ChipSpecification):
     # Run deterministic analysis first to give context to AI
     feasibility = analyze_feasibility(spec)
@@ -58,16 +294,244 @@ def analyze_with_ai(spec: ChipSpecification):
     ai_result = ai_copilot.analyze_architecture(spec.dict(), feasibility.dict())
     return ai_result
 
+@app.post("/ai/analyze-batch")
+@profiled
+def analyze_batch_with_ai(specs: List[ChipSpecification]):
+    """
+    AI review of many candidate specs, packed into as few provider calls
+    as the token budget allows.
+    """
+    if len(specs) > MAX_BATCH_SPECS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SPECS} specs per batch.")
+    feasibility = [analyze_feasibility(spec) for spec in specs]
+    batch = ai_copilot.analyze_architecture_batch(
+        [spec.dict() for spec in specs], [f.dict() for f in feasibility]
+    )
+    batch["results"] = [
+        {"feasibility": f, "analysis": a} for f, a in zip(feasibility, batch["results"])
+    ]
+    return batch
+
 @app.post("/ai/optimize")
-def optimize_with_ai(spec: ChipSpecification, goal: str = "balanced"):
+@profiled
+def optimize_with_ai(spec: ChipSpecification, goal: str = "balanced", verify: bool = True):
     optimization = ai_copilot.suggest_optimization(spec.dict(), goal)
+    if verify and (optimization.get("optimized_spec") or optimization.get("changes")):
+        # Re-check the suggestion deterministically; only measured wins survive
+        optimization["verification"] = verify_optimization(spec, optimization, goal)
     return optimization
 
 @app.post("/ai/parse")
-def parse_ai_spec(request: dict):
+def parse_ai_spec(request: dict, response: Response):
     """
     Parses natural language text into a structured Chip Specification.
     Expects {"text": "I want a 5nm automotive chip..."}
+    Simple requests are answered by the local rule-based parser; the
+    X-Parse-Source and X-Parse-Confidence headers report which path ran.
     """
     text = request.get("text", "")
-    return ai_copilot.parse_natural_language_spec(text)
+    spec, source, confidence = ai_copilot.parse_spec(text)
+    response.headers["X-Parse-Source"] = source
+    response.headers["X-Parse-Confidence"] = f"{confidence:.2f}"
+    return spec
+
+# --- Background jobs ---
+@job_queue.register("sweep")
+def sweep_job(params: dict, ctx):
+    """Scores `spec` with `parameter` set to each of `values`."""
+    base, parameter, values = params["spec"], params["parameter"], params["values"][:MAX_SWEEP_POINTS]
+    points = []
+    for i, value in enumerate(values):
+        ctx.progress(i / len(values), f"{parameter}={value}")
+        try:
+            points.append({"value": value, **evaluate_spec(ChipSpecification(**{**base, parameter: value}))})
+        except ValueError as e:
+            points.append({"value": value, "error": str(e).splitlines()[0]})
+    return {"parameter": parameter, "points": points}
+
+@contextmanager
+def _job_admission():
+    """Memory admission inside a job: a busy server (503) defers the job, one too large (413) fails it."""
+    try:
+        yield
+    except MemoryBudgetExceeded as e:
+        if e.status_code == 503:
+            raise JobDeferred(str(e)) from e
+        raise
+
+@job_queue.register("floorplan")
+def floorplan_job(params: dict, ctx):
+    graph = ArchitectureGraph(**params)
+    with _job_admission():
+        memory_budget.admit("floorplan", len(graph.nodes) + len(graph.edges))
+    ctx.progress(0.0, "placing blocks")
+    try:
+        return engine_pool.floorplan(graph, JOB_ENGINE_TIMEOUT, should_cancel=ctx.cancelled)
+    except EngineCancelled:
+        raise JobCancelled()
+
+@job_queue.register("partition")
+def partition_job(params: dict, ctx):
+    request = PartitionRequest(**params)
+    check_partition_arguments(request.num_dies, request.max_imbalance)
+    with _job_admission():
+        memory_budget.admit("partition", len(request.graph.nodes) + len(request.graph.edges))
+    ctx.progress(0.0, f"partitioning across {request.num_dies} dies")
+    try:
+        return engine_pool.partition(request, JOB_ENGINE_TIMEOUT, should_cancel=ctx.cancelled)
+    except EngineCancelled:
+        raise JobCancelled()
+
+@job_queue.register("simulate")
+def simulate_job(params: dict, ctx):
+    request = SimulationRequest(**params)
+    check_simulation_arguments(request.spec, request.transactions, request.load)
+    with _job_admission():
+        request.transactions = memory_budget.fit("simulate", request.transactions)
+    ctx.progress(0.0, f"simulating {request.transactions} transactions")
+    try:
+        return engine_pool.simulate(request, JOB_ENGINE_TIMEOUT, should_cancel=ctx.cancelled)
+    except EngineCancelled:
+        raise JobCancelled()
+
+@job_queue.register("ai_batch")
+def ai_batch_job(params: dict, ctx):
+    """Batch AI review, run in slices so progress and cancellation are observable."""
+    specs = [ChipSpecification(**s) for s in params["specs"]]
+    step = ai_engine.BATCH_MAX_SPECS
+    results, batches, backfilled = [], 0, 0
+    for start in range(0, len(specs), step):
+        ctx.progress(start / len(specs), f"analyzing designs {start + 1}-{min(start + step, len(specs))}")
+        chunk = specs[start:start + step]
+        feasibility = [analyze_feasibility(spec) for spec in chunk]
+        batch = ai_copilot.analyze_architecture_batch([s.dict() for s in chunk], [f.dict() for f in feasibility])
+        results += [{"feasibility": f.dict(), "analysis": a} for f, a in zip(feasibility, batch["results"])]
+        batches += batch["batches"]
+        backfilled += batch["backfilled"]
+    return {"results": results, "batches": batches, "backfilled": backfilled}
+
+@job_queue.register("optimize")
+def optimize_job(params: dict, ctx):
+    spec, goal = ChipSpecification(**params["spec"]), params.get("goal", "balanced")
+    ctx.progress(0.0, "asking the AI for an optimization")
+    optimization = ai_copilot.suggest_optimization(spec.dict(), goal)
+    if params.get("verify", True) and (optimization.get("optimized_spec") or optimization.get("changes")):
+        ctx.progress(0.5, "verifying the suggestion")
+        optimization["verification"] = verify_optimization(spec, optimization, goal)
+    return optimization
+
+def _job_or_404(job_id: str) -> dict:
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+@app.post("/jobs", status_code=202)
+def submit_job(request: JobRequest):
+    """
+    Queues a long-running job and returns its ID at once. Kinds: sweep
+    ({spec, parameter, values}), floorplan (an ArchitectureGraph),
+    partition ({graph, num_dies, max_imbalance}), simulate ({spec, graph,
+    transactions, load, seed}), ai_batch ({specs}) and optimize ({spec,
+    goal, verify}).
+    """
+    try:
+        job = job_queue.submit(request.kind, request.params)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind. Choose from: {', '.join(job_queue.handlers)}.")
+    job["url"] = f"/jobs/{job['id']}"
+    return job
+
+@app.get("/jobs")
+def list_jobs(status: Optional[str] = None, limit: int = 50):
+    return job_queue.list(status, min(limit, 500))
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status, progress (0..1) and, while queued, the position in the queue."""
+    job = _job_or_404(job_id)
+    if job["status"] == SUCCEEDED:
+        job["result_url"] = f"/jobs/{job_id}/result"
+    return job
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    _job_or_404(job_id)
+    return job_queue.cancel(job_id)
+
+@app.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    job = _job_or_404(job_id)
+    if job["status"] != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}; no result to download.")
+    return JSONResponse(
+        job_queue.result(job_id),
+        headers={"Content-Disposition": f'attachment; filename="job-{job_id}.json"'}
+    )
+
+@app.get("/ai/usage")
+def ai_usage():
+    """Per-provider token totals and the most recent AI calls."""
+    return ai_copilot.usage.summary()
+
+@app.get("/ai/health")
+def ai_health():
+    """Circuit breaker state and adaptive timeout for each AI provider."""
+    return ai_copilot.provider_health()
+
+@app.get("/debug/startup")
+def debug_startup():
+    """Import times, readiness and time to first request for this process."""
+    return startup_report()
+
+@app.get("/debug/cache")
+def debug_cache():
+    """Entries and bytes per namespace in the cross-process result cache."""
+    return shared_cache.stats()
+
+@app.get("/debug/memory")
+def debug_memory(top: int = memory_budget.TOP_ALLOCATORS):
+    """
+    Memory use against the budget, per-cache bytes and caps, and with
+    tracing on the top allocating lines and their growth since the last call.
+    """
+    caches = {
+        "shared_cache": {"bytes": shared_cache.stats().get("bytes", 0), "cap_bytes": shared_cache.max_bytes},
+        "sessions": design_sessions.memory(),
+        "profiles": profiler.memory(),
+    }
+    return memory_budget.report(caches, max(1, min(top, 100)))
+
+def _require_profile_token(request: Request):
+    if not profiler.token_valid(request.headers.get("X-Profile") or request.query_params.get("profile")):
+        raise HTTPException(status_code=403, detail="Needs the profiling token.")
+
+@app.post("/debug/memory/tracing")
+def start_memory_tracing(request: Request, frames: int = 1):
+    """Starts tracemalloc (costly: every allocation is recorded). Needs the profiling token."""
+    _require_profile_token(request)
+    memory_budget.start_tracing(min(frames, 25))
+    return {"tracing": True}
+
+@app.delete("/debug/memory/tracing")
+def stop_memory_tracing(request: Request):
+    _require_profile_token(request)
+    memory_budget.stop_tracing()
+    return {"tracing": False}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus text exposition of request, stage, provider and cache metrics."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profiles/{profile_id}", response_class=PlainTextResponse)
+def debug_profile(profile_id: str, request: Request):
+    """
+    Collapsed stacks for a profiled request (render with flamegraph.pl or
+    speedscope). Needs the same token as the profiling request.
+    """
+    token = request.headers.get("X-Profile") or request.query_params.get("profile")
+    text = profiler.get_profile(profile_id) if profiler.token_valid(token) else None
+    if text is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return PlainTextResponse(text)
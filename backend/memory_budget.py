@@ -0,0 +1,232 @@
+import os
+import gc
+import threading
+import tracemalloc
+from typing import Any, Dict, Optional
+
+from metrics import MEMORY_ADMISSIONS
+
+# Memory budget mode. The container is capped (cloudrun.yaml: 512Mi) and
+# an overrun is an OOM kill of every request in flight, so when a budget
+# is set (SLICEAI_MEMORY_BUDGET_MB, else the cgroup's memory.max) the
+# server keeps inside it:
+# - the in-memory caches take fixed shares of it as byte caps, evicting
+#   least recently used entries beyond them;
+# - requests are admitted against an estimate of their working set (per
+#   node, transaction, ...; measured with tracemalloc, as bench_engines
+#   reports them): rejected with 413 if one request alone would exceed
+#   REQUEST_SHARE, with 503 while the container is too full to take it,
+#   and engines with a sample count (simulation, yield) are downscaled to
+#   fit instead;
+# - /debug/memory reports usage, the caches and, with tracing on
+#   (SLICEAI_TRACEMALLOC=<frames> or POST /debug/memory/tracing), the top
+#   allocating lines and their growth since the previous snapshot.
+# Without a budget, admission always passes and caches keep their defaults.
+
+
+def _container_limit() -> Optional[int]:
+    """The cgroup v2 memory limit, if any."""
+    try:
+        with open("/sys/fs/cgroup/memory.max") as f:
+            value = f.read().strip()
+        return None if value == "max" else int(value)
+    except (OSError, ValueError):
+        return None
+
+
+def _configured_budget() -> Optional[int]:
+    configured = os.environ.get("SLICEAI_MEMORY_BUDGET_MB")
+    if configured is not None:
+        return int(float(configured) * 1024 * 1024) or None  # 0 turns the mode off
+    return _container_limit()
+
+
+BUDGET_BYTES = _configured_budget()
+# Byte caps of the in-memory caches, as shares of the budget
+CACHE_SHARES = {"shared_cache": 0.1, "sessions": 0.05, "profiles": 0.01}
+# Most one request's estimated working set may take
+REQUEST_SHARE = 0.2
+# New work is admitted while usage plus its estimate stays under this share
+ADMIT_BELOW = 0.8
+
+# Working set per unit of each kind of request: engine peak plus the JSON reply
+UNIT_BYTES = {
+    "floorplan": 4096,  # per node or edge
+    "session": 6144,  # per node or edge: the floorplan plus the session's copy
+    "partition": 1024,  # per node or edge
+    "rtl": 256,  # per standard, over RTL_BASE_BYTES
+    "workload": 2048,  # per layer
+    "simulate": 160,  # per transaction
+    "yield": 48,  # per wafer per option
+}
+RTL_BASE_BYTES = 64 * 1024
+
+TOP_ALLOCATORS = 15
+TRACE_FRAMES = int(os.environ.get("SLICEAI_TRACEMALLOC", 0) or 0)
+
+_snapshot_lock = threading.Lock()
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+
+class MemoryBudgetExceeded(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+def enabled() -> bool:
+    return BUDGET_BYTES is not None
+
+
+def cache_cap(name: str, default: int) -> int:
+    """`default` bytes for cache `name`, lowered to its share of the budget."""
+    if BUDGET_BYTES is None:
+        return default
+    return min(default, int(BUDGET_BYTES * CACHE_SHARES[name]))
+
+
+def request_cap() -> Optional[int]:
+    return int(BUDGET_BYTES * REQUEST_SHARE) if BUDGET_BYTES is not None else None
+
+
+def estimate(kind: str, units: int) -> int:
+    return (RTL_BASE_BYTES if kind == "rtl" else 0) + UNIT_BYTES[kind] * max(0, units)
+
+
+# --- Usage ---
+def _read_int(path: str) -> Optional[int]:
+    try:
+        with open(path) as f:
+            return int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def process_rss() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def usage() -> Dict[str, Any]:
+    """
+    Bytes in use against the budget: the cgroup's (every process plus
+    /dev/shm, which is what the OOM killer counts) when readable, else
+    this process's resident set.
+    """
+    current = _read_int("/sys/fs/cgroup/memory.current")
+    if current is not None:
+        return {"bytes": current, "source": "cgroup"}
+    return {"bytes": process_rss() or 0, "source": "rss"}
+
+
+# --- Admission ---
+def _headroom() -> int:
+    """Bytes new work may still take, after a collection if usage looks high."""
+    limit = int(BUDGET_BYTES * ADMIT_BELOW)
+    free = limit - usage()["bytes"]
+    if free < request_cap():
+        gc.collect()
+        free = limit - usage()["bytes"]
+    return free
+
+
+def admit(kind: str, units: int):
+    """Raises MemoryBudgetExceeded if a `kind` request of `units` does not fit now."""
+    if BUDGET_BYTES is None:
+        return
+    needed = estimate(kind, units)
+    if needed > request_cap():
+        MEMORY_ADMISSIONS.inc(kind, "too_large")
+        raise MemoryBudgetExceeded(413, f"This {kind} request would need about {needed / 2**20:.0f} MB; "
+                                        f"the limit per request is {request_cap() / 2**20:.0f} MB.")
+    if needed > _headroom():
+        MEMORY_ADMISSIONS.inc(kind, "busy")
+        raise MemoryBudgetExceeded(503, "The server is near its memory budget; retry shortly.")
+    MEMORY_ADMISSIONS.inc(kind, "admitted")
+
+
+def fit(kind: str, requested: int, minimum: int = 1, per_unit: int = 1) -> int:
+    """
+    The largest count up to `requested` whose `kind` working set fits now
+    (each counted unit costs per_unit estimate units); raises
+    MemoryBudgetExceeded below `minimum`.
+    """
+    if BUDGET_BYTES is None:
+        return requested
+    room = min(request_cap(), _headroom())
+    allowed = min(requested, room // (UNIT_BYTES[kind] * per_unit))
+    if allowed < minimum and room < request_cap():
+        MEMORY_ADMISSIONS.inc(kind, "busy")
+        raise MemoryBudgetExceeded(503, "The server is near its memory budget; retry shortly.")
+    if allowed < minimum:
+        MEMORY_ADMISSIONS.inc(kind, "too_large")
+        raise MemoryBudgetExceeded(413, f"Even {minimum} units of this {kind} request exceed the "
+                                        f"{request_cap() / 2**20:.0f} MB limit per request.")
+    MEMORY_ADMISSIONS.inc(kind, "downscaled" if allowed < requested else "admitted")
+    return int(allowed)
+
+
+# --- Tracing ---
+def start_tracing(frames: int = 1):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(max(1, frames))
+
+
+def stop_tracing():
+    global _last_snapshot
+    with _snapshot_lock:
+        _last_snapshot = None  # snapshots hold a copy of every trace
+    tracemalloc.stop()
+
+
+def _allocators(top: int) -> Dict[str, Any]:
+    """Top allocating lines now, and the lines that grew most since the last call."""
+    global _last_snapshot
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+    with _snapshot_lock:
+        previous, _last_snapshot = _last_snapshot, snapshot
+    growth = snapshot.compare_to(previous, "lineno")[:top] if previous is not None else []
+    return {
+        "top_allocators": [{"location": _location(s.traceback), "bytes": s.size, "blocks": s.count}
+                           for s in snapshot.statistics("lineno")[:top]],
+        "growth": [{"location": _location(s.traceback), "bytes": s.size_diff, "blocks": s.count_diff}
+                   for s in growth if s.size_diff],
+    }
+
+
+def _location(traceback: tracemalloc.Traceback) -> str:
+    frame = traceback[0]
+    path = os.path.normpath(frame.filename).split(os.sep)
+    return f"{'/'.join(path[-2:])}:{frame.lineno}"
+
+
+def report(caches: Dict[str, Dict[str, int]], top: int = TOP_ALLOCATORS) -> Dict[str, Any]:
+    """The /debug/memory document; `caches` maps each cache to its bytes and cap."""
+    current = usage()
+    result: Dict[str, Any] = {
+        "budget_bytes": BUDGET_BYTES,
+        "usage_bytes": current["bytes"],
+        "usage_source": current["source"],
+        "process_rss_bytes": process_rss(),
+        "request_cap_bytes": request_cap(),
+        "admit_below_bytes": int(BUDGET_BYTES * ADMIT_BELOW) if BUDGET_BYTES is not None else None,
+        "caches": caches,
+        "gc_counts": list(gc.get_count()),
+        "tracing": tracemalloc.is_tracing(),
+    }
+    if tracemalloc.is_tracing():
+        traced, peak = tracemalloc.get_traced_memory()
+        result.update({"traced_bytes": traced, "traced_peak_bytes": peak, **_allocators(top)})
+    return result
+
+
+if TRACE_FRAMES:
+    start_tracing(TRACE_FRAMES)
@@ -0,0 +1,163 @@
+import math
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Memory-hierarchy model: how much off-chip traffic the on-chip SRAM saves.
+# A layer is treated as a GEMM (M x K activations times K x N weights)
+# computed output-stationary: a T x T output tile stays in SRAM while
+# K_SLICE-deep slices of both operands stream through, double-buffered.
+# Each activation row is then fetched once per column tile and each
+# weight once per row tile, so data reuse grows with the tile edge T, the
+# largest that the SRAM's buffer share can hold. The off-chip bandwidth
+# the MAC array needs at full rate follows from that traffic, and is
+# compared with what the DRAM sustains.
+#
+# The formulas are written once over a small math namespace: feasibility
+# checks evaluate them on Python floats, with the tiling cached per buffer
+# size and precision, sweeps on NumPy arrays broadcast over SRAM size x
+# memory type in one pass.
+
+# Rates: DDR4 ~3.2Gbps, DDR5 ~6.4Gbps, HBM2 ~2Gbps, HBM3 ~6.4Gbps
+MEM_RATE_MAP = {
+    "DDR4": 3.2, "DDR5": 6.4, "LPDDR5": 6.4,
+    "HBM2": 2.0, "HBM3": 6.4
+}
+# Bus width of one HBM stack
+HBM_WIDTH = 1024
+# Share of peak DRAM bandwidth sustained on streaming tile loads
+DRAM_EFFICIENCY = 0.7
+
+# Operand bytes by precision (Mixed Precision computes mostly in 16 bits)
+ELEMENT_BYTES = {"INT8": 1, "FP16": 2, "BF16": 2, "FP32": 4, "Mixed Precision": 2}
+ACCUMULATOR_BYTES = 4
+# Share of the SRAM the compiler can give to tile buffers, by on_chip_ratio
+BUFFER_SHARE = {"Low": 0.5, "Medium": 0.75, "High": 0.9}
+# Reduction depth of the operand slices streamed per step
+K_SLICE = 64
+# Layer the feasibility check sizes against: a mid-size transformer projection
+REFERENCE_GEMM = (1024, 1024, 1024)
+
+SWEEP_SRAM_MB = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+_SCALAR = SimpleNamespace(sqrt=math.sqrt, floor=math.floor, ceil=math.ceil, minimum=min, maximum=max)
+
+
+def peak_bandwidth(memory_type: str, ddr_width: int, channels: Optional[int]) -> float:
+    """Peak off-chip bandwidth in GB/s: rate x bus width x channels / 8."""
+    # HBM has massive bus width (e.g. 1024)
+    width = HBM_WIDTH if "HBM" in memory_type else ddr_width
+    return (MEM_RATE_MAP.get(memory_type, 3.2) * width * channels) / 8.0
+
+
+def buffer_bytes(spec) -> float:
+    return max(0, spec.sram_size or 0) * 1024 * 1024 * BUFFER_SHARE.get(spec.on_chip_ratio, BUFFER_SHARE["Low"])
+
+
+def element_bytes(spec) -> int:
+    return ELEMENT_BYTES.get(spec.precision, 1)
+
+
+def tile_edge(buffer: Any, elem: int, xp=_SCALAR) -> Any:
+    """
+    Largest output tile edge T whose buffers fit: T^2 accumulators plus two
+    double-buffered T x K_SLICE operand slices, ACC*T^2 + 4*K_SLICE*elem*T <= buffer.
+    """
+    slices = 4 * K_SLICE * elem
+    edge = (xp.sqrt(slices * slices + 4 * ACCUMULATOR_BYTES * buffer) - slices) / (2 * ACCUMULATOR_BYTES)
+    return xp.maximum(xp.floor(edge), 1)
+
+
+def tile_buffer_bytes(tile: int, elem: int) -> int:
+    return ACCUMULATOR_BYTES * tile * tile + 4 * K_SLICE * elem * tile
+
+
+def gemm_traffic(m: Any, n: Any, k: Any, tile: Any, elem: int, xp=_SCALAR) -> Any:
+    """Off-chip bytes for an M x N x K GEMM with T x T output tiles (clipped to the matrix)."""
+    return tiled_traffic(m * k * elem, k * n * elem, m * n * elem, m, n, tile, xp)
+
+
+def tiled_traffic(activations: Any, weights: Any, outputs: Any, m: Any, n: Any, tile: Any, xp=_SCALAR) -> Any:
+    """
+    Off-chip bytes for an M x N output computed in T x T tiles: the
+    activations are read once per column tile, the weights once per row
+    tile and the outputs written once.
+    """
+    rows, cols = xp.minimum(tile, m), xp.minimum(tile, n)
+    return activations * xp.ceil(n / cols) + weights * xp.ceil(m / rows) + outputs
+
+
+def _tiling(buffer: Any, elem: int, tile: Optional[int], xp) -> Tuple[Any, Any, Any, Any]:
+    """(tile edge, MACs per off-chip byte, off-chip bytes, untiled / tiled traffic) for REFERENCE_GEMM."""
+    m, n, k = REFERENCE_GEMM
+    edge = tile_edge(buffer, elem, xp) if tile is None else tile
+    traffic = gemm_traffic(m, n, k, edge, elem, xp)
+    # Without any reuse every MAC fetches both operands
+    untiled = 2 * elem * m * n * k + m * n * elem
+    return edge, m * n * k / traffic, traffic, untiled / traffic
+
+
+@lru_cache(maxsize=4096)
+def _scalar_tiling(buffer: float, elem: int, tile: Optional[int]) -> Tuple[Any, Any, Any, Any]:
+    # Depends only on sram_size, on_chip_ratio and precision, which few specs vary
+    return _tiling(buffer, elem, tile, _SCALAR)
+
+
+def _evaluate(tiling: Tuple[Any, Any, Any, Any], sustained: Any, tops: float, xp) -> Dict[str, Any]:
+    edge, reuse, traffic, amplification = tiling
+    # Full rate is tops * 1e12 ops/s, two ops per MAC
+    required = tops * 1e12 / 2 / reuse / 1e9
+    return {
+        "tile": edge,
+        "reuse_macs_per_byte": reuse,
+        "offchip_traffic_mb": traffic / (1024 * 1024),
+        "required_bandwidth_gbps": required,
+        "sustained_bandwidth_gbps": sustained,
+        # Operand bandwidth the array effectively sees through the SRAM
+        "effective_bandwidth_gbps": sustained * amplification,
+        "compute_utilization": xp.minimum(1.0, sustained / required) if tops > 0 else 1.0,
+    }
+
+
+def memory_hierarchy(spec, tops: float, bandwidth: float, tile: Optional[int] = None) -> Dict[str, Any]:
+    """The model for one spec, given its peak TOPS and peak off-chip GB/s."""
+    buffer = buffer_bytes(spec)
+    elem = element_bytes(spec)
+    if tile is not None and tile < 1:
+        raise ValueError("tile must be at least 1")
+    if tile is not None and tile_buffer_bytes(tile, elem) > buffer:
+        raise ValueError(f"A {tile}x{tile} tile needs {tile_buffer_bytes(tile, elem) / 1024:.0f} KB of buffer; "
+                         f"{buffer / 1024:.0f} KB of SRAM is available to tiles")
+    result = _evaluate(_scalar_tiling(buffer, elem, tile), bandwidth * DRAM_EFFICIENCY, tops, _SCALAR)
+    bound = "memory" if result["compute_utilization"] < 1.0 else "compute"
+    return {**{name: round(value, 3) for name, value in result.items()},
+            "tile": int(result["tile"]), "buffer_kb": round(buffer / 1024, 1), "bound": bound}
+
+
+def memory_bottleneck(spec, tops: float, bandwidth: float) -> Optional[Dict[str, Any]]:
+    """
+    The rounded model numbers (as in memory_hierarchy) if the spec is
+    memory-bound at full rate, else None; the cheap path for feasibility checks.
+    """
+    result = _evaluate(_scalar_tiling(buffer_bytes(spec), element_bytes(spec), None), bandwidth * DRAM_EFFICIENCY,
+                       tops, _SCALAR)
+    if result["compute_utilization"] >= 1.0:
+        return None
+    return {name: round(value, 3) for name, value in result.items()}
+
+
+def memory_sweep(spec, tops: float, sram_mb: Sequence[float] = SWEEP_SRAM_MB,
+                 memory_types: Sequence[str] = tuple(MEM_RATE_MAP)) -> Dict[str, Any]:
+    """
+    The model over every SRAM size x memory type at once; each metric is a
+    len(sram_mb) x len(memory_types) nested list.
+    """
+    sizes = np.asarray(sram_mb, dtype=np.float64)[:, None]
+    buffer = sizes * 1024 * 1024 * BUFFER_SHARE.get(spec.on_chip_ratio, BUFFER_SHARE["Low"])
+    peak = np.array([peak_bandwidth(t, spec.ddr_width, spec.memory_channels) for t in memory_types])[None, :]
+    result = _evaluate(_tiling(buffer, element_bytes(spec), None, np), peak * DRAM_EFFICIENCY, tops, np)
+    grid = {name: np.round(np.broadcast_to(value, (len(sizes), len(memory_types))), 3).tolist()
+            for name, value in result.items()}
+    return {"sram_mb": [float(s) for s in sram_mb], "memory_types": list(memory_types), **grid}
@@ -0,0 +1,194 @@
+import time
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Sequence
+
+# In-process metrics in the Prometheus text exposition format.
+# Each metric keeps a dict keyed by label values behind its own lock, so
+# recording is a dict lookup and a few additions. GET /metrics renders them.
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+AI_BUCKETS = (0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 30.0)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # per-bucket counts (+Inf last), sum, count
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._values.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, c in zip(list(self.buckets) + ["+Inf"], counts):
+                cumulative += c
+                le = 'le="+Inf"' if bound == "+Inf" else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+# --- Metric definitions ---
+HTTP_REQUESTS = Counter("sliceai_http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status"))
+HTTP_LATENCY = Histogram("sliceai_http_request_duration_seconds", "HTTP request latency by route.", ("route",))
+HTTP_IN_FLIGHT = Gauge("sliceai_http_requests_in_flight", "HTTP requests currently being served.")
+
+STAGE_LATENCY = Histogram("sliceai_stage_duration_seconds", "Latency of internal pipeline stages.", ("stage",))
+STAGE_IN_FLIGHT = Gauge("sliceai_stage_in_flight", "Internal stages currently running.", ("stage",))
+
+AI_CALLS = Counter("sliceai_ai_provider_calls_total", "AI provider calls by outcome.", ("provider", "method", "outcome"))
+AI_LATENCY = Histogram("sliceai_ai_provider_duration_seconds", "AI provider call latency.", ("provider", "outcome"), buckets=AI_BUCKETS)
+AI_TOKENS = Counter("sliceai_ai_tokens_total", "AI tokens by provider and kind (input, cached_input, output).", ("provider", "kind"))
+
+ENGINE_CALLS = Counter("sliceai_engine_pool_calls_total", "Engine calls by task and outcome (inline, ok, error, timeout, cancelled).", ("task", "outcome"))
+SESSION_PATCHES = Counter("sliceai_session_patches_total", "Design session patches by outcome (relayout, unchanged_layout, conflict, invalid).", ("outcome",))
+LIVE_UPDATES = Counter("sliceai_live_updates_total", "WebSocket live updates by channel and outcome (sent, error, superseded, cancelled).", ("channel", "outcome"))
+
+JOBS = Counter("sliceai_jobs_total", "Background job transitions by kind and status.", ("kind", "status"))
+JOB_QUEUE_DEPTH = Gauge("sliceai_job_queue_depth", "Background jobs waiting for a worker.")
+
+CACHE_REQUESTS = Counter("sliceai_cache_requests_total", "Cache lookups by cache and result.", ("cache", "result"))
+MEMORY_ADMISSIONS = Counter("sliceai_memory_admissions_total", "Memory budget checks by request kind and outcome (admitted, downscaled, too_large, busy).", ("kind", "outcome"))
+
+
+# --- Recording helpers ---
+@contextmanager
+def stage(name: str):
+    """Times a block as an internal stage."""
+    STAGE_IN_FLIGHT.inc(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, name)
+        STAGE_IN_FLIGHT.dec(name)
+
+
+def timed(name: str):
+    """Decorator form of stage()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class PhaseTimer:
+    """Records consecutive sub-phases of a stage: each lap() closes one."""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._last = time.perf_counter()
+
+    def lap(self, phase: str):
+        now = time.perf_counter()
+        STAGE_LATENCY.observe(now - self._last, f"{self.prefix}.{phase}")
+        self._last = now
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+
+    # Derived hit ratios, so dashboards do not need PromQL for the basics
+    lines.append("# HELP sliceai_cache_hit_ratio Share of cache lookups that hit.")
+    lines.append("# TYPE sliceai_cache_hit_ratio gauge")
+    caches = sorted({labels[0] for labels in list(CACHE_REQUESTS._values)})
+    for cache in caches:
+        hits, misses = CACHE_REQUESTS.get(cache, "hit"), CACHE_REQUESTS.get(cache, "miss")
+        ratio = hits / (hits + misses) if hits + misses else 0.0
+        lines.append(f'sliceai_cache_hit_ratio{{cache="{_escape(cache)}"}} {_format_value(ratio)}')
+    for (provider, kind) in sorted(k for k in list(AI_TOKENS._values) if k[1] == "input"):
+        total = AI_TOKENS.get(provider, "input")
+        cached = AI_TOKENS.get(provider, "cached_input")
+        ratio = cached / total if total else 0.0
+        lines.append(f'sliceai_cache_hit_ratio{{cache="prompt_{_escape(provider)}"}} {_format_value(ratio)}')
+    return "\n".join(lines) + "\n"
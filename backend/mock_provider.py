@@ -0,0 +1,349 @@
+"""
+Local stand-in for the Claude and Gemini APIs, for offline load and
+resilience testing.
+
+Usage:
+    python mock_provider.py [--port 9100] [--latency lognormal:1.2:0.4]
+                            [--error-rate 0.02] [--hang-rate 0.01] [--malformed-rate 0.05]
+
+Point the backend at it with:
+    CLAUDE_API_KEY=mock CLAUDE_BASE_URL=http://127.0.0.1:9100 \\
+    GEMINI_API_KEY=mock GEMINI_BASE_URL=http://127.0.0.1:9100 uvicorn main:app
+
+Serves POST /v1/messages (Claude Messages API, with "stream": true as SSE)
+and POST /v1beta/models/<model>:generateContent / :streamGenerateContent
+(Gemini). Answers are schema-shaped JSON chosen from the prompt (analysis,
+batch analysis, optimization or spec parsing). Latency distributions are
+"fixed:S", "uniform:LO:HI", "normal:MEAN:SD" or "lognormal:MEDIAN:SIGMA"
+in seconds. GET /stats returns request counts per provider and outcome;
+POST /config with a JSON body of behaviour fields (e.g.
+{"error_rate": 1.0, "provider": "claude"}) changes behaviour mid-run.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GEMINI_PATH = re.compile(r"^/v1(?:beta|alpha)?/models/(?P<model>[^:/]+):(?P<action>generateContent|streamGenerateContent)")
+
+# status -> (Claude error type, Gemini status)
+ERRORS = {
+    429: ("rate_limit_error", "RESOURCE_EXHAUSTED"),
+    500: ("api_error", "INTERNAL"),
+    503: ("overloaded_error", "UNAVAILABLE"),
+    529: ("overloaded_error", "UNAVAILABLE"),
+}
+
+
+def parse_distribution(text):
+    """'lognormal:1.2:0.4' -> zero-argument sampler returning seconds."""
+    kind, *params = text.split(":")
+    p = [float(x) for x in params]
+    if kind == "fixed":
+        return lambda rng: p[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(p[0], p[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(p[0], p[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(p[0]), p[1])
+    raise ValueError(f"Unknown latency distribution: {text}")
+
+
+class Behaviour:
+    """Failure and latency settings; `provider` limits failures to one provider."""
+
+    FIELDS = {
+        "latency": str, "error_rate": float, "error_statuses": list, "hang_rate": float, "hang_seconds": float,
+        "malformed_rate": float, "stream_chunks": int, "provider": str, "seed": int,
+    }
+
+    def __init__(self, latency="lognormal:1.2:0.4", error_rate=0.0, error_statuses=(500, 529, 429), hang_rate=0.0,
+                 hang_seconds=30.0, malformed_rate=0.0, stream_chunks=8, provider="all", seed=None):
+        self._lock = threading.Lock()
+        self.update(latency=latency, error_rate=error_rate, error_statuses=list(error_statuses), hang_rate=hang_rate,
+                    hang_seconds=hang_seconds, malformed_rate=malformed_rate, stream_chunks=stream_chunks,
+                    provider=provider, seed=seed)
+
+    def update(self, **changes):
+        with self._lock:
+            for key, value in changes.items():
+                if key not in self.FIELDS:
+                    raise ValueError(f"Unknown setting: {key}")
+                setattr(self, key, value if value is None else self.FIELDS[key](value))
+            self.sample_latency = parse_distribution(self.latency)
+            if "seed" in changes:
+                self.rng = random.Random(self.seed)
+
+    def settings(self):
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+    def draw(self, provider):
+        """One request's fate: (latency, outcome) with outcome in ok/error/hang/malformed."""
+        with self._lock:
+            latency = self.sample_latency(self.rng)
+            roll = self.rng.random()
+            if self.provider not in ("all", provider):
+                return latency, "ok", None
+            if roll < self.error_rate:
+                return latency, "error", self.rng.choice(self.error_statuses)
+            roll -= self.error_rate
+            if roll < self.hang_rate:
+                return self.hang_seconds, "hang", None
+            roll -= self.hang_rate
+            if roll < self.malformed_rate:
+                return latency, "malformed", None
+            return latency, "ok", None
+
+
+# --- Canned answers ---
+def answer_for(prompt):
+    """Schema-shaped JSON answer for the kind of request the prompt makes."""
+    if '"results"' in prompt:
+        indices = sorted({int(i) for i in re.findall(r'"i":\s*(\d+)', prompt)}) or [0]
+        return {"results": [{"index": i, **_analysis()} for i in indices]}
+    if '"optimized_spec"' in prompt:
+        return {
+            "optimized_spec": {"frequency": 0.8},
+            "changes": [{"parameter": "frequency", "old": "1.0", "new": 0.8, "reason": "Lower clock cuts dynamic power."}],
+            "trade_offs": "Roughly 20% lower throughput for lower power.",
+        }
+    if "Chip Specification JSON" in prompt:
+        return {
+            "purpose": "Mock Parsed Accelerator", "process_node": "7nm", "performance_goal": "Edge AI",
+            "compute_type": "Inference Only", "power_budget": 10.0, "standards": ["PCIe"],
+            "num_npu_clusters": 4, "mac_units_per_cluster": 512, "packaging_type": "Monolithic",
+            "temperature_range": "Commercial",
+        }
+    return _analysis()
+
+
+def _analysis():
+    return {
+        "summary": "Mock analysis: balanced design with moderate memory pressure.",
+        "bottlenecks": ["DDR bandwidth under peak NPU load"],
+        "reasoning": "Estimated compute demand exceeds sustained external bandwidth at full utilisation.",
+        "suggestions": [{"parameter": "axi_width", "action": "increase", "value": "256", "reason": "Relieves interconnect pressure."}],
+    }
+
+
+def _malform(text, rng):
+    """Damages a JSON answer the way real models sometimes do."""
+    choice = rng.randrange(3)
+    if choice == 0:
+        return "```json\n" + text + "\n```"
+    if choice == 1:
+        return "Here is the analysis:\n" + text[: max(1, int(len(text) * 0.7))]
+    return "I cannot produce JSON for this request."
+
+
+def _chunks(text, n):
+    size = max(1, math.ceil(len(text) / max(1, n)))
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+def _tokens(text):
+    return max(1, len(text) // 4)
+
+
+class MockProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    behaviour: Behaviour = None
+    stats: Counter = None
+    stats_lock = threading.Lock()
+    seen_system: set = None
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- Plumbing ---
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def _event(self, data, event=None):
+        line = (f"event: {event}\n" if event else "") + f"data: {json.dumps(data)}\n\n"
+        self.wfile.write(line.encode())
+        self.wfile.flush()
+
+    def _count(self, provider, outcome):
+        with self.stats_lock:
+            self.stats[(provider, outcome)] += 1
+
+    # --- Routes ---
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.stats_lock:
+                counts = [{"provider": p, "outcome": o, "count": c} for (p, o), c in sorted(self.stats.items())]
+            self._send_json(200, {"requests": counts, "settings": self.behaviour.settings()})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        try:
+            body = self._read_json()
+        except ValueError:
+            self._send_json(400, {"error": "invalid JSON body"})
+            return
+        if path == "/config":
+            try:
+                self.behaviour.update(**body)
+            except (ValueError, TypeError, IndexError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            self._send_json(200, self.behaviour.settings())
+        elif path == "/v1/messages":
+            self._claude(body)
+        elif GEMINI_PATH.match(path):
+            match = GEMINI_PATH.match(path)
+            self._gemini(body, match.group("model"), match.group("action") == "streamGenerateContent")
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _respond_text(self, provider, prompt):
+        """Applies the drawn latency/outcome; returns the text to send or None if an error was sent."""
+        latency, outcome, status = self.behaviour.draw(provider)
+        time.sleep(latency)
+        self._count(provider, outcome)
+        if outcome == "error":
+            error_type, google_status = ERRORS.get(status, ("api_error", "INTERNAL"))
+            if provider == "claude":
+                self._send_json(status, {"type": "error", "error": {"type": error_type, "message": "Mock provider failure"}})
+            else:
+                self._send_json(status, {"error": {"code": status, "message": "Mock provider failure", "status": google_status}})
+            return None
+        text = json.dumps(answer_for(prompt))
+        if outcome == "malformed":
+            text = _malform(text, self.behaviour.rng)
+        return text
+
+    def _claude(self, body):
+        messages = body.get("messages") or [{}]
+        content = messages[-1].get("content", "")
+        prompt = content if isinstance(content, str) else " ".join(b.get("text", "") for b in content if isinstance(b, dict))
+        system = body.get("system") or ""
+        system_text = system if isinstance(system, str) else " ".join(b.get("text", "") for b in system)
+        # Emulate prompt caching: a system prompt seen before counts as a cache read
+        with self.stats_lock:
+            cached = _tokens(system_text) if system_text in self.seen_system else 0
+            self.seen_system.add(system_text)
+
+        text = self._respond_text("claude", prompt)
+        if text is None:
+            return
+        usage = {
+            "input_tokens": _tokens(prompt) + _tokens(system_text) - cached,
+            "output_tokens": _tokens(text),
+            "cache_creation_input_tokens": 0 if cached else _tokens(system_text),
+            "cache_read_input_tokens": cached,
+        }
+        message = {
+            "id": f"msg_mock_{uuid.uuid4().hex[:16]}", "type": "message", "role": "assistant",
+            "model": body.get("model", "mock"), "stop_reason": "end_turn", "stop_sequence": None,
+        }
+        if not body.get("stream"):
+            self._send_json(200, {**message, "content": [{"type": "text", "text": text}], "usage": usage})
+            return
+
+        self._start_stream()
+        self._event({"type": "message_start", "message": {**message, "content": [], "stop_reason": None,
+                                                          "usage": {**usage, "output_tokens": 1}}}, "message_start")
+        self._event({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}, "content_block_start")
+        for piece in _chunks(text, self.behaviour.stream_chunks):
+            time.sleep(self.behaviour.sample_latency(self.behaviour.rng) / max(1, self.behaviour.stream_chunks) / 4)
+            self._event({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}}, "content_block_delta")
+        self._event({"type": "content_block_stop", "index": 0}, "content_block_stop")
+        self._event({"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                     "usage": {"output_tokens": usage["output_tokens"]}}, "message_delta")
+        self._event({"type": "message_stop"}, "message_stop")
+
+    def _gemini(self, body, model, stream):
+        contents = body.get("contents") or []
+        parts = [p for c in contents if isinstance(c, dict) for p in c.get("parts", [])]
+        prompt = " ".join(p.get("text", "") for p in parts if isinstance(p, dict))
+        text = self._respond_text("gemini", prompt)
+        if text is None:
+            return
+        usage = {"promptTokenCount": _tokens(prompt), "candidatesTokenCount": _tokens(text),
+                 "totalTokenCount": _tokens(prompt) + _tokens(text)}
+
+        def candidate(piece, final):
+            entry = {"content": {"role": "model", "parts": [{"text": piece}]}, "index": 0}
+            if final:
+                entry["finishReason"] = "STOP"
+            return {"candidates": [entry], "modelVersion": model, **({"usageMetadata": usage} if final else {})}
+
+        if not stream:
+            self._send_json(200, candidate(text, True))
+            return
+
+        self._start_stream()
+        pieces = _chunks(text, self.behaviour.stream_chunks)
+        for i, piece in enumerate(pieces):
+            time.sleep(self.behaviour.sample_latency(self.behaviour.rng) / max(1, len(pieces)) / 4)
+            self._event(candidate(piece, i == len(pieces) - 1))
+
+
+def make_server(host, port, behaviour):
+    handler = type("Handler", (MockProviderHandler,), {"behaviour": behaviour, "stats": Counter(), "seen_system": set()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline mock of the Claude and Gemini APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", default="lognormal:1.2:0.4", help="fixed:S | uniform:LO:HI | normal:MEAN:SD | lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with an HTTP error")
+    parser.add_argument("--error-statuses", default="500,529,429", help="comma-separated statuses to pick from")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of requests that stall for --hang-seconds")
+    parser.add_argument("--hang-seconds", type=float, default=30.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share of answers with fenced, truncated or missing JSON")
+    parser.add_argument("--stream-chunks", type=int, default=8)
+    parser.add_argument("--provider", default="all", choices=["all", "claude", "gemini"], help="provider the failures apply to")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    behaviour = Behaviour(
+        latency=args.latency, error_rate=args.error_rate,
+        error_statuses=[int(s) for s in args.error_statuses.split(",") if s],
+        hang_rate=args.hang_rate, hang_seconds=args.hang_seconds, malformed_rate=args.malformed_rate,
+        stream_chunks=args.stream_chunks, provider=args.provider, seed=args.seed,
+    )
+    server = make_server(args.host, args.port, behaviour)
+    print(f"🧪 Mock provider listening on http://{args.host}:{args.port} ({json.dumps(behaviour.settings())})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional, Literal, Dict
+from pydantic import BaseModel, Field
+from typing import List, Optional, Literal, Dict, Any, ClassVar, Tuple
 
 class ChipSpecification(BaseModel):
     purpose: str
@@ -123,3 +123,214 @@ class AnalysisResult(BaseModel):
     area_estimate: str
     power_estimate: str
     max_freq_estimate: str
+
+# --- Multi-die partitioning ---
+class PartitionRequest(BaseModel):
+    graph: ArchitectureGraph
+    num_dies: int = 2
+    max_imbalance: float = 0.05 # allowed excess over an even share of area and power
+
+class DieAssignment(BaseModel):
+    die: int
+    blocks: List[str] # Node IDs
+    area_weight: float
+    power_weight: float
+
+class DieLink(BaseModel):
+    dies: List[int] # [a, b] with a < b
+    edges: int
+    bandwidth_weight: float
+    bandwidth_gbps: float
+
+class PartitionResult(BaseModel):
+    num_dies: int
+    dies: List[DieAssignment]
+    links: List[DieLink] # one per pair of dies with traffic between them
+    cut_edges: int
+    cut_bandwidth_weight: float
+    die_to_die_bandwidth_gbps: float
+    area_imbalance: float # heaviest die over an even share, minus one
+    power_imbalance: float
+    warnings: List[str] = []
+
+# --- Network-on-chip ---
+class NocTraffic(BaseModel):
+    pattern: str # uniform, hotspot
+    max_channel_load: float # busiest link's load, in multiples of one cluster's injection rate
+    avg_channel_load: float
+    saturation_gbps_per_cluster: float # injection rate at which the busiest link saturates
+    hottest_links: List[str]
+
+class NocTopology(BaseModel):
+    topology: str # Mesh, Ring, Crossbar
+    routers: int
+    channels: int # unidirectional links
+    diameter: int
+    avg_hops: float
+    avg_latency_ns: float # zero-load
+    max_latency_ns: float
+    link_bandwidth_gbps: float
+    bisection_bandwidth_gbps: float
+    traffic: List[NocTraffic]
+    warnings: List[str] = []
+
+class NocReport(BaseModel):
+    clusters: int
+    selected: str # the topology the spec's interconnect_type maps to
+    topologies: List[NocTopology]
+
+# --- Workloads ---
+class Layer(BaseModel):
+    name: str
+    op: Literal["gemm", "conv2d", "depthwise_conv2d", "elementwise"] = "gemm"
+    # gemm: (m x k) @ (k x n)
+    m: int = 1
+    n: int = 1
+    k: int = 1
+    # conv2d / depthwise_conv2d: height x width x in_channels input, square kernel
+    height: int = 1
+    width: int = 1
+    in_channels: int = 1
+    out_channels: int = 1 # ignored by depthwise_conv2d
+    kernel: int = 1
+    stride: int = 1
+    # elementwise: values produced (activation, add, pooling, ...)
+    elements: int = 1
+    batch: int = 1
+    precision: Optional[str] = None # defaults to the workload's
+
+class Workload(BaseModel):
+    name: str = "workload"
+    precision: Optional[str] = None # defaults to the spec's
+    layers: List[Layer]
+
+class WorkloadRequest(BaseModel):
+    spec: ChipSpecification
+    workload: Workload
+
+# --- Transaction-level simulation ---
+class SimulationRequest(BaseModel):
+    spec: ChipSpecification
+    graph: Optional[ArchitectureGraph] = None # defaults to the spec's generated architecture
+    transactions: int = 100_000
+    load: float = 1.0 # multiple of the issue rate the compute needs at full rate
+    seed: int = 0
+
+class StationStats(BaseModel):
+    name: str # a link "a->b", an interconnect or a memory controller
+    kind: str # link, interconnect, memory
+    transactions: int
+    utilization: float # busy share of the simulated time
+    avg_wait_ns: float # queueing before service
+    max_queue: int
+
+class SimulationReport(BaseModel):
+    transactions: int
+    reads: int
+    masters: List[str] # Node IDs issuing traffic
+    simulated_us: float
+    offered_gbps: float
+    sustained_gbps: float
+    throughput_mtps: float # million transactions per second
+    avg_latency_ns: float
+    p50_latency_ns: float
+    p99_latency_ns: float
+    avg_queueing_ns: float
+    p99_queueing_ns: float
+    bottleneck: str # busiest station
+    stations: List[StationStats] # busiest first
+    warnings: List[str] = []
+    downscaled_from: Optional[int] = None # transactions asked for, when the memory budget lowered them
+
+# --- Yield and cost ---
+class YieldOption(BaseModel):
+    dies: int # 1 = monolithic, else chiplets per system
+    die_area_mm2: float # per chiplet, with die-to-die overhead
+    gross_dies_per_wafer: int
+    good_dies_per_wafer: float
+    good_dies_ci95: List[float] # [low, high] of the mean
+    die_yield: float
+    die_yield_ci95: List[float]
+    cost_per_die: Optional[float] = None # $; None when no die is good
+    cost_per_die_ci95: List[Optional[float]]
+    cost_per_system: Optional[float] = None # all chiplets plus assembly
+    cost_per_system_ci95: List[Optional[float]]
+
+class YieldReport(BaseModel):
+    node: str
+    die_area_mm2: float # monolithic
+    defect_density_per_cm2: float
+    wafer_cost: float
+    wafers: int # sampled per option
+    samples: int # dies sampled
+    options: List[YieldOption]
+    recommended_dies: Optional[int] = None # cheapest per good system
+    warnings: List[str] = []
+
+# --- AI response schemas (validated by json_extract) ---
+# Every field has a default, so `required_fields` names the ones the model
+# must actually answer for the response to count as complete (and be cached).
+
+class AiSuggestion(BaseModel):
+    parameter: str
+    action: Optional[str] = None
+    value: Optional[Any] = None
+    reason: Optional[str] = ""
+
+class AiInsight(BaseModel):
+    required_fields: ClassVar[Tuple[str, ...]] = ("summary",)
+    summary: str = ""
+    bottlenecks: List[str] = []
+    reasoning: str = ""
+    suggestions: List[AiSuggestion] = []
+
+class AiBatchItem(AiInsight):
+    index: int
+
+class AiBatchInsight(BaseModel):
+    required_fields: ClassVar[Tuple[str, ...]] = ("results",)
+    results: List[AiBatchItem] = []
+
+class AiChange(BaseModel):
+    parameter: str
+    old: Optional[Any] = None
+    new: Optional[Any] = None
+    reason: Optional[str] = ""
+
+class AiOptimization(BaseModel):
+    required_fields: ClassVar[Tuple[str, ...]] = ("optimized_spec", "changes")
+    optimized_spec: Optional[dict] = None
+    changes: List[AiChange] = []
+    trade_offs: str = ""
+
+class ParsedSpec(BaseModel):
+    required_fields: ClassVar[Tuple[str, ...]] = ("purpose", "process_node")
+    purpose: Optional[str] = None
+    process_node: Optional[str] = None
+    performance_goal: Optional[str] = None
+    compute_type: Optional[str] = None
+    power_budget: Optional[float] = Field(None, gt=0)
+    frequency: Optional[float] = Field(None, gt=0)
+    standards: Optional[List[str]] = None
+    num_npu_clusters: Optional[int] = Field(None, ge=1)
+    mac_units_per_cluster: Optional[int] = Field(None, ge=1)
+    memory_type: Optional[str] = None
+    cooling_solution: Optional[str] = None
+    packaging_type: Optional[str] = None
+    temperature_range: Optional[str] = None
+    multi_die_partitioning: Optional[bool] = None
+
+# --- Background jobs ---
+class JobRequest(BaseModel):
+    kind: str # sweep, floorplan, partition, ai_batch, optimize
+    params: Dict[str, Any] = {}
+
+# --- Design sessions ---
+class PatchOp(BaseModel):
+    op: Literal["add", "remove", "replace"]
+    path: str # /nodes/<id>[/field/...] or /edges/<id>[/field/...]
+    value: Optional[Any] = None
+
+class SessionPatch(BaseModel):
+    base_version: Optional[int] = None # rejected with 409 unless it is the current version
+    ops: List[PatchOp]
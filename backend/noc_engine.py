@@ -0,0 +1,258 @@
+import math
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from models import ChipSpecification, NocReport
+from metrics import timed
+
+# Network-on-chip synthesis: builds the router network for a mesh, ring or
+# crossbar joining the NPU clusters (one cluster per router) and compares
+# them on hop count, zero-load latency, bisection bandwidth and per-link
+# load under uniform and memory-hotspot traffic.
+#
+# The networks are regular and use deterministic minimal routing (XY on
+# the mesh, the shorter way round on the ring, ties split), so all-pairs
+# hop counts are closed forms over router coordinates (one n x n array
+# pass). Traffic is a sum of outer products source rate x destination
+# share, and the load a term puts on a link is the sources before it times
+# the destinations past it: prefix sums, O(n) per term instead of a pass
+# over an n x n traffic matrix.
+
+TOPOLOGIES = ("Mesh", "Ring", "Crossbar")
+# Largest cluster count analysed (the hop matrix is n x n)
+MAX_CLUSTERS = 1024
+# Pipeline cycles per router and per link
+ROUTER_CYCLES = 2
+LINK_CYCLES = 1
+# Payload of one transaction (a cache line)
+PACKET_BYTES = 64
+# Share of each cluster's traffic that goes to the memory controllers
+HOTSPOT_SHARE = 0.5
+HOTTEST_LINKS = 5
+# Crossbars beyond this many ports are dominated by their wiring
+CROSSBAR_MAX_PORTS = 32
+
+# Traffic: terms (a, b) each sending a[s] * b[d] from cluster s to d (s != d)
+Traffic = List[Tuple[np.ndarray, np.ndarray]]
+
+
+class _Network(NamedTuple):
+    routers: int
+    channels: int
+    hops: np.ndarray  # (n, n) router hops between clusters (int16: n <= MAX_CLUSTERS)
+    # Zero-load cycles between two clusters: hops * cycles_per_hop + base_cycles
+    cycles_per_hop: int
+    base_cycles: int
+    bisection_channels: int
+    loads: Callable[[Traffic], np.ndarray]  # load per channel
+    label: Callable[[int], str]  # name of a channel
+
+
+def select_topology(spec: ChipSpecification) -> str:
+    """The topology spec.interconnect_type names; for AXI, what generate_architecture picks."""
+    kind = (spec.interconnect_type or "").lower()
+    for topology in TOPOLOGIES:
+        if topology.lower() in kind:
+            return topology
+    return "Mesh" if spec.num_npu_clusters > 4 else "Crossbar"
+
+
+def synthesize_noc(spec: ChipSpecification) -> NocReport:
+    return NocReport(**noc_data(spec))
+
+
+@timed("noc")
+def noc_data(spec: ChipSpecification) -> dict:
+    """synthesize_noc() as a plain dict."""
+    n = spec.num_npu_clusters
+    if not 1 <= n <= MAX_CLUSTERS:
+        raise ValueError(f"num_npu_clusters must be between 1 and {MAX_CLUSTERS} for NoC analysis")
+    if spec.frequency <= 0 or spec.axi_width <= 0:
+        raise ValueError("frequency and axi_width must be positive for NoC analysis")
+    traffic = {"uniform": _uniform(n), "hotspot": _hotspot(n, max(1, spec.memory_channels or 1))}
+    return {
+        "clusters": n,
+        "selected": select_topology(spec),
+        "topologies": [_analyze(topology, BUILDERS[topology](n), spec, traffic) for topology in TOPOLOGIES],
+    }
+
+
+# --- Traffic ---
+def _uniform(n: int, rate: float = 1.0) -> Traffic:
+    """Each cluster injects `rate`, spread evenly over the others."""
+    return [(np.full(n, rate), np.full(n, 1.0 / (n - 1)))] if n > 1 else []
+
+
+def _hotspot(n: int, controllers: int) -> Traffic:
+    """Uniform traffic with HOTSPOT_SHARE sent to the memory controllers' routers instead."""
+    hot = np.unique(np.linspace(0, n - 1, min(controllers, n)).round().astype(np.int64))
+    to_memory = np.zeros(n)
+    to_memory[hot] = 1.0 / len(hot)  # a controller's own cluster reaches it locally
+    return _uniform(n, 1.0 - HOTSPOT_SHARE) + [(np.full(n, HOTSPOT_SHARE), to_memory)]
+
+
+# --- Topologies ---
+def _mesh_shape(n: int) -> Tuple[int, int]:
+    rows = max(1, math.isqrt(n))
+    return rows, -(-n // rows)
+
+
+def _mesh(n: int) -> _Network:
+    """Rows x cols mesh, clusters filled row-major; the last row may have idle routers."""
+    rows, cols = _mesh_shape(n)
+    r, c = np.divmod(np.arange(n, dtype=np.int16), cols)
+    hops = np.abs(r[:, None] - r[None, :]) + np.abs(c[:, None] - c[None, :])
+    # Channels: east, west (rows x cols-1), then south, north (rows-1 x cols)
+    shapes = [(rows, cols - 1), (rows, cols - 1), (rows - 1, cols), (rows - 1, cols)]
+    sizes = np.cumsum([0] + [r_ * c_ for r_, c_ in shapes])
+
+    def loads(traffic: Traffic) -> np.ndarray:
+        total = np.zeros(int(sizes[-1]))
+        for a, b in traffic:
+            src = np.zeros(rows * cols)
+            dst = np.zeros(rows * cols)
+            src[:n], dst[:n] = a, b
+            src, dst = src.reshape(rows, cols), dst.reshape(rows, cols)
+            # X first, along the source row: sources left of the link times destinations right of it
+            src_left = np.cumsum(src, axis=1)
+            dst_left = np.cumsum(dst.sum(axis=0))
+            east = src_left[:, :-1] * (dst_left[-1] - dst_left[:-1])
+            west = (src_left[:, -1:] - src_left[:, :-1]) * dst_left[:-1]
+            # then Y, along the destination column
+            src_above = np.cumsum(src.sum(axis=1))[:, None]
+            dst_above = np.cumsum(dst, axis=0)
+            south = src_above[:-1] * (dst_above[-1] - dst_above[:-1])
+            north = (src_above[-1] - src_above[:-1]) * dst_above[:-1]
+            total += np.concatenate([east.ravel(), west.ravel(), south.ravel(), north.ravel()])
+        return total
+
+    def label(i: int) -> str:
+        part = int(np.searchsorted(sizes, i, side="right")) - 1
+        row, col = divmod(i - int(sizes[part]), shapes[part][1])
+        start = [(row, col), (row, col + 1), (row, col), (row + 1, col)][part]
+        end = [(row, col + 1), (row, col), (row + 1, col), (row, col)][part]
+        return f"({start[0]},{start[1]})->({end[0]},{end[1]})"
+
+    return _Network(rows * cols, int(sizes[-1]), hops, ROUTER_CYCLES + LINK_CYCLES, ROUTER_CYCLES,
+                    2 * min(rows, cols) if n > 1 else 0, loads, label)
+
+
+def _ring(n: int) -> _Network:
+    """Bidirectional ring; channels 0..n-1 run clockwise (i -> i+1), n..2n-1 back."""
+    position = np.arange(n, dtype=np.int16)
+    distance = np.abs(position[None, :] - position[:, None])
+    hops = np.minimum(distance, n - distance)
+    mirror = (-np.arange(n)) % n
+
+    def loads(traffic: Traffic) -> np.ndarray:
+        total = np.zeros(2 * n)
+        for a, b in traffic:
+            # counter-clockwise is clockwise on the mirrored ring
+            total += np.concatenate([_clockwise_loads(a, b), _clockwise_loads(a[mirror], b[mirror])[mirror]])
+        return total
+
+    def label(i: int) -> str:
+        return f"{i}->{(i + 1) % n}" if i < n else f"{i - n}->{(i - n - 1) % n}"
+
+    channels = 2 * n if n > 2 else 2 * (n - 1)
+    return _Network(n, channels, hops, ROUTER_CYCLES + LINK_CYCLES, ROUTER_CYCLES, 4 if n > 2 else 2 * (n - 1),
+                    loads, label)
+
+
+def _clockwise_loads(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Load on each clockwise link i -> i+1 when s sends a[s] * b[d] to d by the
+    shorter way round (half each way at exactly n/2). The link carries the
+    sources up to `full` positions before it to the destinations past it,
+    up to `full` positions after their source.
+    """
+    n = len(a)
+    full = (n - 1) // 2  # offsets always sent clockwise
+    # Positions unrolled over three turns so every window is contiguous
+    a3, b3 = np.tile(a, 3), np.tile(b, 3)
+    prefix_a = np.concatenate([[0.0], np.cumsum(a3)])
+    prefix_b = np.concatenate([[0.0], np.cumsum(b3)])
+    link = np.arange(n) + n
+    lo, hi = link - full + 1, link + 1  # sources [lo, hi)
+    # sum over sources s of a[s] * (b over (link, s + full])
+    reach = np.concatenate([[0.0], np.cumsum(a3[:2 * n] * prefix_b[np.arange(2 * n) + full + 1])])
+    loads = (reach[hi] - reach[lo]) - prefix_b[hi] * (prefix_a[hi] - prefix_a[lo])
+    if n % 2 == 0:
+        half = n // 2
+        ties = np.concatenate([[0.0], np.cumsum(a3[:2 * n] * b3[half:2 * n + half])])
+        loads += 0.5 * (ties[hi] - ties[link - half + 1])
+    return loads
+
+
+def _crossbar(n: int) -> _Network:
+    """One n-port switch: every pair is a single traversal, arbitrated over n inputs."""
+    hops = 1 - np.eye(n, dtype=np.int16)
+
+    def loads(traffic: Traffic) -> np.ndarray:
+        total = np.zeros(2 * n)
+        for a, b in traffic:
+            total += np.concatenate([a * (b.sum() - b), b * (a.sum() - a)])
+        return total
+
+    def label(i: int) -> str:
+        return f"in{i}" if i < n else f"out{i - n}"
+
+    return _Network(1, 2 * n, hops, ROUTER_CYCLES + math.ceil(math.log2(max(n, 2))), 0, n if n > 1 else 0,
+                    loads, label)
+
+
+BUILDERS: Dict[str, Callable[[int], _Network]] = {
+    "Mesh": _mesh,
+    "Ring": _ring,
+    "Crossbar": _crossbar,
+}
+
+
+# --- Analysis ---
+def _analyze(topology: str, network: _Network, spec: ChipSpecification, traffic: Dict[str, Traffic]) -> dict:
+    n = len(network.hops)
+    link_gbps = spec.axi_width / 8 * spec.frequency
+    serialization = math.ceil(PACKET_BYTES * 8 / spec.axi_width) - 1
+    pairs = n * (n - 1)
+    # The diagonal is zero, so whole-matrix sums are sums over distinct pairs
+    avg_hops = float(network.hops.sum(dtype=np.int64)) / pairs if pairs else 0.0
+    diameter = int(network.hops.max())
+    ns_per_cycle = 1.0 / spec.frequency
+
+    def latency_ns(hops: float) -> float:
+        cycles = hops * network.cycles_per_hop + network.base_cycles + serialization
+        return round(cycles * ns_per_cycle, 3) if pairs else 0.0
+
+    patterns = []
+    for pattern, terms in traffic.items():
+        loads = network.loads(terms)
+        peak = float(loads.max()) if loads.size else 0.0
+        hottest = np.argsort(-loads, kind="stable")[:HOTTEST_LINKS] if peak > 0 else []
+        patterns.append({
+            "pattern": pattern,
+            "max_channel_load": round(peak, 3),
+            "avg_channel_load": round(float(loads.mean()), 3) if loads.size else 0.0,
+            # Injection is capped by each cluster's own link
+            "saturation_gbps_per_cluster": round(link_gbps * min(1.0, 1.0 / peak) if peak > 0 else link_gbps, 2),
+            "hottest_links": [network.label(int(i)) for i in hottest],
+        })
+
+    warnings = []
+    if topology == "Crossbar" and n > CROSSBAR_MAX_PORTS:
+        warnings.append(f"A {n}-port crossbar needs {n * n} crosspoints; beyond {CROSSBAR_MAX_PORTS} ports its wiring dominates.")
+    if topology == "Ring" and diameter > 8:
+        warnings.append(f"Ring latency grows linearly with size: {diameter} hops worst case.")
+    return {
+        "topology": topology,
+        "routers": network.routers,
+        "channels": network.channels,
+        "diameter": diameter,
+        "avg_hops": round(avg_hops, 3),
+        "avg_latency_ns": latency_ns(avg_hops),
+        "max_latency_ns": latency_ns(diameter),
+        "link_bandwidth_gbps": round(link_gbps, 2),
+        "bisection_bandwidth_gbps": round(network.bisection_channels * link_gbps, 2),
+        "traffic": patterns,
+        "warnings": warnings,
+    }
@@ -0,0 +1,126 @@
+from typing import Dict, Any, List, Set, Tuple
+
+from pydantic import ValidationError
+
+from models import ChipSpecification
+from engine import analyze_feasibility, feasibility_metrics, generate_architecture
+from floorplan_engine import floorplan_metrics
+from compact_graph import CompactGraph
+
+# Deterministic verification of AI-suggested optimizations.
+# The suggestion is expanded into candidate specs (the full optimized spec,
+# all listed changes together, and each change on its own). Every candidate
+# is validated, then scored with analyze_feasibility and the metrics-only
+# floorplan; only candidates that improve the goal without raising a kind
+# of feasibility warning the base spec does not have are returned, best
+# first. Scoring is pure Python and microseconds per candidate, so it runs
+# inline.
+
+# goal -> (metric, +1 to maximize / -1 to minimize)
+GOAL_METRICS = {
+    "power": ("power_w", -1),
+    "performance": ("tops", +1),
+    "balanced": ("tops_per_watt", +1),
+    "area": ("area_mm2", -1),
+}
+
+REPORTED_METRICS = ["tops", "power_w", "tops_per_watt", "area_mm2", "bandwidth_gbps", "latency_ms"]
+
+# analyze_feasibility warning prefix -> category; the rest of each warning
+# carries the numbers, which change with every candidate
+WARNING_CATEGORIES = [
+    ("Unknown process node", "process_node"),
+    ("Freq ", "frequency"),
+    ("Est. Power", "power"),
+    ("Memory Bottleneck", "bandwidth"),
+    ("[Competition] AXI Width", "competition_axi_width"),
+    ("[Competition] Single cluster", "competition_clusters"),
+]
+
+
+def candidate_specs(base: Dict[str, Any], suggestion: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Candidate spec dicts derived from an AI suggestion, deduplicated."""
+    changes = [c for c in suggestion.get("changes", []) if isinstance(c, dict) and c.get("parameter") in base]
+    candidates = []
+    if isinstance(suggestion.get("optimized_spec"), dict):
+        candidates.append(("optimized_spec", {**base, **suggestion["optimized_spec"]}))
+    if changes:
+        candidates.append(("all_changes", {**base, **{c["parameter"]: c.get("new") for c in changes}}))
+        if len(changes) > 1:
+            for c in changes:
+                candidates.append((f"only_{c['parameter']}", {**base, c["parameter"]: c.get("new")}))
+
+    unique, seen = [], [base]
+    for name, spec in candidates:
+        if spec not in seen:
+            seen.append(spec)
+            unique.append((name, spec))
+    return unique
+
+
+def evaluate_spec(spec: ChipSpecification) -> Dict[str, Any]:
+    """Feasibility plus metrics-only floorplan numbers for one spec."""
+    feasibility = analyze_feasibility(spec)
+    m = feasibility_metrics(spec)
+    fp = floorplan_metrics(CompactGraph.from_graph(generate_architecture(spec)))
+    return {
+        "metrics": {
+            "tops": m["tops"],
+            "power_w": m["est_power"],
+            "tops_per_watt": m["eff_tops_w"],
+            "area_mm2": m["area_mm2"],
+            "bandwidth_gbps": m["bandwidth"],
+            "latency_ms": fp["latency_ms"],
+        },
+        "warnings": feasibility.warnings,
+    }
+
+
+def warning_categories(warnings: List[str]) -> Set[str]:
+    """The kinds of feasibility warning raised; unrecognised warnings are their own kind."""
+    return {next((category for prefix, category in WARNING_CATEGORIES if w.startswith(prefix)), w) for w in warnings}
+
+
+def _evaluate_candidate(candidate: Tuple[str, Dict[str, Any]]) -> Dict[str, Any]:
+    name, raw = candidate
+    try:
+        spec = ChipSpecification(**raw)
+    except ValidationError as e:
+        return {"name": name, "valid": False, "error": str(e).splitlines()[0]}
+    return {"name": name, "valid": True, "spec": spec.dict(), **evaluate_spec(spec)}
+
+
+def verify_optimization(base: ChipSpecification, suggestion: Dict[str, Any], goal: str) -> Dict[str, Any]:
+    """
+    Scores every candidate derived from `suggestion` against `base` and keeps
+    the ones that improve `goal`, ranked by relative improvement.
+    """
+    metric, direction = GOAL_METRICS.get(goal.lower(), GOAL_METRICS["balanced"])
+    baseline = evaluate_spec(base)
+    candidates = candidate_specs(base.dict(), suggestion)
+
+    evaluated = [_evaluate_candidate(c) for c in candidates]
+
+    verified, rejected = [], []
+    base_value = baseline["metrics"][metric]
+    base_warnings = warning_categories(baseline["warnings"])
+    for result in evaluated:
+        if not result["valid"]:
+            rejected.append({"name": result["name"], "reason": f"invalid spec: {result['error']}"})
+            continue
+        value = result["metrics"][metric]
+        gain = (value - base_value) * direction
+        if gain <= 0:
+            rejected.append({"name": result["name"], "reason": f"no {metric} improvement"})
+            continue
+        added = warning_categories(result["warnings"]) - base_warnings
+        if added:
+            rejected.append({"name": result["name"], "reason": f"adds feasibility warnings: {', '.join(sorted(added))}"})
+            continue
+        result["deltas"] = {k: round(result["metrics"][k] - baseline["metrics"][k], 4) for k in REPORTED_METRICS}
+        result["improvement_pct"] = round(100.0 * gain / abs(base_value), 2) if base_value else None
+        result.pop("valid")
+        verified.append(result)
+
+    verified.sort(key=lambda r: (r["metrics"][metric] - base_value) * direction, reverse=True)
+    return {"goal_metric": metric, "baseline": baseline, "verified": verified, "rejected": rejected}
@@ -0,0 +1,383 @@
+from collections import deque
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from models import ArchitectureGraph, ChipSpecification, PartitionResult
+from metrics import timed, PhaseTimer
+from cancellation import checkpoint
+from compact_graph import CompactGraph
+
+# Multi-die partitioning: assigns the blocks of an ArchitectureGraph to N
+# dies so every die gets about the same share of area and of power (the
+# enrichment weights the floorplanner uses) while the bandwidth_weight of
+# the edges cut between dies is as small as possible.
+#
+# Multilevel scheme, as in METIS: the graph is coarsened by contracting
+# heavy-edge matchings (plus pairs of leaves hanging off the same hub, which
+# a matching alone cannot shrink) down to a few dozen vertices per die. The
+# coarsest graph is split by growing BFS regions from several random
+# seeds; the split is then projected back level by level and refined at
+# each one with size-constrained label propagation, a k-way relative of
+# Fiduccia-Mattheyses that moves every boundary vertex with a positive gain
+# at once. Each step is a handful of array passes over the edges, so the
+# whole run is close to linear in the graph size.
+
+DEFAULT_DIES = 2
+MAX_DIES = 64
+DEFAULT_IMBALANCE = 0.05
+# Packaging types that put the design on several dies
+MULTI_DIE_PACKAGES = ("chiplet", "2.5d", "3d")
+# Die-to-die bandwidth one unit of Edge.bandwidth_weight stands for
+# (a 128-bit link at 1 GHz, the width the architecture generator uses)
+GBPS_PER_WEIGHT = 16.0
+
+# Coarsening stops at this many vertices per die
+COARSEST_PER_DIE = 24
+# ... or when a level shrinks the graph by less than this
+MIN_SHRINK = 0.9
+# Coarse vertices stay below this fraction of a die's budget
+MAX_VERTEX_SHARE = 0.25
+MATCH_ROUNDS = 3
+INITIAL_TRIES = 8
+REFINE_ROUNDS = 12
+
+
+class _Level(NamedTuple):
+    n: int
+    u: np.ndarray  # edge endpoints, each undirected edge once
+    v: np.ndarray
+    w: np.ndarray  # edge weights
+    vw: np.ndarray  # (n, 2) vertex weights: area and power shares
+
+
+def die_count(spec: ChipSpecification) -> int:
+    """Dies the spec asks for: DEFAULT_DIES for chiplet packaging, else 1."""
+    if spec.multi_die_partitioning or (spec.packaging_type or "").lower() in MULTI_DIE_PACKAGES:
+        return DEFAULT_DIES
+    return 1
+
+
+def partition_for_spec(spec: ChipSpecification, graph: ArchitectureGraph) -> Optional[PartitionResult]:
+    """The die split for a multi-die spec; None for a monolithic one."""
+    dies = die_count(spec)
+    return partition_graph(graph, dies) if dies > 1 else None
+
+
+def check_arguments(num_dies: int, max_imbalance: float):
+    """Raises ValueError for a die count or imbalance the partitioner rejects."""
+    if not 1 <= num_dies <= MAX_DIES:
+        raise ValueError(f"num_dies must be between 1 and {MAX_DIES}")
+    if max_imbalance < 0:
+        raise ValueError("max_imbalance must not be negative")
+
+
+def partition_graph(graph: ArchitectureGraph, num_dies: int = DEFAULT_DIES,
+                    max_imbalance: float = DEFAULT_IMBALANCE) -> PartitionResult:
+    return PartitionResult(**partition_data(graph, num_dies, max_imbalance))
+
+
+@timed("partition")
+def partition_data(graph: ArchitectureGraph, num_dies: int = DEFAULT_DIES,
+                   max_imbalance: float = DEFAULT_IMBALANCE, seed: int = 0) -> dict:
+    """partition_graph() as a plain dict. Deterministic for a given seed."""
+    check_arguments(num_dies, max_imbalance)
+    phases = PhaseTimer("partition")
+    cg = CompactGraph.from_graph(graph)
+    top = _top_level(cg)
+    phases.lap("load")
+    parts = partition_level(top, num_dies, max_imbalance, np.random.default_rng(seed), phases)
+    report = _report(cg, top, parts, num_dies, max_imbalance)
+    phases.lap("report")
+    return report
+
+
+def _top_level(cg: CompactGraph) -> _Level:
+    valid = cg.valid_edges()
+    u, v = cg.src[valid].astype(np.int64), cg.dst[valid].astype(np.int64)
+    w = np.maximum(cg.edge_weight[valid], 0.0)
+    keep = u != v
+    vw = np.stack([_shares(cg.area_weight), _shares(cg.power_weight)], axis=1)
+    return _Level(len(cg), u[keep], v[keep], w[keep], vw)
+
+
+def _shares(weights: np.ndarray) -> np.ndarray:
+    total = weights.sum()
+    return weights / total if total > 0 else np.full(len(weights), 1.0 / max(1, len(weights)))
+
+
+def partition_level(top: _Level, k: int, max_imbalance: float, rng: np.random.Generator,
+                    phases: Optional[PhaseTimer] = None) -> np.ndarray:
+    """Die index per vertex of `top`."""
+    if k == 1 or top.n == 0:
+        return np.zeros(top.n, dtype=np.int64)
+    cap = (1.0 + max_imbalance) / k
+    max_weight = MAX_VERTEX_SHARE * cap
+
+    # 1. Coarsen
+    levels: List[Tuple[_Level, np.ndarray]] = []
+    level = top
+    while level.n > COARSEST_PER_DIE * k:
+        cmap, nc = _match(level, max_weight, rng)
+        if nc > MIN_SHRINK * level.n:
+            break
+        levels.append((level, cmap))
+        level = _contract(level, cmap, nc)
+        checkpoint()
+    if phases:
+        phases.lap("coarsen")
+
+    # 2. Split the coarsest graph
+    parts = _initial(level, k, cap, rng)
+    if phases:
+        phases.lap("initial")
+
+    # 3. Project back and refine
+    for fine, cmap in reversed(levels):
+        parts = parts[cmap]
+        _rebalance(fine, parts, k, cap)
+        _refine(fine, parts, k, cap, rng)
+    if phases:
+        phases.lap("refine")
+    return parts
+
+
+# --- Coarsening ---
+def _heaviest(n: int, a: np.ndarray, b: np.ndarray, rating: np.ndarray) -> np.ndarray:
+    """For each vertex, the neighbour b over its heaviest edge (a, b); -1 if it has none."""
+    best = np.full(n, -1, dtype=np.int64)
+    if len(a):
+        order = np.lexsort((rating, a))
+        sa = a[order]
+        last = np.flatnonzero(np.r_[sa[1:] != sa[:-1], True])
+        best[sa[last]] = b[order][last]
+    return best
+
+
+def _match(level: _Level, max_weight: float, rng: np.random.Generator) -> Tuple[np.ndarray, int]:
+    """Coarse vertex per vertex and the coarse vertex count."""
+    n, u, v, w, vw = level
+    match = np.full(n, -1, dtype=np.int64)
+    a, b = np.concatenate([u, v]), np.concatenate([v, u])
+    # Jitter breaks ties between equally heavy edges at random
+    rating = np.concatenate([w, w]) * (1.0 + 1e-6 * rng.random(2 * len(w)))
+    anchor = _heaviest(n, a, b, rating)
+    fits = np.all(vw[a] + vw[b] <= max_weight, axis=1)
+    a, b, rating = a[fits], b[fits], rating[fits]
+
+    # Handshake matching: vertices whose heaviest free neighbours choose each other
+    for _ in range(MATCH_ROUNDS):
+        free = (match[a] < 0) & (match[b] < 0)
+        if not free.any():
+            break
+        best = _heaviest(n, a[free], b[free], rating[free])
+        proposing = np.flatnonzero(best >= 0)
+        mutual = proposing[best[best[proposing]] == proposing]
+        match[mutual] = best[mutual]
+
+    # Two-hop matching: pair up leftovers sharing their heaviest neighbour
+    # (the leaves of a bus), and isolated vertices with each other
+    lone = np.flatnonzero(match < 0)
+    lone = lone[np.argsort(anchor[lone], kind="stable")]
+    key = anchor[lone]
+    if len(lone) > 1:
+        starts = np.r_[True, key[1:] != key[:-1]]
+        run_start = np.maximum.accumulate(np.where(starts, np.arange(len(lone)), 0))
+        first = np.flatnonzero(((np.arange(len(lone)) - run_start) % 2 == 0)[:-1] & ~starts[1:])
+        x, y = lone[first], lone[first + 1]
+        ok = np.all(vw[x] + vw[y] <= max_weight, axis=1)
+        match[x[ok]], match[y[ok]] = y[ok], x[ok]
+
+    leader = np.where(match >= 0, np.minimum(np.arange(n), match), np.arange(n))
+    leaders, cmap = np.unique(leader, return_inverse=True)
+    return cmap, len(leaders)
+
+
+def _contract(level: _Level, cmap: np.ndarray, nc: int) -> _Level:
+    cu, cv = cmap[level.u], cmap[level.v]
+    keep = cu != cv
+    lo, hi = np.minimum(cu[keep], cv[keep]), np.maximum(cu[keep], cv[keep])
+    keys, inverse = np.unique(lo * nc + hi, return_inverse=True)
+    w = np.bincount(inverse, weights=level.w[keep], minlength=len(keys))
+    vw = np.stack([np.bincount(cmap, weights=level.vw[:, c], minlength=nc) for c in range(2)], axis=1)
+    return _Level(nc, keys // nc, keys % nc, w, vw)
+
+
+# --- Initial split ---
+def _bfs_order(level: _Level, start: int, rng: np.random.Generator) -> np.ndarray:
+    """Vertices in BFS order from `start`, restarting at random in other components."""
+    adjacency: List[List[int]] = [[] for _ in range(level.n)]
+    for a, b in zip(level.u.tolist(), level.v.tolist()):
+        adjacency[a].append(b)
+        adjacency[b].append(a)
+    seen = np.zeros(level.n, dtype=bool)
+    order = []
+    for root in [start, *rng.permutation(level.n).tolist()]:
+        if seen[root]:
+            continue
+        seen[root] = True
+        queue = deque([root])
+        while queue:
+            vertex = queue.popleft()
+            order.append(vertex)
+            for neighbour in adjacency[vertex]:
+                if not seen[neighbour]:
+                    seen[neighbour] = True
+                    queue.append(neighbour)
+    return np.array(order, dtype=np.int64)
+
+
+def _initial(level: _Level, k: int, cap: float, rng: np.random.Generator) -> np.ndarray:
+    """Best of INITIAL_TRIES BFS-grown splits: least overload, then smallest cut."""
+    share = level.vw.mean(axis=1)
+    best, best_score = None, None
+    for _ in range(INITIAL_TRIES):
+        checkpoint()
+        order = _bfs_order(level, int(rng.integers(level.n)), rng)
+        # Consecutive BFS runs of about 1/k of the weight each
+        middle = np.cumsum(share[order]) - share[order] / 2
+        parts = np.empty(level.n, dtype=np.int64)
+        parts[order] = np.minimum((middle * k).astype(np.int64), k - 1)
+        _rebalance(level, parts, k, cap)
+        _refine(level, parts, k, cap, rng)
+        score = (np.maximum(_loads(level, parts, k) - cap, 0).sum(), _cut(level, parts))
+        if best_score is None or score < best_score:
+            best, best_score = parts, score
+    return best
+
+
+# --- Refinement ---
+def _loads(level: _Level, parts: np.ndarray, k: int) -> np.ndarray:
+    """(k, 2) area and power share per die."""
+    return np.stack([np.bincount(parts, weights=level.vw[:, c], minlength=k) for c in range(2)], axis=1)
+
+
+def _cut(level: _Level, parts: np.ndarray) -> float:
+    return float(level.w[parts[level.u] != parts[level.v]].sum())
+
+
+def _connectivity(level: _Level, parts: np.ndarray, k: int) -> np.ndarray:
+    """(n, k) edge weight from each vertex into each die."""
+    index = np.concatenate([level.u * k + parts[level.v], level.v * k + parts[level.u]])
+    weights = np.concatenate([level.w, level.w])
+    return np.bincount(index, weights=weights, minlength=level.n * k).reshape(level.n, k)
+
+
+def _refine(level: _Level, parts: np.ndarray, k: int, cap: float, rng: np.random.Generator):
+    """
+    Size-constrained label propagation, in place: each round moves every
+    vertex whose best other die gains cut weight, best gains first, as long
+    as the die stays within `cap`. Rounds alternate between moves to higher
+    and to lower dies so two neighbours never swap dies in the same round.
+    """
+    rows = np.arange(level.n)
+    cut = _cut(level, parts)
+    idle = 0
+    for round_ in range(REFINE_ROUNDS):
+        checkpoint()
+        conn = _connectivity(level, parts, k)
+        own = conn[rows, parts]
+        conn[rows, parts] = -1.0
+        # Jitter breaks ties between equally connected dies at random
+        target = (conn + 1e-9 * rng.random(conn.shape)).argmax(axis=1)
+        gain = conn[rows, target] - own
+        forward = target > parts if round_ % 2 == 0 else target < parts
+        candidates = np.flatnonzero((gain > 0) & forward)
+        moved = _admit(level, parts, k, cap, candidates, target, gain)
+        if len(moved):
+            previous = parts[moved].copy()
+            parts[moved] = target[moved]
+            new_cut = _cut(level, parts)
+            if new_cut < cut - 1e-9:
+                cut, idle = new_cut, 0
+                continue
+            parts[moved] = previous  # simultaneous moves can interfere
+        idle += 1
+        if idle >= 2:
+            break
+
+
+def _admit(level: _Level, parts: np.ndarray, k: int, cap: float, candidates: np.ndarray,
+           target: np.ndarray, gain: np.ndarray) -> np.ndarray:
+    """The candidates that fit their target die, taken in order of gain."""
+    if not len(candidates):
+        return candidates
+    order = candidates[np.lexsort((-gain[candidates], target[candidates]))]
+    dest = target[order]
+    weights = level.vw[order]
+    running = np.cumsum(weights, axis=0)
+    starts = np.flatnonzero(np.r_[True, dest[1:] != dest[:-1]])
+    group = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(order)]))
+    running -= (running[starts] - weights[starts])[group]
+    room = cap - _loads(level, parts, k)[dest]
+    return order[np.all(running <= room + 1e-12, axis=1)]
+
+
+def _rebalance(level: _Level, parts: np.ndarray, k: int, cap: float):
+    """Moves the cheapest vertices out of overloaded dies, in place."""
+    loads = _loads(level, parts, k)
+    if np.all(loads <= cap + 1e-12):
+        return
+    conn = _connectivity(level, parts, k)
+    for die in np.argsort(-np.max(loads, axis=1)).tolist():
+        if np.all(loads[die] <= cap + 1e-12):
+            continue
+        members = np.flatnonzero(parts == die)
+        loss = conn[members, die] - np.max(np.delete(conn[members], die, axis=1), axis=1)
+        for vertex in members[np.argsort(loss, kind="stable")].tolist():
+            if np.all(loads[die] <= cap + 1e-12):
+                break
+            weight = level.vw[vertex]
+            # The best-connected die with room, else the lightest one
+            options = [d for d in np.argsort(-conn[vertex]).tolist() if d != die and np.all(loads[d] + weight <= cap)]
+            dest = options[0] if options else int(np.argmin(np.max(loads + weight, axis=1)))
+            if dest == die or np.max(loads[dest] + weight) >= np.max(loads[die]):
+                continue  # moving it would not even the load
+            parts[vertex] = dest
+            loads[die] -= weight
+            loads[dest] += weight
+
+
+# --- Report ---
+def _report(cg: CompactGraph, top: _Level, parts: np.ndarray, k: int, max_imbalance: float) -> dict:
+    area = np.bincount(parts, weights=cg.area_weight, minlength=k)
+    power = np.bincount(parts, weights=cg.power_weight, minlength=k)
+    members: List[List[str]] = [[] for _ in range(k)]
+    for node_id, die in zip(cg.ids, parts.tolist()):
+        members[die].append(node_id)
+    dies = [{"die": d, "blocks": members[d], "area_weight": float(area[d]), "power_weight": float(power[d])}
+            for d in range(k)]
+
+    pu, pv = parts[top.u], parts[top.v]
+    cut = pu != pv
+    pair = np.minimum(pu[cut], pv[cut]) * k + np.maximum(pu[cut], pv[cut])
+    counts = np.bincount(pair, minlength=k * k)
+    weights = np.bincount(pair, weights=top.w[cut], minlength=k * k)
+    links = [{"dies": [int(p // k), int(p % k)], "edges": int(counts[p]), "bandwidth_weight": float(weights[p]),
+              "bandwidth_gbps": round(float(weights[p]) * GBPS_PER_WEIGHT, 2)}
+             for p in np.flatnonzero(counts).tolist()]
+    cut_weight = float(top.w[cut].sum())
+
+    loads = _loads(top, parts, k)
+    imbalance = np.round(np.max(loads, axis=0) * k - 1.0, 4) if len(cg) else np.zeros(2)
+    warnings = []
+    if 0 < len(cg) < k:
+        warnings.append(f"Only {len(cg)} blocks for {k} dies: {k - len(cg)} dies stay empty.")
+    for c, name in enumerate(("Area", "Power")):
+        if imbalance[c] > max_imbalance + 1e-9:
+            heaviest = int(np.argmax(top.vw[:, c]))
+            warnings.append(
+                f"{name} imbalance {imbalance[c]:.0%} exceeds the {max_imbalance:.0%} target: the blocks are "
+                f"too coarse to split evenly (the largest, '{cg.ids[heaviest]}', holds {top.vw[heaviest, c]:.0%})."
+            )
+    return {
+        "num_dies": k,
+        "dies": dies,
+        "links": links,
+        "cut_edges": int(cut.sum()),
+        "cut_bandwidth_weight": cut_weight,
+        "die_to_die_bandwidth_gbps": round(cut_weight * GBPS_PER_WEIGHT, 2),
+        "area_imbalance": float(imbalance[0]),
+        "power_imbalance": float(imbalance[1]),
+        "warnings": warnings,
+    }
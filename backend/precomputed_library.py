@@ -0,0 +1,141 @@
+import os
+import json
+import math
+from typing import Dict, Any, List, Optional
+
+# In-memory index over precomputed_analysis.json.
+# The file is parsed once and every entry is reduced to a small weighted
+# feature vector, so picking the closest fallback analysis for a spec is a
+# linear scan over a few floats per entry instead of a disk read.
+
+PRECOMPUTED_PATH = os.path.join(os.path.dirname(__file__), 'precomputed_analysis.json')
+
+# Legacy top-level keys and the spec each one was written for.
+LEGACY_ANCHORS = {
+    "monolithic_default": {},
+    "multi_die_partitioning": {"multi_die_partitioning": True, "packaging_type": "Chiplet"},
+}
+
+# Defaults mirror ChipSpecification so partial specs land in the right place.
+SPEC_DEFAULTS = {
+    "process_node": "28nm",
+    "frequency": 1.0,
+    "power_budget": 5.0,
+    "performance_goal": "Edge AI",
+    "num_npu_clusters": 1,
+    "mac_units_per_cluster": 256,
+    "memory_type": "DDR4",
+    "standards": [],
+    "packaging_type": "Monolithic",
+    "multi_die_partitioning": False,
+}
+
+PERFORMANCE_GOALS = ["Edge AI", "Mobile AI", "Data Center AI", "Automotive AI", "IoT AI"]
+MULTI_DIE_PACKAGES = ("chiplet", "2.5d", "3d")
+
+# Per-feature weights: multi-die dominates so the old monolithic/multi-die
+# split is always respected, then scale and technology, then IO.
+FEATURE_WEIGHTS = [
+    10.0,  # multi_die_partitioning
+    3.0,   # packaging is multi-die
+    1.5,   # log2 process node (nm)
+    1.0,   # frequency (GHz)
+    1.0,   # log2 power budget (W)
+    1.5,   # log2 NPU clusters
+    0.5,   # log2 MACs per cluster
+    1.0,   # HBM memory
+    0.25,  # number of IO standards
+] + [0.75] * len(PERFORMANCE_GOALS)
+
+
+def _node_nm(node: Any) -> float:
+    digits = "".join(c for c in str(node) if c.isdigit() or c == ".")
+    try:
+        return max(float(digits), 1.0)
+    except ValueError:
+        return 28.0
+
+
+def _get(spec: Dict[str, Any], key: str):
+    value = spec.get(key)
+    return SPEC_DEFAULTS[key] if value is None else value
+
+
+def spec_features(spec: Dict[str, Any]) -> List[float]:
+    """Maps a (possibly partial) spec dict to a weighted feature vector."""
+    packaging = str(_get(spec, "packaging_type")).lower()
+    goal = _get(spec, "performance_goal")
+    raw = [
+        1.0 if _get(spec, "multi_die_partitioning") else 0.0,
+        1.0 if any(p in packaging for p in MULTI_DIE_PACKAGES) else 0.0,
+        math.log2(_node_nm(_get(spec, "process_node"))),
+        float(_get(spec, "frequency")),
+        math.log2(max(float(_get(spec, "power_budget")), 0.1)),
+        math.log2(max(int(_get(spec, "num_npu_clusters")), 1)),
+        math.log2(max(int(_get(spec, "mac_units_per_cluster")), 1)),
+        1.0 if "HBM" in str(_get(spec, "memory_type")) else 0.0,
+        float(len(_get(spec, "standards") or [])),
+    ] + [1.0 if goal == g else 0.0 for g in PERFORMANCE_GOALS]
+    return [v * w for v, w in zip(raw, FEATURE_WEIGHTS)]
+
+
+class PrecomputedLibrary:
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        self.data = data or {}
+        self.entries: List[Dict[str, Any]] = []
+        self._vectors: List[List[float]] = []
+
+        for key, anchor in LEGACY_ANCHORS.items():
+            if key in self.data:
+                self._index(key, anchor, self.data[key])
+        for entry in self.data.get("library", []):
+            self._index(entry.get("id", f"entry_{len(self.entries)}"), entry.get("spec", {}), entry["analysis"])
+
+    @classmethod
+    def load(cls, path: str = PRECOMPUTED_PATH) -> "PrecomputedLibrary":
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Fallback Load Error: {e}")
+            data = {}
+        library = cls(data)
+        print(f"📚 Precomputed library: {len(library)} analyses indexed")
+        return library
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _index(self, entry_id: str, spec: Dict[str, Any], analysis: Dict[str, Any]):
+        self.entries.append({"id": entry_id, "spec": spec, "analysis": analysis})
+        self._vectors.append(spec_features(spec))
+
+    def nearest(self, spec: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Returns the entry whose spec is closest to `spec`, or None if empty."""
+        if not self.entries:
+            return None
+        query = spec_features(spec)
+        best_i, best_d = 0, float("inf")
+        for i, vec in enumerate(self._vectors):
+            d = 0.0
+            for a, b in zip(query, vec):
+                d += (a - b) * (a - b)
+            if d < best_d:
+                best_i, best_d = i, d
+        return {**self.entries[best_i], "distance": math.sqrt(best_d)}
+
+    def lookup(self, spec: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Closest precomputed analysis for `spec` (a fresh top-level copy)."""
+        match = self.nearest(spec)
+        return dict(match["analysis"]) if match else None
+
+    def add(self, entry_id: str, spec: Dict[str, Any], analysis: Dict[str, Any]):
+        """Adds a new analysis; persisted under the `library` key by save()."""
+        self.data.setdefault("library", []).append({"id": entry_id, "spec": spec, "analysis": analysis})
+        self._index(entry_id, spec, analysis)
+
+    def save(self, path: str = PRECOMPUTED_PATH):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f, indent=4)
+        os.replace(tmp_path, path)
@@ -0,0 +1,160 @@
+import os
+import sys
+import hmac
+import time
+import uuid
+import functools
+import threading
+import contextvars
+from collections import Counter, OrderedDict
+from typing import Optional, Dict
+
+import memory_budget
+
+# Opt-in per-request profiling.
+# Disabled unless SLICEAI_PROFILE_TOKEN is set. A request carrying
+# `X-Profile: <token>` (or `?profile=<token>`) runs its @profiled endpoint
+# under a sampling profiler, or a deterministic one with
+# `X-Profile-Mode: trace`. The result is stored as collapsed stacks
+# ("a;b;c <weight>" lines, the input format of flamegraph.pl / speedscope)
+# and linked from the response via X-Profile-Id / X-Profile-Url.
+
+PROFILE_TOKEN = os.environ.get("SLICEAI_PROFILE_TOKEN")
+SAMPLE_INTERVAL = float(os.environ.get("SLICEAI_PROFILE_INTERVAL", 0.001))
+MAX_STORED_PROFILES = 20
+MAX_STORED_BYTES = memory_budget.cache_cap("profiles", 16 * 1024 * 1024)
+
+_current: contextvars.ContextVar = contextvars.ContextVar("sliceai_profile", default=None)
+_profiles: "OrderedDict[str, str]" = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+class ProfileSession:
+    def __init__(self, mode: str):
+        self.mode = mode if mode in ("sample", "trace") else "sample"
+        self.profile_id: Optional[str] = None
+
+
+def token_valid(token: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN and token and hmac.compare_digest(token, PROFILE_TOKEN))
+
+
+def begin(token: Optional[str], mode: Optional[str]) -> Optional[ProfileSession]:
+    """Starts a profiling session for the current request if the token matches."""
+    if not token_valid(token):
+        return None
+    session = ProfileSession(mode or "sample")
+    _current.set(session)
+    return session
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    # Parent directory disambiguates e.g. pydantic/main.py from our main.py
+    path = os.path.normpath(code.co_filename).split(os.sep)
+    return f"{'/'.join(path[-2:])}:{code.co_name}"
+
+
+def _store(collapsed: Counter) -> str:
+    profile_id = uuid.uuid4().hex[:12]
+    text = "\n".join(f"{stack} {int(weight)}" for stack, weight in collapsed.most_common() if weight > 0)
+    with _profiles_lock:
+        _profiles[profile_id] = text + "\n"
+        while len(_profiles) > MAX_STORED_PROFILES:
+            _profiles.popitem(last=False)
+        while len(_profiles) > 1 and sum(len(p) for p in _profiles.values()) > MAX_STORED_BYTES:
+            _profiles.popitem(last=False)
+    return profile_id
+
+
+def memory() -> Dict[str, int]:
+    """Stored profiles, for /debug/memory."""
+    with _profiles_lock:
+        return {"entries": len(_profiles), "bytes": sum(len(p) for p in _profiles.values()), "cap_bytes": MAX_STORED_BYTES}
+
+
+def get_profile(profile_id: str) -> Optional[str]:
+    with _profiles_lock:
+        return _profiles.get(profile_id)
+
+
+class _Sampler(threading.Thread):
+    """Samples one thread's stack every SAMPLE_INTERVAL seconds."""
+
+    def __init__(self, thread_id: int, stop_frame):
+        super().__init__(daemon=True, name="sliceai-profiler")
+        self.thread_id = thread_id
+        self.stop_frame = stop_frame
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.stop_frame:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack and not self._stop_event.is_set():
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self) -> Counter:
+        self._stop_event.set()
+        self.join()
+        return self.samples
+
+
+def _run_traced(fn, args, kwargs):
+    """Deterministic profile: self time per stack in microseconds."""
+    collapsed: Counter = Counter()
+    stack = []  # [name, start, child_time]
+
+    def hook(frame, event, arg):
+        if event == "call":
+            stack.append([_frame_name(frame), time.perf_counter(), 0.0])
+        elif event == "return" and stack:
+            name, start, child = stack[-1]
+            elapsed = time.perf_counter() - start
+            collapsed[";".join(entry[0] for entry in stack)] += (elapsed - child) * 1e6
+            stack.pop()
+            if stack:
+                stack[-1][2] += elapsed
+
+    sys.setprofile(hook)
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        sys.setprofile(None)
+    return result, collapsed
+
+
+def profiled(fn):
+    """Runs the endpoint under the profiler when the request asked for it."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        session = _current.get()
+        if session is None:
+            return fn(*args, **kwargs)
+
+        if session.mode == "trace":
+            result, collapsed = _run_traced(fn, args, kwargs)
+        else:
+            sampler = _Sampler(threading.get_ident(), sys._getframe())
+            sampler.start()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                collapsed = sampler.stop()
+        session.profile_id = _store(collapsed)
+        print(f"🔬 Profiled {fn.__name__} ({session.mode}) -> {session.profile_id}")
+        return result
+    return wrapper
+
+
+def profile_headers(session: Optional[ProfileSession]) -> Dict[str, str]:
+    if session is None or session.profile_id is None:
+        return {}
+    return {
+        "X-Profile-Id": session.profile_id,
+        "X-Profile-Url": f"/debug/profiles/{session.profile_id}",
+    }
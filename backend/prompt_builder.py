@@ -0,0 +1,107 @@
+import json
+import textwrap
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+from models import ChipSpecification
+
+# Compact prompt encoding for the AI copilot.
+# Specs are sent as a diff against the ChipSpecification defaults in
+# minified JSON, and the stable system prompt is wrapped so providers that
+# support prompt caching can reuse it across calls.
+
+# Fields the model never needs to see
+LEGACY_FIELDS = {"clock_domains", "competition_mode"}
+
+_model_fields = getattr(ChipSpecification, "model_fields", None) or ChipSpecification.__fields__
+SPEC_DEFAULTS = {name: field.default for name, field in _model_fields.items()}
+
+
+def compact_json(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def spec_delta(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Spec fields that differ from the defaults, without legacy fields."""
+    return {
+        k: v for k, v in spec.items()
+        if k not in LEGACY_FIELDS and (k not in SPEC_DEFAULTS or SPEC_DEFAULTS[k] != v)
+    }
+
+
+def compact_spec(spec: Dict[str, Any]) -> str:
+    return compact_json(spec_delta(spec))
+
+
+def analysis_delta(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Feasibility result without empty fields."""
+    return {k: v for k, v in analysis.items() if v not in (None, "", [], {})}
+
+
+def compact_analysis(analysis: Dict[str, Any]) -> str:
+    return compact_json(analysis_delta(analysis))
+
+
+def build_prompt(text: str) -> str:
+    """Strips the source indentation that the f-string prompts carry."""
+    return textwrap.dedent(text).strip()
+
+
+def claude_system_blocks(system_instruction: str) -> List[Dict[str, Any]]:
+    """
+    System prompt as a content block marked for Anthropic prompt caching.
+    The provider only caches prefixes above its minimum length; shorter
+    prompts are sent normally, so the marker is always safe to include.
+    """
+    return [{"type": "text", "text": system_instruction, "cache_control": {"type": "ephemeral"}}]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for budgeting."""
+    return (len(text) + 3) // 4
+
+
+def response_usage(provider: str, response: Any) -> Dict[str, int]:
+    """Normalizes the token usage reported by a provider response."""
+    usage = {"input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0}
+    if provider == "claude":
+        meta = getattr(response, "usage", None)
+        if meta is not None:
+            usage["input_tokens"] = (getattr(meta, "input_tokens", 0) or 0) \
+                + (getattr(meta, "cache_read_input_tokens", 0) or 0) \
+                + (getattr(meta, "cache_creation_input_tokens", 0) or 0)
+            usage["cached_input_tokens"] = getattr(meta, "cache_read_input_tokens", 0) or 0
+            usage["output_tokens"] = getattr(meta, "output_tokens", 0) or 0
+    elif provider == "gemini":
+        meta = getattr(response, "usage_metadata", None)
+        if meta is not None:
+            usage["input_tokens"] = getattr(meta, "prompt_token_count", 0) or 0
+            usage["cached_input_tokens"] = getattr(meta, "cached_content_token_count", 0) or 0
+            usage["output_tokens"] = getattr(meta, "candidates_token_count", 0) or 0
+    return usage
+
+
+class UsageLog:
+    """Bounded, thread-safe log of per-call token usage."""
+
+    def __init__(self, maxlen: int = 500):
+        self._calls = deque(maxlen=maxlen)
+        self._totals: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, method: str, usage: Dict[str, int], prompt_chars: int):
+        entry = {"provider": provider, "method": method, "prompt_chars": prompt_chars, **usage}
+        with self._lock:
+            self._calls.append(entry)
+            totals = self._totals.setdefault(provider, {"calls": 0, "input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0})
+            totals["calls"] += 1
+            for key in ("input_tokens", "cached_input_tokens", "output_tokens"):
+                totals[key] += usage.get(key, 0)
+        print(f"📊 {provider} {method}: {usage['input_tokens']} in ({usage['cached_input_tokens']} cached), {usage['output_tokens']} out")
+
+    def summary(self, recent: Optional[int] = 20) -> Dict[str, Any]:
+        with self._lock:
+            calls = list(self._calls)
+            totals = {k: dict(v) for k, v in self._totals.items()}
+        return {"totals": totals, "recent_calls": calls[-recent:] if recent else calls}
@@ -0,0 +1,128 @@
+"""
+Multi-worker server: imports the app once, then forks worker processes that
+share the listening socket.
+
+Usage:
+    python serve.py [--workers N] [--host 0.0.0.0] [--port 8000]
+
+The parent imports main (engines, models, AI client setup, precomputed
+library), freezes those objects out of the garbage collector so forked
+workers keep sharing their memory pages, recovers interrupted background
+jobs once, and then forks. Each worker runs its own uvicorn event loop on the
+inherited socket; floorplans and AI answers are shared through
+shared_cache.py. Workers that die are replaced, and the background jobs they
+were running are queued again. Without os.fork (Windows)
+or with one worker the server runs in a single process.
+
+Worker count: --workers, else SLICEAI_WORKERS, else the CPUs this process
+may use (affinity and cgroup quota).
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+import main
+from engine_pool import available_cpus
+
+RESPAWN_BACKOFF_S = 1.0
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, args) -> None:
+    config = uvicorn.Config(main.app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def supervise(sock: socket.socket, args) -> int:
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                run_worker(sock, args)
+            except BaseException:
+                code = 1
+            os._exit(code)
+        children[pid] = time.monotonic()
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for _ in range(args.workers):
+        spawn()
+    print(f"🚀 Serving on {args.host}:{args.port} with {args.workers} workers (pids {', '.join(map(str, children))})")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        print(f"⚠️ Worker {pid} exited ({os.waitstatus_to_exitcode(status)}); starting a replacement")
+        main.job_queue.requeue(pid)  # its background jobs would otherwise stay running forever
+        if time.monotonic() - started < RESPAWN_BACKOFF_S:
+            time.sleep(RESPAWN_BACKOFF_S)  # do not spin on a worker that crashes at startup
+        spawn()
+    return 0
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description="Serve the SliceAI backend with preloaded, forked workers.")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("SLICEAI_WORKERS", 0)) or available_cpus())
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--keep-alive", type=int, default=5, help="keep-alive timeout in seconds")
+    args = parser.parse_args()
+
+    sock = bind_socket(args.host, args.port)
+    main.job_queue.recover()
+    # Lets each worker size its engine pool to its share of the CPUs
+    os.environ["SLICEAI_WORKERS"] = str(args.workers)
+
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        print(f"🚀 Serving on {args.host}:{args.port} with 1 worker")
+        run_worker(sock, args)
+        return 0
+
+    # Objects created during import are never freed; keeping the collector off
+    # them stops it from dirtying their pages (and un-sharing them) in workers
+    gc.collect()
+    gc.freeze()
+    return supervise(sock, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
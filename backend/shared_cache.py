@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import glob
+from typing import Any, Callable, Dict, Optional
+
+from metrics import record_cache
+import memory_budget
+
+# Result cache shared by every worker process of the server (see serve.py).
+# Entries live in one SQLite file, on /dev/shm when available so it is plain
+# shared memory; each process opens its own connection after fork. Values
+# are compressed JSON keyed by a hash of the canonical request, the file is
+# capped at SLICEAI_CACHE_MAX_MB (lowered to its share of a memory budget:
+# /dev/shm is RAM) and the least recently used entries are evicted first.
+# /dev/shm outlives the server, so keys are salted with CODE_VERSION: after
+# a deploy or an engine change, results of the old code are never served
+# and age out of the file instead.
+
+_default_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+CACHE_PATH = os.environ.get("SLICEAI_CACHE_PATH", os.path.join(_default_dir, "sliceai-cache.db"))
+CACHE_MAX_BYTES = memory_budget.cache_cap("shared_cache", int(float(os.environ.get("SLICEAI_CACHE_MAX_MB", 64)) * 1024 * 1024))
+CACHE_ENABLED = os.environ.get("SLICEAI_CACHE", "1") not in ("0", "false", "False")
+
+# Re-stamping the access time is a write; skip it for entries touched recently
+TOUCH_INTERVAL_S = 30.0
+# Check the size cap every N writes rather than on every one
+EVICT_CHECK_EVERY = 32
+
+
+def _code_version() -> str:
+    """SLICEAI_CODE_VERSION (e.g. the deployed commit), else a digest of the backend's sources."""
+    version = os.environ.get("SLICEAI_CODE_VERSION")
+    if version:
+        return version
+    digest = hashlib.blake2b(digest_size=8)
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+CODE_VERSION = _code_version()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at);
+"""
+
+
+def to_jsonable(value):
+    """json.dumps fallback for pydantic models."""
+    if hasattr(value, "dict"):
+        return value.dict()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def model_to_json(model) -> str:
+    """JSON text of a pydantic model (v2 serializes it natively)."""
+    if hasattr(model, "model_dump_json"):
+        return model.model_dump_json()
+    return model.json()
+
+
+def model_from_json(cls, text: str):
+    if hasattr(cls, "model_validate_json"):
+        return cls.model_validate_json(text)
+    return cls.parse_raw(text)
+
+
+def cache_key(payload: Any) -> str:
+    """Stable digest of a JSON-like payload or pydantic model, salted with CODE_VERSION."""
+    if hasattr(payload, "dict") and hasattr(payload, "json"):
+        data = model_to_json(payload).encode()  # field order is fixed by the model
+    else:
+        data = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=to_jsonable).encode()
+    return hashlib.blake2b(CODE_VERSION.encode() + b"\0" + data, digest_size=16).hexdigest()
+
+
+class SharedCache:
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES, enabled: bool = CACHE_ENABLED):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._local = threading.local()
+        self._pid = None
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        """Connection for this thread and process (never shared across fork)."""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._local = threading.local()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # a cache: losing it on power failure is fine
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT value, expires_at, accessed_at FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at, accessed_at = row
+            if expires_at is not None and expires_at < now:
+                conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+                return None
+            if now - accessed_at > TOUCH_INTERVAL_S:
+                conn.execute("UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, namespace, key))
+            return json.loads(zlib.decompress(value))
+        except sqlite3.Error as e:
+            print(f"⚠️ Shared cache read failed: {e}")
+            return None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        if not self.enabled:
+            return
+        blob = zlib.compress(json.dumps(value, separators=(",", ":"), default=to_jsonable).encode(), 1)
+        if len(blob) > self.max_bytes // 8:
+            return  # one entry may not crowd out the rest
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, blob, len(blob), now + ttl if ttl else None, now)
+            )
+            self._writes += 1
+            if self._writes % EVICT_CHECK_EVERY == 0:
+                self.evict()
+        except sqlite3.Error as e:
+            print(f"⚠️ Shared cache write failed: {e}")
+
+    def evict(self):
+        """Drops expired entries, then least recently used ones down to 90% of the cap."""
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        victims = []
+        for namespace, key, size in conn.execute("SELECT namespace, key, size FROM cache ORDER BY accessed_at"):
+            victims.append((namespace, key))
+            freed += size
+            if freed >= target:
+                break
+        conn.executemany("DELETE FROM cache WHERE namespace = ? AND key = ?", victims)
+
+    def get_or_compute(self, namespace: str, payload: Any, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Cached result for `payload`, computing and storing it on a miss."""
+        if not self.enabled:
+            return compute()
+        key = cache_key(payload)
+        cached = self.get(namespace, key)
+        record_cache(f"shared_{namespace}", cached is not None)
+        if cached is not None:
+            return cached
+        value = compute()
+        self.set(namespace, key, value, ttl)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"enabled": False}
+        rows = self._conn().execute(
+            "SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM cache GROUP BY namespace"
+        ).fetchall()
+        return {
+            "enabled": True,
+            "path": self.path,
+            "max_bytes": self.max_bytes,
+            "namespaces": {ns: {"entries": n, "bytes": size} for ns, n, size in rows},
+            "bytes": sum(size for _, _, size in rows),
+        }
+
+
+shared_cache = SharedCache()
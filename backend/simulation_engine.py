@@ -0,0 +1,309 @@
+import math
+from collections import deque
+from graphlib import CycleError, TopologicalSorter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from models import ChipSpecification, ArchitectureGraph, SimulationReport
+from engine import feasibility_metrics, generate_architecture
+from memory_model import MEM_RATE_MAP, DRAM_EFFICIENCY, REFERENCE_GEMM, buffer_bytes, element_bytes, gemm_traffic, memory_hierarchy, tile_edge
+from noc_engine import ROUTER_CYCLES, LINK_CYCLES
+from compact_graph import CompactGraph, COMPUTE, INTERCONNECT, MEMORY
+from cancellation import checkpoint
+from metrics import timed
+
+# Transaction-level performance simulation of an ArchitectureGraph. Every
+# compute block adjacent to an interconnect is a master issuing cache-line
+# reads and writes to the memory controllers: it crosses its link, the
+# interconnect's arbiter (and any interconnects after it), the link into
+# the controller and the DRAM, then returns over the links. Each of those
+# is a FIFO station with a service time per transaction; the arbiters
+# grant on cycle edges with a rotating (round-robin) priority, like the
+# axi_interconnect template.
+#
+# Masters issue at the rate their compute needs (the memory model's
+# required bandwidth at full rate, split across the NPU clusters), with
+# exponential gaps, open loop. Routes follow the graph towards the nearest
+# controller, so the stations form a DAG, and a FIFO station fed in
+# arrival order obeys d[i] = max(a[i], d[i - 1]) + s[i]. Unrolled that is
+# d = S + running max of (a - S + s) with S the cumulative service, so
+# rather than popping one event at a time from a heap, each station is
+# simulated for all of its transactions in a few array passes, stations in
+# topological order. The departure times are exactly those of the event
+# loop, at millions of transactions per second.
+
+DEFAULT_TRANSACTIONS = 100_000
+MAX_TRANSACTIONS = 1_000_000
+MAX_LOAD = 16.0
+# One transaction moves a cache line
+BURST_BYTES = 64
+# Address and write-response beats occupy a lane for one cycle
+BEAT_CYCLES = 1.0
+# Host and other non-NPU masters issue this share of one cluster's traffic
+HOST_SHARE = 0.05
+BUS_CYCLES = 2
+DRAM_LATENCY_NS = 50.0
+# Stations busier than this are saturated: their queue grows for the whole run
+SATURATION = 0.95
+
+
+class _Station(NamedTuple):
+    name: str
+    kind: str  # "link", "interconnect" or "memory"
+    # Cycles per transaction: reads, writes
+    read_cycles: float
+    write_cycles: float
+    latency: float  # pipeline cycles after service
+    arbiter: bool  # grants on cycle edges in round-robin order
+
+
+def check_arguments(spec: ChipSpecification, transactions: int, load: float):
+    # Service times are cycles per burst at the AXI width and the DRAM's peak
+    for field in ("frequency", "axi_width", "memory_channels", "ddr_width"):
+        if not (getattr(spec, field) or 0) > 0:
+            raise ValueError(f"{field} must be positive for simulation")
+    if not 1 <= transactions <= MAX_TRANSACTIONS:
+        raise ValueError(f"transactions must be between 1 and {MAX_TRANSACTIONS}")
+    if not 0 < load <= MAX_LOAD:
+        raise ValueError(f"load must be above 0 and at most {MAX_LOAD}")
+
+
+def simulate(spec: ChipSpecification, graph: Optional[ArchitectureGraph] = None,
+             transactions: int = DEFAULT_TRANSACTIONS, load: float = 1.0, seed: int = 0) -> SimulationReport:
+    return SimulationReport(**simulate_data(spec, graph, transactions, load, seed))
+
+
+@timed("simulate")
+def simulate_data(spec: ChipSpecification, graph: Optional[ArchitectureGraph] = None,
+                  transactions: int = DEFAULT_TRANSACTIONS, load: float = 1.0, seed: int = 0) -> dict:
+    """simulate() as a plain dict. `load` scales the masters' issue rate; the graph defaults to the spec's."""
+    check_arguments(spec, transactions, load)
+    cg = CompactGraph.from_graph(graph if graph is not None else generate_architecture(spec))
+    clusters = max(1, spec.num_npu_clusters)
+    masters, routes = _routes(cg, clusters)
+    stations, paths = _stations(cg, spec, masters, routes)
+    checkpoint()
+
+    # --- Traffic ---
+    metrics = feasibility_metrics(spec)
+    elem = element_bytes(spec)
+    m, n, k = REFERENCE_GEMM
+    traffic = gemm_traffic(m, n, k, tile_edge(buffer_bytes(spec), elem), elem)
+    read_fraction = 1.0 - m * n * elem / traffic
+    # Transactions per cycle one cluster needs at full rate
+    required = memory_hierarchy(spec, metrics["tops"], metrics["bandwidth"])["required_bandwidth_gbps"]
+    cluster_rate = required / spec.frequency / BURST_BYTES / clusters * load
+    rates = np.array([weight * cluster_rate for _, weight in masters])
+    if not rates.sum() > 0:
+        raise ValueError("The design issues no memory traffic to simulate")
+    rng = np.random.default_rng(seed)
+    counts = _split(transactions, rates)
+    master_of = np.repeat(np.arange(len(masters)), counts)
+    issue = np.concatenate([np.cumsum(rng.exponential(1.0 / rate, count)) for rate, count in zip(rates, counts)])
+    # Each master interleaves its transactions over the controllers it reaches
+    first_route = np.cumsum([0] + [len(r) for r in routes])[:-1]
+    position = np.arange(transactions) - np.repeat(np.cumsum(counts) - counts, counts)
+    route_count = np.array([len(r) for r in routes])
+    route_of = first_route[master_of] + position % route_count[master_of]
+    read = rng.random(transactions) < read_fraction
+    checkpoint()
+
+    # --- Stations, in topological order ---
+    route_mask = np.zeros((len(stations), int(route_count.sum())), dtype=bool)
+    for r, path in enumerate(paths):
+        route_mask[path, r] = True
+    clock = issue.copy()
+    waited = np.zeros(transactions)
+    stats = []
+    for s in _order(paths, len(stations)):
+        station = stations[s]
+        members = np.flatnonzero(route_mask[s][route_of])
+        arrival = clock[members]
+        if station.arbiter:
+            arrival = np.ceil(arrival)
+            # Rotating priority: in cycle t, master t mod n is served first
+            order = np.lexsort(((master_of[members] - arrival) % len(masters), arrival))
+        else:
+            order = np.argsort(arrival, kind="stable")
+        members, arrival = members[order], arrival[order]
+        service = np.where(read[members], station.read_cycles, station.write_cycles)
+        done = np.cumsum(service)
+        departure = done + np.maximum.accumulate(arrival - done + service)
+        wait = np.maximum(departure - service - arrival, 0.0)
+        waited[members] += wait
+        clock[members] = departure + station.latency
+        # Transactions in the station when each one arrives (departures are in FIFO order)
+        queue = np.arange(len(members)) - np.searchsorted(departure, arrival, side="right")
+        if len(members):
+            stats.append((s, len(members), float(done[-1]), float(wait.mean()), int(queue.max()) + 1))
+        checkpoint()
+
+    # --- Report ---
+    ns_per_cycle = 1.0 / spec.frequency
+    makespan = float(clock.max())
+    latency = (clock - issue) * ns_per_cycle
+    total_bytes = transactions * BURST_BYTES
+    station_stats = sorted((
+        {"name": stations[s].name, "kind": stations[s].kind, "transactions": count,
+         "utilization": round(busy / makespan, 4), "avg_wait_ns": round(wait * ns_per_cycle, 3), "max_queue": depth}
+        for s, count, busy, wait, depth in stats), key=lambda station: -station["utilization"])
+    warnings = [f"{station['name']} is saturated ({station['utilization']:.0%} busy): the offered load exceeds it, "
+                f"so its queue grows for the whole run." for station in station_stats if station["utilization"] >= SATURATION]
+    p50, p99 = np.percentile(latency, [50, 99]).tolist()
+    return {
+        "transactions": transactions,
+        "reads": int(read.sum()),
+        "masters": [cg.ids[i] for i, _ in masters],
+        "simulated_us": round(makespan * ns_per_cycle / 1e3, 3),
+        "offered_gbps": round(float(rates.sum()) * BURST_BYTES * spec.frequency, 3),
+        "sustained_gbps": round(total_bytes / makespan * spec.frequency, 3),
+        "throughput_mtps": round(transactions / makespan * spec.frequency * 1e3, 3),
+        "avg_latency_ns": round(float(latency.mean()), 3),
+        "p50_latency_ns": round(p50, 3),
+        "p99_latency_ns": round(p99, 3),
+        "avg_queueing_ns": round(float(waited.mean()) * ns_per_cycle, 3),
+        "p99_queueing_ns": round(float(np.percentile(waited, 99)) * ns_per_cycle, 3),
+        "bottleneck": station_stats[0]["name"],
+        "stations": station_stats,
+        "warnings": warnings,
+    }
+
+
+# --- Topology ---
+def _routes(cg: CompactGraph, clusters: int) -> Tuple[List[Tuple[int, float]], List[List[List[int]]]]:
+    """
+    Masters as (node, clusters it stands for) and, per master, its routes:
+    node paths master, interconnects..., controller, one per controller
+    attached to the last interconnect.
+    """
+    indptr, neighbours, _ = cg.csr()
+    kind = _roles(cg)
+
+    def adjacent(i: int) -> List[int]:
+        return neighbours[indptr[i]:indptr[i + 1]].tolist()
+
+    # Breadth-first from the controllers through the interconnects: next hop towards the nearest one
+    controllers = [i for i in np.flatnonzero(kind == MEMORY).tolist()
+                   if any(kind[j] == INTERCONNECT for j in adjacent(i))]
+    if not controllers:
+        raise ValueError("The architecture has no memory controller on an interconnect to simulate")
+    toward: Dict[int, int] = {}
+    frontier = deque()
+    for c in controllers:
+        for j in adjacent(c):
+            if kind[j] == INTERCONNECT and j not in toward:
+                toward[j] = c
+                frontier.append(j)
+    while frontier:
+        i = frontier.popleft()
+        for j in adjacent(i):
+            if kind[j] == INTERCONNECT and j not in toward:
+                toward[j] = i
+                frontier.append(j)
+
+    npu = [i for i in np.flatnonzero(kind == COMPUTE).tolist()
+           if any(word in cg.labels[i].lower() for word in ("npu", "systolic"))]
+    masters, routes = [], []
+    for i in np.flatnonzero(kind == COMPUTE).tolist():
+        entry = next((j for j in adjacent(i) if j in toward), None)
+        if entry is None:
+            continue
+        path = [i, entry]
+        while kind[toward[path[-1]]] == INTERCONNECT:
+            path.append(toward[path[-1]])
+        ends = sorted({j for j in adjacent(path[-1]) if j in controllers})
+        masters.append((i, clusters / len(npu) if i in npu else HOST_SHARE))
+        routes.append([path + [c] for c in ends])
+    if not masters:
+        raise ValueError("No compute block reaches a memory controller through an interconnect")
+    return masters, routes
+
+
+def _roles(cg: CompactGraph) -> np.ndarray:
+    """
+    Block kinds with the labels the floorplan classes leave generic: "AXI4
+    Interconnect" and crossbars route, and HBM controllers name their memory.
+    """
+    memory_types = [t.lower() for t in MEM_RATE_MAP]
+    kind = cg.kind.copy()
+    for i, label in enumerate(cg.labels):
+        label = label.lower()
+        if "interconnect" in label or "crossbar" in label:
+            kind[i] = INTERCONNECT
+        elif any(t in label for t in memory_types):
+            kind[i] = MEMORY
+    return kind
+
+
+def _stations(cg: CompactGraph, spec: ChipSpecification, masters: List[Tuple[int, float]],
+              routes: List[List[List[int]]]) -> Tuple[List[_Station], List[List[int]]]:
+    """The stations and, per route, the stations it visits in order."""
+    metrics = feasibility_metrics(spec)
+    clusters = max(1, spec.num_npu_clusters)
+    channels = max(1, spec.memory_channels or 1)
+    lane_cycles = BURST_BYTES / (spec.axi_width / 8)
+    controllers = len({path[-1] for master_routes in routes for path in master_routes})
+    dram_bytes = metrics["bandwidth"] / spec.frequency / controllers  # peak, per cycle and controller
+    dram_cycles = BURST_BYTES / (dram_bytes * DRAM_EFFICIENCY)
+    # Links between interconnects and into a controller are as wide as its peak
+    memory_lanes = max(1, math.ceil(dram_bytes / (spec.axi_width / 8)))
+    master_lanes = {i: max(1.0, weight) for i, weight in masters}
+
+    kind = _roles(cg)
+    stations: List[_Station] = []
+    index: Dict[Tuple[str, int, int], int] = {}
+
+    def station(key: Tuple[str, int, int]) -> int:
+        if key not in index:
+            part, a, b = key
+            if part in ("forward", "back"):
+                # One AXI lane per cluster behind a master
+                lanes = master_lanes.get(a, master_lanes.get(b, memory_lanes))
+                # Address beats and write data go forward, read data and write responses back
+                forward = part == "forward"
+                burst, beat = lane_cycles / lanes, BEAT_CYCLES / lanes
+                made = _Station(f"{cg.ids[a]}->{cg.ids[b]}", "link", beat if forward else burst,
+                                burst if forward else beat, LINK_CYCLES, False)
+            elif kind[a] == INTERCONNECT:
+                noc = "noc" in cg.labels[a].lower()
+                # A NoC grants one transaction per controller port each cycle, a bus one
+                grant = 1.0 / channels if noc else 1.0
+                # and adds about a mesh side of router hops
+                latency = (ROUTER_CYCLES + LINK_CYCLES) * math.isqrt(clusters) if noc else BUS_CYCLES
+                made = _Station(cg.ids[a], "interconnect", grant, grant, latency, True)
+            else:
+                made = _Station(cg.ids[a], "memory", dram_cycles, dram_cycles, DRAM_LATENCY_NS * spec.frequency, False)
+            index[key] = len(stations)
+            stations.append(made)
+        return index[key]
+
+    paths = []
+    for master_routes in routes:
+        for path in master_routes:
+            out = []
+            for a, b in zip(path, path[1:]):
+                out += [station(("forward", a, b)), station(("node", b, b))]
+            back = [station(("back", a, b)) for a, b in zip(path[::-1], path[-2::-1])]
+            paths.append(out + back)
+    return stations, paths
+
+
+def _order(paths: List[List[int]], count: int) -> List[int]:
+    """Stations so that every route visits them in order."""
+    sorter = TopologicalSorter({s: set() for s in range(count)})
+    for path in paths:
+        for a, b in zip(path, path[1:]):
+            sorter.add(b, a)
+    try:
+        return list(sorter.static_order())
+    except CycleError:
+        raise ValueError("Routes cross the same link in opposite orders; simulation needs a loop-free interconnect")
+
+
+def _split(total: int, rates: np.ndarray) -> np.ndarray:
+    """`total` split in proportion to `rates` (largest remainders)."""
+    exact = total * rates / rates.sum()
+    counts = np.floor(exact).astype(np.int64)
+    counts[np.argsort(counts - exact, kind="stable")[:total - counts.sum()]] += 1
+    return counts
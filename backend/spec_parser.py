@@ -0,0 +1,235 @@
+import re
+import math
+from typing import Dict, Any, List, Tuple
+
+from pydantic import ValidationError
+
+from models import ParsedSpec
+from noc_engine import MAX_CLUSTERS
+
+# Deterministic fast path for /ai/parse.
+# A handful of regexes plus a small lexicon cover the common phrasings
+# ("5nm automotive chip, 10W, PCIe and USB"). Every match marks the span of
+# text it explained; the confidence score is the share of meaningful text
+# that was explained, so anything the rules did not understand pushes the
+# request to the LLM. The result is checked against ParsedSpec; a value it
+# rejects (0 W, 0 clusters, a TOPS target that sizes past MAX_CLUSTERS) or a
+# negated keyword ("not automotive") is dropped and counted as a conflict,
+# which also sends the request to the LLM.
+
+FAST_PATH_CONFIDENCE = 0.75
+
+PROCESS_NODES = ["3nm", "5nm", "7nm", "16nm", "28nm", "65nm", "130nm"]
+
+NODE_RE = re.compile(r"\b(\d{1,3})\s*-?\s*nm\b", re.I)
+POWER_RE = re.compile(r"\b(\d+(?:\.\d+)?)\s*-?\s*(mw|kw|w|watts?)\b", re.I)
+FREQ_RE = re.compile(r"\b(\d+(?:\.\d+)?)\s*-?\s*(ghz|mhz)\b", re.I)
+TOPS_RE = re.compile(r"\b(\d+(?:\.\d+)?)\s*-?\s*tops\b", re.I)
+CLUSTERS_RE = re.compile(r"\b(\d+)\s*(?:x\s*)?(?:npu\s*)?(?:clusters?|cores?)\b", re.I)
+MACS_RE = re.compile(r"\b(\d+)\s*(?:macs?|mac\s*units?)\b(?:\s*per\s*cluster)?", re.I)
+PCIE_GEN_RE = re.compile(r"\b(?:pcie|pci\s*express)\s*(?:gen\s*|g)?([345])\b", re.I)
+NEGATION_RE = re.compile(r"\b(?:not|no|non|without)[\s-]*$", re.I)
+
+# (pattern, canonical value); first match wins per field.
+LEXICON = {
+    "performance_goal": [
+        (r"\b(?:automotive|car|vehicle|adas|self[- ]driving)\b", "Automotive AI"),
+        (r"\b(?:data\s*-?\s*cent(?:er|re)|datacenter|server|cloud|hyperscale)\b", "Data Center AI"),
+        (r"\b(?:mobile|phone|smartphone|handset|tablet)\b", "Mobile AI"),
+        (r"\b(?:iot|wearable|sensor|always-on)\b", "IoT AI"),
+        (r"\bedge\b", "Edge AI"),
+    ],
+    "compute_type": [
+        (r"\b(?:training|train)\b", "Training"),
+        (r"\b(?:inference|inferencing)\b", "Inference Only"),
+    ],
+    "cooling_solution": [
+        (r"\b(?:passive(?:ly)?\s*cool(?:ed|ing)?|passive|fanless)\b", "Passive Cooling"),
+        (r"\b(?:active(?:ly)?\s*cool(?:ed|ing)?|active|fan|liquid\s*cool(?:ed|ing)?)\b", "Active Cooling"),
+    ],
+    "packaging_type": [
+        (r"\b(?:chiplets?|multi[- ]die)\b", "Chiplet"),
+        (r"\b2\.5\s*d\b", "2.5D"),
+        (r"\b3\s*d(?:\s*stack(?:ed|ing)?)?\b", "3D"),
+        (r"\bmonolithic\b", "Monolithic"),
+    ],
+    "memory_type": [
+        (r"\bhbm\s*3e?\b", "HBM3"),
+        (r"\bhbm\s*2e?\b", "HBM2"),
+        (r"\bhbm\b", "HBM3"),
+        (r"\blpddr\s*5x?\b", "LPDDR5"),
+        (r"\bddr\s*5\b", "DDR5"),
+        (r"\bddr\s*4\b", "DDR4"),
+    ],
+    "precision": [
+        (r"\bint\s*8\b", "INT8"),
+        (r"\bfp\s*16\b", "FP16"),
+        (r"\bbf\s*16\b", "BF16"),
+        (r"\bfp\s*32\b", "FP32"),
+        (r"\bmixed[- ]precision\b", "Mixed Precision"),
+    ],
+}
+
+STANDARDS = [
+    (r"\b(?:pcie|pci\s*express)(?:\s*(?:gen\s*|g)?[345])?\b", "PCIe"),
+    (r"\busb(?:\s*[234](?:\.\d)?)?(?:\s*type[- ]?c)?\b", "USB 3.0"),
+    (r"\b(?:ethernet|gige|\d+\s*gbe)\b", "Ethernet"),
+    (r"\bmipi(?:\s*csi(?:-?2)?)?\b", "MIPI CSI"),
+    (r"\bhdmi\b", "HDMI"),
+    (r"\b(?:displayport|dp)\b", "DP"),
+]
+
+# Words that carry no spec information; they count as explained text.
+FILLER = set("""
+a an the i we want need would like to for with and or plus but of in on at by
+chip chips soc accelerator accelerators ai npu design asic processor some also
+that which it is be should can using use low high budget power node process
+cooling cooled packaging package memory standards interfaces interface support
+supports around about under max maximum target targeting grade
+""".split())
+
+_COMPILED_LEXICON = {field: [(re.compile(p, re.I), v) for p, v in entries] for field, entries in LEXICON.items()}
+_COMPILED_STANDARDS = [(re.compile(p, re.I), v) for p, v in STANDARDS]
+_WORD_RE = re.compile(r"[a-z0-9.]+", re.I)
+
+
+def _round_node(nm: int) -> str:
+    """Snaps a parsed node to the closest one the engines know about."""
+    return min(PROCESS_NODES, key=lambda n: abs(int(n[:-2]) - nm))
+
+
+def _negated(text: str, match: re.Match) -> bool:
+    return NEGATION_RE.search(text[max(0, match.start() - 16):match.start()]) is not None
+
+
+def _invalid_fields(spec: Dict[str, Any]) -> List[str]:
+    """Fields ParsedSpec rejects, plus a cluster count beyond what the engines analyse."""
+    try:
+        ParsedSpec(**spec)
+        invalid = []
+    except ValidationError as e:
+        invalid = [err["loc"][0] for err in e.errors()]
+    if spec.get("num_npu_clusters", 1) > MAX_CLUSTERS:
+        invalid.append("num_npu_clusters")
+    return invalid
+
+
+def parse_spec_text(text: str) -> Tuple[Dict[str, Any], float]:
+    """
+    Extracts ChipSpecification fields from free text with local rules only.
+    Returns the extracted fields and a confidence score in [0, 1].
+    """
+    spec: Dict[str, Any] = {}
+    explained: List[Tuple[int, int]] = []
+    spans: Dict[str, List[Tuple[int, int]]] = {}
+    conflicts = 0
+
+    def take(field, value, match):
+        nonlocal conflicts
+        explained.append(match.span())
+        spans.setdefault(field, []).append(match.span())
+        if field in spec and spec[field] != value:
+            conflicts += 1
+        spec.setdefault(field, value)
+
+    for m in NODE_RE.finditer(text):
+        take("process_node", _round_node(int(m.group(1))), m)
+
+    for m in POWER_RE.finditer(text):
+        value, unit = float(m.group(1)), m.group(2).lower()
+        if unit == "mw":
+            value /= 1000.0
+        elif unit == "kw":
+            value *= 1000.0
+        take("power_budget", round(value, 3), m)
+
+    for m in FREQ_RE.finditer(text):
+        value = float(m.group(1))
+        take("frequency", value / 1000.0 if m.group(2).lower() == "mhz" else value, m)
+
+    for m in CLUSTERS_RE.finditer(text):
+        take("num_npu_clusters", int(m.group(1)), m)
+
+    for m in MACS_RE.finditer(text):
+        take("mac_units_per_cluster", int(m.group(1)), m)
+
+    for m in PCIE_GEN_RE.finditer(text):
+        take("pcie_version", f"Gen{m.group(1)}", m)
+
+    for field, entries in _COMPILED_LEXICON.items():
+        for pattern, value in entries:
+            m = pattern.search(text)
+            if m and _negated(text, m):
+                conflicts += 1
+                break
+            if m:
+                take(field, value, m)
+                break
+
+    standards = []
+    for pattern, value in _COMPILED_STANDARDS:
+        m = pattern.search(text)
+        if m and _negated(text, m):
+            conflicts += 1
+        elif m:
+            explained.append(m.span())
+            standards.append(value)
+    if standards:
+        spec["standards"] = standards
+
+    # A throughput target sizes the cluster count unless it was given.
+    tops_match = TOPS_RE.search(text)
+    if tops_match:
+        freq = spec.get("frequency", 1.0)
+        sizable = freq > 0 and spec.get("mac_units_per_cluster", 1) > 0
+        if sizable or "num_npu_clusters" in spec:
+            explained.append(tops_match.span())
+        else:
+            # Nothing to size from: leave the target unexplained so the LLM takes over
+            conflicts += 1
+        if sizable and "num_npu_clusters" not in spec:
+            tops = float(tops_match.group(1))
+            # Prefer wider clusters over very large cluster counts
+            for macs in ([spec["mac_units_per_cluster"]] if "mac_units_per_cluster" in spec else [256, 512, 1024]):
+                clusters = max(1, math.ceil(tops * 1000.0 / (2 * freq * macs)))
+                if clusters <= 16:
+                    break
+            spec["mac_units_per_cluster"] = macs
+            spec["num_npu_clusters"] = clusters
+            spans.setdefault("num_npu_clusters", []).append(tops_match.span())
+
+    # Out-of-range values are not trusted: unexplain them and count a conflict
+    for field in _invalid_fields(spec):
+        spec.pop(field, None)
+        conflicts += 1
+        explained = [span for span in explained if span not in spans.get(field, [])]
+
+    # Automotive parts imply the matching qualification and cooling.
+    if spec.get("performance_goal") == "Automotive AI":
+        spec.setdefault("temperature_range", "Automotive")
+        spec.setdefault("cooling_solution", "Automotive Grade")
+    if spec.get("packaging_type") == "Chiplet":
+        spec["multi_die_partitioning"] = True
+
+    spec["purpose"] = " ".join(
+        p for p in [spec.get("process_node"), spec.get("performance_goal", "AI"), "Accelerator"] if p
+    )
+
+    return spec, _confidence(text, explained, conflicts, len(spec) - 1)
+
+
+def _confidence(text: str, explained: List[Tuple[int, int]], conflicts: int, fields: int) -> float:
+    if fields == 0:
+        return 0.0
+    total = 0
+    unexplained = 0
+    for m in _WORD_RE.finditer(text):
+        word = m.group(0).lower().strip(".")
+        if not word or word in FILLER:
+            continue
+        total += len(word)
+        start, end = m.span()
+        if not any(s <= start and end <= e or start <= s < end for s, e in explained):
+            unexplained += len(word)
+    coverage = 1.0 - unexplained / total if total else 0.0
+    return round(max(0.0, coverage - 0.25 * conflicts), 2)
@@ -0,0 +1,60 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+# Cold-start bookkeeping: how long each import group took, when the app
+# became ready and when the first request was served. main.py imports this
+# module first so the timings cover everything after it.
+
+_t0 = time.perf_counter()
+_import_times: Dict[str, float] = {}
+_ready_at: Optional[float] = None
+_first_request_at: Optional[float] = None
+
+
+def _process_age() -> Optional[float]:
+    """Seconds since the OS started this process (Linux only)."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except Exception:
+        return None
+
+
+@contextmanager
+def timed_import(name: str):
+    start = time.perf_counter()
+    yield
+    _import_times[name] = time.perf_counter() - start
+
+
+def mark_ready():
+    global _ready_at
+    _ready_at = time.perf_counter()
+    report = startup_report()
+    imports = ", ".join(f"{k} {v:.0f}ms" for k, v in report["imports_ms"].items())
+    age = report["process_age_ms"]
+    print(f"⏱️ Imports: {imports}. App ready after {report['ready_ms']:.0f} ms"
+          + (f" ({age:.0f} ms since process start)" if age is not None else ""))
+
+
+def mark_request():
+    """Called per request; only the first call records anything."""
+    global _first_request_at
+    if _first_request_at is None:
+        _first_request_at = time.perf_counter()
+        print(f"⏱️ First request served {(_first_request_at - _t0) * 1000:.0f} ms after import")
+
+
+def startup_report() -> Dict[str, Any]:
+    age = _process_age()
+    return {
+        "imports_ms": {k: round(v * 1000, 1) for k, v in _import_times.items()},
+        "ready_ms": round((_ready_at - _t0) * 1000, 1) if _ready_at else None,
+        "first_request_ms": round((_first_request_at - _t0) * 1000, 1) if _first_request_at else None,
+        "process_age_ms": round(age * 1000, 1) if age is not None else None,
+    }
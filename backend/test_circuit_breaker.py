@@ -0,0 +1,44 @@
+"""
+State transitions of the per-provider circuit breaker.
+
+Run with `python -m pytest -q test_circuit_breaker.py` from backend/.
+"""
+import time
+
+from circuit_breaker import CircuitBreaker, OPEN, HALF_OPEN, CLOSED
+
+
+def _tripped(cooldown=0.05):
+    breaker = CircuitBreaker("test", min_calls=2, cooldown=cooldown)
+    started = time.monotonic()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    return breaker, started
+
+
+def test_slow_success_from_before_the_trip_leaves_the_circuit_open():
+    breaker, started = _tripped(cooldown=60)
+    breaker.record_success(time.monotonic() - started + 0.01)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_only_the_probe_closes_a_half_open_circuit():
+    breaker, started = _tripped()
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()  # one probe at a time
+
+    breaker.record_success(time.monotonic() - started + 0.01)  # a straggler
+    assert breaker.state == HALF_OPEN
+    breaker.record_success(0.001)  # the probe
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens_the_circuit():
+    breaker, _ = _tripped()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
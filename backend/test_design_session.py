@@ -0,0 +1,52 @@
+"""
+Design sessions are held to the memory budget as they grow, not only when created.
+
+Run with `python -m pytest -q test_design_session.py` from backend/.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import memory_budget
+from main import app
+from bench_engines import make_graph, model_dump
+from design_session import DesignSession
+from models import PatchOp
+
+
+def _add_nodes(start, count):
+    return [{"op": "add", "path": f"/nodes/extra{i}",
+             "value": {"type": "default", "position": {"x": 0, "y": 0},
+                       "data": {"label": "SRAM Bank", "logic_type": "Memory"}}}
+            for i in range(start, start + count)]
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    """A budget with plenty of headroom and a 500-element limit per session."""
+    monkeypatch.setattr(memory_budget, "BUDGET_BYTES", 10 ** 12)
+    monkeypatch.setattr(memory_budget, "REQUEST_SHARE", memory_budget.UNIT_BYTES["session"] * 500 / 10 ** 12)
+
+
+def test_patch_growing_a_session_past_the_budget_is_refused(budget):
+    client = TestClient(app)
+    session = client.post("/sessions", json=model_dump(make_graph(10))).json()
+    url = f"/sessions/{session['id']}"
+
+    grown = client.patch(url, json={"ops": _add_nodes(0, 100)})
+    assert grown.status_code == 200 and grown.json()["version"] == 2
+
+    refused = client.patch(url, json={"ops": _add_nodes(100, 600)})
+    assert refused.status_code == 413
+    # Nothing was applied
+    assert client.get(url).json()["version"] == 2
+    assert len(client.get(url).json()["graph"]["nodes"]) == 110
+
+
+def test_only_adds_of_new_ids_count_as_growth():
+    session = DesignSession("s", 1, {"a": None, "b": None}, {}, None)
+    ops = [PatchOp(op="replace", path="/nodes/a/position", value={"x": 1, "y": 1}),
+           PatchOp(op="add", path="/nodes/b", value={}),
+           PatchOp(op="add", path="/nodes/c", value={}),
+           PatchOp(op="add", path="/nodes/c", value={}),
+           PatchOp(op="add", path="bad", value={})]
+    assert session.size_after(ops) == 3
@@ -0,0 +1,126 @@
+"""
+The array-backed floorplan engine must reproduce the original per-node
+engine exactly. The digests below are of the original engine's output
+(json.dumps(..., sort_keys=True) of generate_floorplan().model_dump()) on
+the same seeded graphs; regenerate them only for an intended change of
+layout.
+
+Run with `python -m pytest -q test_floorplan_engine.py` from backend/.
+"""
+import hashlib
+import json
+import random
+
+import pytest
+
+from models import ArchitectureGraph, ChipSpecification, Node, Edge
+from engine import generate_architecture
+from floorplan_engine import generate_floorplan, floorplan_data, enrich_metadata
+from bench_engines import make_graph, model_dump
+
+LABELS = [
+    "NPU Cluster", "NPU Array (16x Clusters)", "NPU Array (bad)", "GPU Core", "RISC-V CPU", "System Bus",
+    "NoC (Mesh)", "SRAM Bank", "HBM3 Memory", "High-Bandwidth Memory", "DDR5 Controller", "LPDDR5 PHY",
+    "PCIe PHY", "Ethernet MAC", "Custom Accelerator",
+]
+LOGIC_TYPES = ["Digital", "Analog", "Memory", "Mixed Signal"]
+
+
+def random_graph(seed: int) -> ArchitectureGraph:
+    """Mixed blocks with repeated ids, io-named ids, dangling edges and missing weights."""
+    rng = random.Random(seed)
+    n = rng.choice([0, 1, 2, 5, 12, 40, 150, 600])
+    ids = [rng.choice([f"n{i}", f"io_{i}", f"bus{i}", f"n{rng.randrange(n)}"]) if n else f"n{i}" for i in range(n)]
+    nodes = [Node(id=node_id, type="default", position={"x": 0, "y": 0},
+                  data={"label": f"{rng.choice(LABELS)} {rng.randrange(3) or ''}".strip(),
+                        "logic_type": rng.choice(LOGIC_TYPES)})
+             for node_id in ids]
+    edges = [Edge(id=f"e{i}", source=rng.choice(ids + ["missing"]) if ids else "missing",
+                  target=rng.choice(ids + ["ghost"]) if ids else "ghost",
+                  bandwidth_weight=rng.choice([None, 1, 4, 16]))
+             for i in range(rng.randrange(2 * n + 1))]
+    return ArchitectureGraph(nodes=nodes, edges=edges)
+
+
+def graphs():
+    for clusters, standards, memory in [(1, 0, "DDR4"), (4, 2, "HBM3"), (16, 8, "LPDDR5"), (64, 4, "DDR5")]:
+        spec = ChipSpecification(purpose="Test", num_npu_clusters=clusters, memory_type=memory,
+                                 standards=[f"STD{i}" for i in range(standards)])
+        yield f"design/clusters={clusters}", generate_architecture(spec)
+    for n in (10, 100, 2000):
+        yield f"synthetic/nodes={n}", make_graph(n)
+    for seed in range(40):
+        yield f"random/seed={seed}", random_graph(seed)
+
+
+def digest(floorplan: dict) -> str:
+    return hashlib.sha256(json.dumps(floorplan, sort_keys=True).encode()).hexdigest()[:16]
+
+
+DIGESTS = {
+    "design/clusters=1": "e53324b51ddefdba",
+    "design/clusters=4": "c01e7b51529852c4",
+    "design/clusters=16": "e82deb22d61d0978",
+    "design/clusters=64": "d7085cf87d70a959",
+    "synthetic/nodes=10": "4dc779e2ab87ac97",
+    "synthetic/nodes=100": "a9b0ab868d5caab2",
+    "synthetic/nodes=2000": "94d16bbbf38018a9",
+    "random/seed=0": "007c7c04e954cb14",
+    "random/seed=1": "cc06f720b4bf93d5",
+    "random/seed=2": "dc8be92870a6996c",
+    "random/seed=3": "d6791fad5aa8cf3e",
+    "random/seed=4": "f98bde53c59aae1f",
+    "random/seed=5": "d163f7d66a9a43d9",
+    "random/seed=6": "7e2d231ccc6caa74",
+    "random/seed=7": "e9487ad5d8ac7433",
+    "random/seed=8": "a247ee29690ecf43",
+    "random/seed=9": "fb1efae58ee5f572",
+    "random/seed=10": "dc8be92870a6996c",
+    "random/seed=11": "abfa4fe68f06cf15",
+    "random/seed=12": "96e84d89004ea982",
+    "random/seed=13": "6a66e902ffeea01e",
+    "random/seed=14": "cb2f972e610d5973",
+    "random/seed=15": "670c6958900b9886",
+    "random/seed=16": "a4c6e1affd5ebff5",
+    "random/seed=17": "fd9a0c4d82ac21c7",
+    "random/seed=18": "a544d8cb67ff3e8a",
+    "random/seed=19": "dc8be92870a6996c",
+    "random/seed=20": "743c4674dd59093e",
+    "random/seed=21": "ce36d73d625cd3f6",
+    "random/seed=22": "4f7ebc11bc9d8431",
+    "random/seed=23": "0d7a63e7a3e382ec",
+    "random/seed=24": "81c390034cdd2a1b",
+    "random/seed=25": "d9f2a3933a940b3b",
+    "random/seed=26": "cafd1dded7de66e4",
+    "random/seed=27": "23063ca999adcabd",
+    "random/seed=28": "8cd7343a89eb5a90",
+    "random/seed=29": "8c73c43139d25fcf",
+    "random/seed=30": "1303c8cd5f9afb4f",
+    "random/seed=31": "dc8be92870a6996c",
+    "random/seed=32": "7bc027c9d40cd69e",
+    "random/seed=33": "98e92971d0e6409c",
+    "random/seed=34": "4051f62a5d1145cb",
+    "random/seed=35": "f7dd3fb0779c1451",
+    "random/seed=36": "49ae702fb1b57f54",
+    "random/seed=37": "6210b2e9a96b6d17",
+    "random/seed=38": "17ba7d07d9f427c6",
+    "random/seed=39": "f1eebf146385b2ad",
+}
+
+
+@pytest.mark.parametrize("name,graph", list(graphs()), ids=lambda v: v if isinstance(v, str) else "")
+def test_matches_the_original_engine(name, graph):
+    data = floorplan_data(graph)
+    assert data == model_dump(generate_floorplan(graph))
+    assert digest(data) == DIGESTS[name]
+
+
+def test_enrich_metadata_describes_each_block():
+    graph = random_graph(5)
+    blocks = enrich_metadata(graph.nodes)
+    assert blocks
+    assert [b["id"] for b in blocks] == [n.id for n in graph.nodes]
+    for block, node in zip(blocks, graph.nodes):
+        assert block["label"] == node.data["label"] and block["logic_type"] == node.data["logic_type"]
+        assert block["type"] in ("compute", "interconnect", "memory", "io")
+        assert isinstance(block["area_weight"], int) and isinstance(block["tops"], float)
@@ -0,0 +1,92 @@
+"""
+Claim, recovery and requeue checks for the SQLite job queue.
+
+Run with `python -m pytest -q test_job_queue.py` from backend/.
+"""
+import os
+import sqlite3
+
+import pytest
+
+import job_queue
+from job_queue import JobQueue, JobDeferred, QUEUED, RUNNING, FAILED, SUCCEEDED, MAX_ATTEMPTS
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = JobQueue(path=str(tmp_path / "jobs.db"), workers=1)
+    q.register("echo")(lambda params, ctx: params)
+    return q
+
+
+def _row(queue, job_id):
+    return queue._db.execute("SELECT status, attempts, owner FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def test_claim_records_the_owner_and_counts_the_attempt(queue):
+    job = queue.submit("echo", {"x": 1})
+    assert job["status"] == QUEUED and job["queue_position"] == 0
+
+    claimed = queue._claim()
+    assert claimed["id"] == job["id"]
+    assert tuple(_row(queue, job["id"])) == (RUNNING, 1, os.getpid())
+    assert queue._claim() is None
+
+    assert queue._run(claimed) == SUCCEEDED
+    assert queue.result(job["id"]) == {"x": 1}
+
+
+def test_recover_requeues_running_jobs(queue):
+    job = queue.submit("echo", {})
+    queue._claim()
+
+    queue.recover()
+    assert tuple(_row(queue, job["id"])) == (QUEUED, 1, None)
+    assert queue._claim()["id"] == job["id"]
+    assert _row(queue, job["id"])["attempts"] == 2
+
+
+def test_requeue_releases_only_the_dead_workers_jobs(queue):
+    dead, alive = queue.submit("echo", {"n": 1}), queue.submit("echo", {"n": 2})
+    queue._claim()
+    queue._claim()
+    queue._update(dead["id"], owner=999999)
+
+    assert queue.requeue(999999) == 1
+    assert _row(queue, dead["id"])["status"] == QUEUED
+    assert _row(queue, alive["id"])["status"] == RUNNING
+    assert queue.requeue(999999) == 0
+
+
+def test_repeatedly_interrupted_job_fails(queue):
+    job = queue.submit("echo", {})
+    for _ in range(MAX_ATTEMPTS):
+        queue._claim()
+        queue.requeue(os.getpid())
+    status = queue.get(job["id"])
+    assert status["status"] == FAILED
+    assert status["error"].startswith(f"Interrupted {MAX_ATTEMPTS} times")
+
+
+def test_deferred_job_is_queued_without_using_an_attempt(queue):
+    @queue.register("busy")
+    def busy(params, ctx):
+        raise JobDeferred("server is busy")
+
+    job = queue.submit("busy", {})
+    assert queue._run(queue._claim()) == QUEUED
+    assert tuple(_row(queue, job["id"])) == (QUEUED, 0, None)
+    assert queue.get(job["id"])["message"] == "Deferred: server is busy"
+
+
+def test_files_without_the_owner_column_are_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    old_schema = job_queue.SCHEMA.replace("    owner INTEGER,\n", "")
+    conn = sqlite3.connect(path)
+    conn.executescript(old_schema)
+    conn.close()
+
+    q = JobQueue(path=path)
+    q.register("echo")(lambda params, ctx: params)
+    q.submit("echo", {})
+    assert q._claim()["kind"] == "echo"
@@ -0,0 +1,39 @@
+"""
+Completeness checks for validated LLM responses: only complete answers are cached.
+
+Run with `python -m pytest -q test_json_extract.py` from backend/.
+"""
+import pytest
+
+from json_extract import validate_response
+from models import AiInsight, AiBatchInsight, ParsedSpec
+
+FALLBACK = {"summary": "AI unavailable", "bottlenecks": []}
+
+
+@pytest.mark.parametrize("data", [{}, {"answer": 42}, {"summary": ""}, {"bottlenecks": ["memory"]}])
+def test_unanswered_insight_is_incomplete(data):
+    result, complete = validate_response(AiInsight, data, FALLBACK)
+    assert not complete
+    assert result["summary"] == "AI unavailable"
+    assert result["bottlenecks"] == data.get("bottlenecks", [])
+
+
+def test_answered_insight_is_complete():
+    result, complete = validate_response(AiInsight, {"summary": "Memory bound."}, FALLBACK)
+    assert complete and result["summary"] == "Memory bound."
+
+
+def test_batch_needs_every_item_answered():
+    answered = {"index": 0, "summary": "ok"}
+    assert validate_response(AiBatchInsight, {"results": [answered]}, {})[1]
+    assert not validate_response(AiBatchInsight, {"results": [answered, {"index": 1}]}, {})[1]
+    assert not validate_response(AiBatchInsight, {}, {})[1]
+
+
+def test_parsed_spec_needs_purpose_and_node():
+    fallback = {"purpose": "AI Accelerator (Fallback)", "process_node": "28nm"}
+    result, complete = validate_response(ParsedSpec, {"purpose": "Edge NPU"}, fallback)
+    assert not complete
+    assert result == {"purpose": "Edge NPU", "process_node": "28nm"}
+    assert validate_response(ParsedSpec, {"purpose": "Edge NPU", "process_node": "7nm"}, fallback)[1]
@@ -0,0 +1,102 @@
+"""
+Latest-wins and cancellation checks for /ws/live and the engines it drives.
+
+Run with `python -m pytest -q test_live_updates.py` from backend/.
+"""
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import live_updates
+from main import app
+from bench_engines import make_graph, model_dump
+from cancellation import CancelToken, Cancelled, checkpoint
+from engine_pool import EnginePool, EngineCancelled
+from floorplan_engine import floorplan_data
+
+
+def _variants(n, count):
+    """`count` distinct payloads of an n-node graph (one block moved each time)."""
+    payload = model_dump(make_graph(n))
+    for i in range(count):
+        payload["nodes"][0]["position"] = {"x": -1 - i, "y": 0}
+        yield {**payload, "nodes": [dict(node) for node in payload["nodes"]]}
+
+
+def test_burst_computes_only_the_latest_state():
+    with TestClient(app).websocket_connect("/ws/live") as ws:
+        for i, payload in enumerate(_variants(3000, 10)):
+            ws.send_json({"type": "floorplan", "id": i, "payload": payload})
+        reply = ws.receive_json()
+    assert reply["id"] == 9
+    assert reply["superseded"] == 9
+    assert "result" in reply and reply["result"]["blocks"]
+
+
+def test_newer_message_cancels_the_running_computation(monkeypatch):
+    started = threading.Event()
+    cancelled = []
+
+    def compute(payload):
+        if payload.get("slow"):
+            started.set()
+            deadline = time.monotonic() + 10
+            try:
+                while time.monotonic() < deadline:
+                    checkpoint()
+                    time.sleep(0.001)
+            except Cancelled:
+                cancelled.append(payload)
+                raise
+        return {"value": payload.get("value")}
+
+    monkeypatch.setitem(live_updates.CHANNELS, "floorplan", compute)
+    with TestClient(app).websocket_connect("/ws/live") as ws:
+        ws.send_json({"type": "floorplan", "id": 1, "payload": {"slow": True}})
+        assert started.wait(5)
+        ws.send_json({"type": "floorplan", "id": 2, "payload": {"value": 2}})
+        reply = ws.receive_json()
+    assert cancelled == [{"slow": True}]
+    assert reply == {"type": "floorplan", "id": 2, "result": {"value": 2}, "superseded": 1}
+
+
+@pytest.fixture(scope="module")
+def large_graph():
+    return make_graph(20000)
+
+
+def _cancel_after(token, seconds):
+    timer = threading.Timer(seconds, token.cancel)
+    timer.start()
+    return timer
+
+
+def test_inline_floorplan_stops_at_a_checkpoint(large_graph):
+    start = time.perf_counter()
+    floorplan_data(large_graph)
+    full = time.perf_counter() - start
+
+    token = CancelToken()
+    _cancel_after(token, full / 10)
+    start = time.perf_counter()
+    with pytest.raises(Cancelled):
+        token.run(floorplan_data, large_graph)
+    assert time.perf_counter() - start < full
+
+
+def test_pool_floorplan_is_cancelled_and_the_worker_replaced(large_graph):
+    pool = EnginePool(size=1)
+    pool.start()
+    if not pool.ready:
+        pytest.skip("engine pool workers are not available here")
+    try:
+        token = CancelToken()
+        _cancel_after(token, 0.02)
+        with pytest.raises(EngineCancelled):
+            token.run(pool.floorplan, large_graph)
+        # The killed worker's replacement takes the next call
+        assert pool.floorplan(large_graph)["blocks"]
+    finally:
+        pool.stop()
@@ -0,0 +1,48 @@
+"""
+The rule-based /ai/parse fast path must only answer for values it can trust.
+
+Run with `python -m pytest -q test_spec_parser.py` from backend/.
+"""
+import pytest
+
+from models import ParsedSpec
+from noc_engine import MAX_CLUSTERS
+from spec_parser import parse_spec_text, FAST_PATH_CONFIDENCE
+
+
+@pytest.mark.parametrize("text", [
+    "5nm automotive chip, 10W, PCIe and USB",
+    "7nm data center chip 100 TOPS 1.5 GHz HBM3",
+    "28nm edge inference chip 2W passive cooling INT8",
+])
+def test_plain_requests_stay_on_the_fast_path(text):
+    spec, confidence = parse_spec_text(text)
+    assert confidence >= FAST_PATH_CONFIDENCE
+    ParsedSpec(**spec)
+    assert 1 <= spec.get("num_npu_clusters", 1) <= MAX_CLUSTERS
+
+
+@pytest.mark.parametrize("text,dropped", [
+    ("chip 5nm 100000 TOPS 0.001 GHz", "num_npu_clusters"),
+    ("5nm chip with 0 clusters", "num_npu_clusters"),
+    (f"5nm chip with {MAX_CLUSTERS + 1} clusters", "num_npu_clusters"),
+    ("5nm chip, 0W", "power_budget"),
+    ("5nm edge chip at 0 GHz", "frequency"),
+    ("5nm chip with 0 MACs per cluster", "mac_units_per_cluster"),
+    ("a chip at 0 GHz with 10 TOPS", "num_npu_clusters"),
+])
+def test_out_of_range_values_go_to_the_llm(text, dropped):
+    spec, confidence = parse_spec_text(text)
+    assert confidence < FAST_PATH_CONFIDENCE
+    assert dropped not in spec
+
+
+@pytest.mark.parametrize("text,field", [
+    ("5nm chip, 10W, not automotive", "performance_goal"),
+    ("5nm non-automotive chip, 10W", "performance_goal"),
+    ("5nm chip, 10W, no PCIe", "standards"),
+])
+def test_negated_keywords_go_to_the_llm(text, field):
+    spec, confidence = parse_spec_text(text)
+    assert confidence < FAST_PATH_CONFIDENCE
+    assert field not in spec
@@ -0,0 +1,124 @@
+import math
+from typing import Any, Dict
+
+import numpy as np
+
+from models import ChipSpecification, Workload
+from engine import feasibility_metrics
+from memory_model import ELEMENT_BYTES, DRAM_EFFICIENCY, buffer_bytes, tile_edge, tiled_traffic
+from metrics import timed
+
+# Workload-driven performance: a roofline per layer of an uploaded network.
+# Every layer is reduced to an output of M x N values (rows x columns on
+# the MAC array), its operation count and its off-chip traffic under the
+# SRAM tiling model (memory_model.py). A layer then takes the longer of
+# its compute time (peak rate derated for precision and for the array
+# rows/columns and clusters it leaves idle) and its memory time (traffic
+# over sustained DRAM bandwidth). Layers run one after another, so the
+# end-to-end latency is their sum. All layers are evaluated together as
+# arrays; only reading the layer list is per-layer Python.
+
+MAX_LAYERS = 100_000
+LAYER_FIELDS = ("m", "n", "k", "height", "width", "in_channels", "out_channels", "kernel", "stride", "elements", "batch")
+# Spec fields the compute rate and DRAM bandwidth are products of
+RATE_FIELDS = ("frequency", "num_npu_clusters", "mac_units_per_cluster", "memory_channels", "ddr_width")
+OPS = ("gemm", "conv2d", "depthwise_conv2d", "elementwise")
+GEMM, CONV2D, DEPTHWISE, ELEMENTWISE = range(len(OPS))
+
+
+@timed("workload")
+def analyze_workload(spec: ChipSpecification, workload: Workload) -> Dict[str, Any]:
+    layers = workload.layers
+    if not 1 <= len(layers) <= MAX_LAYERS:
+        raise ValueError(f"A workload needs between 1 and {MAX_LAYERS} layers")
+    for field in RATE_FIELDS:
+        if not (getattr(spec, field) or 0) > 0:
+            raise ValueError(f"{field} must be positive for workload analysis")
+    fields = np.array([[getattr(layer, f) for f in LAYER_FIELDS] for layer in layers], dtype=np.float64)
+    if (fields < 1).any():
+        row, col = np.argwhere(fields < 1)[0]
+        raise ValueError(f"Layer '{layers[row].name}': {LAYER_FIELDS[col]} must be at least 1")
+    m, n, k, height, width, cin, cout, kernel, stride, elements, batch = fields.T
+    op = np.array([OPS.index(layer.op) for layer in layers])
+    default_precision = workload.precision or spec.precision
+    elem = np.array([ELEMENT_BYTES.get(layer.precision or default_precision, 1) for layer in layers], dtype=np.float64)
+
+    # --- Shapes: M x N outputs, MACs, unique bytes per operand ---
+    conv = (op == CONV2D) | (op == DEPTHWISE)
+    pixels = batch * np.ceil(height / stride) * np.ceil(width / stride)
+    channels = np.where(op == DEPTHWISE, cin, cout)
+    rows = np.select([op == GEMM, conv], [batch * m, pixels], elements)
+    cols = np.select([op == GEMM, conv], [n, channels], 1.0)
+    depth = np.select([op == GEMM, op == CONV2D, op == DEPTHWISE], [k, cin * kernel * kernel, kernel * kernel], 0.0)
+    macs = rows * cols * depth
+    activations = elem * np.select([op == GEMM, conv], [batch * m * k, batch * height * width * cin], elements)
+    weights = elem * np.select([op == GEMM, op == CONV2D, op == DEPTHWISE],
+                               [k * n, kernel * kernel * cin * cout, kernel * kernel * cin], 0.0)
+    outputs = elem * rows * cols
+    # Depthwise channels and elementwise values need no data from other columns
+    streamed = (op == GEMM) | (op == CONV2D)
+    tile = tile_edge(buffer_bytes(spec), elem, np)
+    traffic = np.where(streamed, tiled_traffic(activations, weights, outputs, rows, cols, tile, np),
+                       activations + weights + outputs)
+    ops = np.where(op == ELEMENTWISE, elements, 2 * macs)
+
+    # --- Compute rate ---
+    metrics = feasibility_metrics(spec)
+    peak_ops = metrics["tops"] * 1e12
+    array_rows = max(1, math.isqrt(spec.mac_units_per_cluster))
+    array_cols = max(1, spec.mac_units_per_cluster // array_rows)
+    clusters = max(1, spec.num_npu_clusters)
+    # Fraction of the array's rows and columns the last tile leaves busy
+    row_tiles, col_tiles = np.ceil(rows / array_rows), np.ceil(cols / array_cols)
+    mapping = (rows / (row_tiles * array_rows)) * (cols / (col_tiles * array_cols))
+    # Array tiles shared out over the clusters
+    tiles = row_tiles * col_tiles
+    mapping *= tiles / (np.ceil(tiles / clusters) * clusters)
+    # Wider operands than the array was sized for run proportionally slower
+    precision = np.minimum(1.0, ELEMENT_BYTES.get(spec.precision, 1) / elem)
+    # Elementwise layers use one vector lane per array column
+    vector_ops = clusters * array_cols * spec.frequency * 1e9
+    rate = np.where(op == ELEMENTWISE, vector_ops, peak_ops * mapping) * precision
+
+    # --- Roofline ---
+    sustained = metrics["bandwidth"] * DRAM_EFFICIENCY * 1e9
+    compute_s = ops / rate
+    memory_s = traffic / sustained
+    latency_s = np.maximum(compute_s, memory_s)
+    memory_bound = memory_s > compute_s
+    total_s = float(latency_s.sum())
+    total_ops = float(ops.sum())
+    intensity = ops / traffic
+
+    order = np.argsort(-latency_s, kind="stable")[:5]
+    warnings = []
+    if memory_bound.any():
+        share = float(latency_s[memory_bound].sum()) / total_s
+        warnings.append(f"{int(memory_bound.sum())} of {len(layers)} layers are memory-bound "
+                        f"({share:.0%} of the latency); more SRAM or bandwidth would help them.")
+    low = (mapping < 0.25) & (op != ELEMENTWISE)
+    if low.any():
+        warnings.append(f"{int(low.sum())} layers keep under 25% of the MAC array busy "
+                        f"(their outputs do not fill {array_rows}x{array_cols} tiles on {clusters} clusters).")
+    return {
+        "workload": workload.name,
+        "layers": [
+            {"name": layer.name, "op": layer.op, "ops": int(o), "traffic_mb": round(t / (1024 * 1024), 4),
+             "arithmetic_intensity": round(a, 3), "bound": "memory" if b else "compute",
+             "latency_us": round(l * 1e6, 3), "utilization": round(u, 4)}
+            for layer, o, t, a, b, l, u in zip(
+                layers, ops.tolist(), traffic.tolist(), intensity.tolist(), memory_bound.tolist(),
+                latency_s.tolist(), (ops / (peak_ops * latency_s)).tolist())
+        ],
+        "latency_ms": round(total_s * 1e3, 4),
+        "throughput_per_s": round(1.0 / total_s, 2) if total_s > 0 else 0.0,
+        "peak_tops": round(peak_ops / 1e12, 3),
+        "achieved_tops": round(total_ops / total_s / 1e12, 3) if total_s > 0 else 0.0,
+        "utilization": round(total_ops / (peak_ops * total_s), 4) if total_s > 0 else 0.0,
+        # Ops per byte above which a layer is compute-bound at full array use
+        "ridge_point": round(peak_ops / sustained, 2),
+        "total_traffic_mb": round(float(traffic.sum()) / (1024 * 1024), 3),
+        "memory_bound_layers": int(memory_bound.sum()),
+        "slowest_layers": [layers[i].name for i in order.tolist()],
+        "warnings": warnings,
+    }
@@ -0,0 +1,181 @@
+import math
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from models import ChipSpecification, YieldReport
+from engine import NODE_LIMITS, feasibility_metrics
+from metrics import timed
+
+# Yield and cost: good dies per wafer and cost per good system, monolithic
+# versus split into chiplets, by Monte Carlo defect sampling. Defects
+# cluster, so each sampled wafer draws its own defect density from a gamma
+# distribution around the node's D0, and each of its dies is then good
+# with probability exp(-density x area). The dies of one wafer are
+# independent given its density, so a wafer's good-die count is a single
+# binomial draw: one array pass samples every die on thousands of wafers
+# for all options at once. Averaged over wafers this is the
+# negative-binomial yield (1 + A*D0/alpha)^-alpha; the sampling adds the
+# wafer-to-wafer spread behind the confidence intervals.
+#
+# A chiplet system needs `dies` good chiplets, each 1/dies of the logic
+# plus die-to-die PHY overhead, bonded at BOND_YIELD apiece. Chiplets are
+# tested before assembly (known-good dies), so only bonding losses scrap
+# good silicon.
+
+# Per node: defect density (defects/cm^2) and 300 mm wafer price ($)
+NODE_ECONOMICS = {
+    "130nm": (0.05, 1500.0),
+    "65nm":  (0.07, 1950.0),
+    "28nm":  (0.09, 2900.0),
+    "7nm":   (0.11, 9350.0),
+    "5nm":   (0.13, 17000.0),
+}
+# Gamma shape of the wafer-to-wafer defect density (lower clusters more)
+CLUSTERING = 3.0
+WAFER_DIAMETER_MM = 300.0
+EDGE_EXCLUSION_MM = 3.0
+SCRIBE_MM = 0.1
+# Largest die a lithography field can print
+RETICLE_MM2 = 858.0
+# Share of each chiplet spent on die-to-die PHYs
+D2D_OVERHEAD = 0.1
+BOND_YIELD = 0.99
+ASSEMBLY_COST = 2.0  # $ per chiplet bonded
+
+PARTITIONINGS = (1, 2, 4)
+SWEEP_AREAS_MM2 = (25, 50, 100, 200, 400, 800)
+SWEEP_DIES = (1, 2, 4, 8)
+# Options in a full yield_sweep()
+SWEEP_SIZE = len(NODE_LIMITS) * len(SWEEP_AREAS_MM2) * len(SWEEP_DIES)
+DEFAULT_WAFERS = 2000
+MAX_WAFERS = 50_000
+Z95 = 1.96
+
+
+def check_arguments(wafers: int):
+    if not 2 <= wafers <= MAX_WAFERS:
+        raise ValueError(f"wafers must be between 2 and {MAX_WAFERS}")
+
+
+def gross_dies(area: Any) -> Any:
+    """Whole dies of `area` mm^2 (plus scribe) on a wafer: area ratio less the edge loss."""
+    diameter = WAFER_DIAMETER_MM - 2 * EDGE_EXCLUSION_MM
+    die = (np.sqrt(area) + SCRIBE_MM) ** 2
+    count = np.floor(math.pi * diameter ** 2 / 4 / die - math.pi * diameter / np.sqrt(2 * die))
+    return np.where(area <= RETICLE_MM2, np.maximum(count, 0), 0).astype(np.int64)
+
+
+def yield_report(spec: ChipSpecification, wafers: int = DEFAULT_WAFERS, seed: int = 0) -> YieldReport:
+    return YieldReport(**yield_data(spec, wafers, seed))
+
+
+def yield_for_spec(spec: ChipSpecification) -> Optional[YieldReport]:
+    """yield_report() for /analyze; None when the spec has no die to estimate."""
+    try:
+        return yield_report(spec)
+    except ValueError:
+        return None
+
+
+@timed("yield")
+def yield_data(spec: ChipSpecification, wafers: int = DEFAULT_WAFERS, seed: int = 0) -> Dict[str, Any]:
+    """yield_report() as a plain dict: the spec's die at its node, for each of PARTITIONINGS."""
+    check_arguments(wafers)
+    m = feasibility_metrics(spec)
+    area = m["area_mm2"]
+    if not area > 0:
+        raise ValueError(f"The estimated die area is {area:.1f} mm²; num_npu_clusters is too small to estimate yield")
+    d0, wafer_cost = NODE_ECONOMICS[m["node"]]
+    dies = np.array(PARTITIONINGS)
+    result = _simulate(np.full(len(dies), area), dies, np.full(len(dies), d0), np.full(len(dies), wafer_cost),
+                       wafers, np.random.default_rng(seed))
+    options = [
+        {"dies": int(n), **{name: _value(values[i]) for name, values in result.items()}}
+        for i, n in enumerate(dies.tolist())
+    ]
+    priced = [o for o in options if o["cost_per_system"] is not None]
+    best = min(priced, key=lambda o: o["cost_per_system"]) if priced else None
+    warnings = []
+    mono = options[0]
+    if mono["gross_dies_per_wafer"] == 0:
+        warnings.append(f"A {area:.0f} mm² die exceeds the {RETICLE_MM2:.0f} mm² reticle; it has to be split into chiplets"
+                        + ("." if best else f" (more than {PARTITIONINGS[-1]})."))
+    elif best is not None and best["dies"] > 1:
+        saving = 1 - best["cost_per_system"] / mono["cost_per_system"]
+        warnings.append(f"Monolithic yield is {mono['die_yield']:.0%} at {m['node']}: {best['dies']} chiplets cost "
+                        f"{saving:.0%} less per good system.")
+    return {
+        "node": m["node"],
+        "die_area_mm2": round(area, 1),
+        "defect_density_per_cm2": d0,
+        "wafer_cost": wafer_cost,
+        "wafers": wafers,
+        "samples": int(wafers * result["gross_dies_per_wafer"].sum()),
+        "options": options,
+        "recommended_dies": best["dies"] if best else None,
+        "warnings": warnings,
+    }
+
+
+def yield_sweep(wafers: int = DEFAULT_WAFERS, seed: int = 0, nodes: Sequence[str] = tuple(NODE_LIMITS),
+                areas: Sequence[float] = SWEEP_AREAS_MM2, dies: Sequence[int] = SWEEP_DIES) -> Dict[str, Any]:
+    """
+    Every node x logic area x chiplet count in one pass; each metric is a
+    len(nodes) x len(areas) x len(dies) nested list (None where no die fits);
+    die_area_mm2 is then the chiplet's own area.
+    """
+    check_arguments(wafers)
+    shape = (len(nodes), len(areas), len(dies))
+    economics = np.array([NODE_ECONOMICS[node] for node in nodes])
+    grid = np.broadcast_arrays(economics[:, None, None, 0], np.asarray(areas, dtype=np.float64)[None, :, None],
+                               np.asarray(dies)[None, None, :], economics[:, None, None, 1])
+    d0, area, count, wafer_cost = (a.ravel() for a in grid)
+    result = _simulate(area, count, d0, wafer_cost, wafers, np.random.default_rng(seed))
+    return {
+        "nodes": list(nodes), "logic_area_mm2": [float(a) for a in areas], "dies": [int(d) for d in dies],
+        "wafers": wafers,
+        "samples": int(wafers * result["gross_dies_per_wafer"].sum()),
+        **{name: [[[_value(v) for v in row] for row in plane] for plane in values.reshape(shape + values.shape[1:])]
+           for name, values in result.items()},
+    }
+
+
+# --- Sampling ---
+def _simulate(area: np.ndarray, dies: np.ndarray, d0: np.ndarray, wafer_cost: np.ndarray,
+              wafers: int, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """Per option: gross and good chiplets per wafer, yield and costs, with 95% intervals as (n, 2) arrays."""
+    chiplet = area / dies * np.where(dies > 1, 1 + D2D_OVERHEAD, 1.0)
+    gross = gross_dies(chiplet)
+    density = rng.gamma(CLUSTERING, d0 / CLUSTERING, (wafers, len(area)))
+    good = rng.binomial(gross, np.exp(-density * chiplet / 100.0))
+    mean = good.mean(axis=0)
+    half = Z95 * good.std(axis=0, ddof=1) / math.sqrt(wafers)
+    # Intervals of the mean good-die count; cost falls as it rises
+    bounds = np.stack([np.maximum(mean - half, 0), mean + half], axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_die = np.where(bounds > 0, wafer_cost[:, None] / bounds, np.inf)[:, ::-1]
+        per_system = (dies[:, None] * (per_die + ASSEMBLY_COST)) / BOND_YIELD ** dies[:, None]
+        fraction = np.where(gross > 0, mean / gross, 0.0)
+        die_cost = np.where(mean > 0, wafer_cost / mean, np.inf)
+    return {
+        "die_area_mm2": chiplet,
+        "gross_dies_per_wafer": gross,
+        "good_dies_per_wafer": mean,
+        "good_dies_ci95": bounds,
+        "die_yield": fraction,
+        "die_yield_ci95": np.where(gross[:, None] > 0, bounds / np.maximum(gross, 1)[:, None], 0.0),
+        "cost_per_die": die_cost,
+        "cost_per_die_ci95": per_die,
+        "cost_per_system": dies * (die_cost + ASSEMBLY_COST) / BOND_YIELD ** dies,
+        "cost_per_system_ci95": per_system,
+    }
+
+
+def _value(value: Any) -> Optional[Any]:
+    """A sampled metric as JSON: rounded, intervals as [low, high], None for no good dies."""
+    if np.ndim(value):
+        return [_value(v) for v in value]
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return round(float(value), 4) if math.isfinite(value) else None
@@ -31,6 +31,105 @@ export const generateFloorplan = async (graph) => {
         throw error;
     }
 }
+export const partitionDesign = async (graph, numDies = 2, maxImbalance = 0.05) => {
+    try {
+        const response = await axios.post(`${API_Base}/partition`, { graph, num_dies: numDies, max_imbalance: maxImbalance });
+        return response.data; // { dies, links, die_to_die_bandwidth_gbps, ... }
+    } catch (error) {
+        console.error("API Error:", error);
+        throw error;
+    }
+}
+
+export const synthesizeNoc = async (spec) => {
+    try {
+        const response = await axios.post(`${API_Base}/noc`, spec);
+        return response.data; // { clusters, selected, topologies: [{ topology, avg_latency_ns, traffic, ... }] }
+    } catch (error) {
+        console.error("API Error:", error);
+        throw error;
+    }
+}
+
+export const simulateArchitecture = async (spec, graph = null, options = {}) => {
+    try {
+        const response = await axios.post(`${API_Base}/simulate`, { spec, graph, ...options }); // options: transactions, load, seed
+        return response.data; // { sustained_gbps, p99_latency_ns, bottleneck, stations: [{ name, utilization, ... }], ... }
+    } catch (error) {
+        console.error("API Error:", error);
+        throw error;
+    }
+}
+
+export const yieldCost = async (spec, wafers = null) => {
+    try {
+        const response = await axios.post(`${API_Base}/yield`, spec, { params: wafers ? { wafers } : {} });
+        return response.data; // { design: { options: [{ dies, die_yield, cost_per_system, ... }] }, sweep: { nodes, logic_area_mm2, dies, ... } }
+    } catch (error) {
+        console.error("API Error:", error);
+        throw error;
+    }
+}
+
+export const memoryModel = async (spec, tile = null) => {
+    try {
+        const response = await axios.post(`${API_Base}/memory-model`, spec, { params: tile ? { tile } : {} });
+        return response.data; // { design: { tile, reuse_macs_per_byte, ... }, sweep: { sram_mb, memory_types, ... } }
+    } catch (error) {
+        console.error("API Error:", error);
+        throw error;
+    }
+}
+
+export const analyzeWorkload = async (spec, workload) => {
+    try {
+        const response = await axios.post(`${API_Base}/workload`, { spec, workload });
+        return response.data; // { layers: [{ name, bound, latency_us, ... }], latency_ms, utilization, ... }
+    } catch (error) {
+        console.error("API Error:", error);
+        throw error;
+    }
+}
+
+// Design sessions: upload the graph once, then send only the edits
+export const createSession = async (graph) => {
+    try {
+        const response = await axios.post(`${API_Base}/sessions`, graph);
+        return response.data; // { id, version, floorplan }
+    } catch (error) {
+        console.error("API Error:", error);
+        throw error;
+    }
+}
+
+// ops: [{ op: "replace", path: "/nodes/<id>/position", value: {x, y} }, ...]
+export const patchSession = async (sessionId, baseVersion, ops) => {
+    try {
+        const response = await axios.patch(`${API_Base}/sessions/${sessionId}`, { base_version: baseVersion, ops });
+        return response.data; // { id, version, floorplan: delta }
+    } catch (error) {
+        console.error("API Error:", error);
+        throw error;
+    }
+}
+
+// Live updates over a WebSocket: send every intermediate state, receive
+// only the result for the latest one (older computations are cancelled)
+export const openLiveUpdates = (onMessage) => {
+    const socket = new WebSocket(`${API_Base.replace(/^http/, 'ws')}/ws/live`);
+    let nextId = 0;
+    socket.onmessage = (event) => onMessage(JSON.parse(event.data));
+    return {
+        send: (type, payload) => {
+            if (socket.readyState === WebSocket.OPEN) {
+                socket.send(JSON.stringify({ type, id: ++nextId, payload }));
+            }
+            return nextId;
+        },
+        close: () => socket.close(),
+    };
+}
+
 // AI Features
 export const analyzeWithAI = async (spec) => {
     try {